@@ -0,0 +1,326 @@
+"""
+This script benchmarks full and incremental loads of the DataIngestion class end to end. It doesn't need SQL Server nor a storage account: source
+tables are generated in a local SQLite database (see the LocalSQL class) and delta tables are saved on the local disk (see the LocalStorageBackend class).
+
+For every scenario it generates a source table and a changes table, runs full_load and then incr_load, and records for both loads:
+    - seconds and rows per second
+    - peak resident memory of the process during the load
+    - number of bytes and files written into the target delta table
+    - number of delta versions created
+
+Results are saved as a JSON file in the results_path directory. If baseline_path is given, then results are compared with that file and loads
+which are slower than the baseline by more than regression_threshold are reported, so regressions can be caught between releases.
+"""
+
+from pathlib import Path
+import os, sys
+
+classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
+sys.path.append(classes_path)
+
+from class_data_ingestion import DataIngestion
+from class_local_sql import LocalSQL
+from class_storage_backend import LocalStorageBackend
+
+from deltalake import DeltaTable
+from deltalake.exceptions import TableNotFoundError
+from datetime import datetime, timedelta
+import deltalake
+import numpy as np
+import pyarrow as pa
+import platform
+import resource
+import tempfile
+import threading
+import json
+import time
+
+
+# === Benchmark configuration ===
+
+# Every scenario generates a source table with 'rows' rows and 'width' additional columns, and a changes table with 'changes' rows, where:
+# - update_ratio: part of the changes which modify existing records
+# - delete_ratio: part of the changes which delete existing records. The remaining changes insert new records.
+# - duplicate_rate: part of the changes which are older changes of a record changed again later (they are removed before the merge)
+scenarios = [
+    {'name': 'narrow', 'rows': 500_000, 'width': 4, 'changes': 50_000, 'update_ratio': 0.6, 'delete_ratio': 0.1, 'duplicate_rate': 0.2}
+    ,{'name': 'wide', 'rows': 100_000, 'width': 40, 'changes': 20_000, 'update_ratio': 0.6, 'delete_ratio': 0.1, 'duplicate_rate': 0.2}
+]
+
+# number of rows fetched from the source table at once
+batch_size = 100_000
+
+# directory where results are saved
+results_path = Path(__file__).parent / 'results'
+
+# path to a JSON file with results of a previous run which will be compared with the current results (or None)
+baseline_path = None
+
+# loads which have less rows per second than the baseline by more than this part are reported as regressions
+regression_threshold = 0.1
+
+# seed of the random data generator, so every run loads the same data
+seed = 0
+
+
+class PeakMemory:
+    """
+    Context manager sampling the resident set size of the process every interval seconds in a background thread and keeping the peak value.
+    On systems without /proc the peak of the whole process (ru_maxrss) is used.
+    """
+    def __init__(self, interval = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+
+    def rss(self):
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def sample(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self.rss())
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.rss()
+        self.thread = threading.Thread(target = self.sample, daemon = True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.rss())
+
+
+def generate_tables(sql: LocalSQL, scenario, rng: np.random.Generator):
+    """
+    This function creates the main.source_table and main.source_table_changes tables in the SQLite database and fills them with random data.
+    """
+    rows, width, changes = scenario['rows'], scenario['width'], scenario['changes']
+    now = datetime.now()
+
+    # additional columns are alternately numeric and text columns
+    extra_columns = [(f'c{i}', 'real' if i % 2 == 0 else 'text') for i in range(width)]
+    columns_ddl = ', '.join(f'{name} {sql_type}' for name, sql_type in extra_columns)
+
+    def extra_values(count):
+        values = []
+        for name, sql_type in extra_columns:
+            if sql_type == 'real':
+                values.append(rng.random(count).round(4).tolist())
+            else:
+                values.append([f'value_{value}' for value in rng.integers(0, 1_000, count)])
+        return values
+
+    def records(ids, deleted = None, dates = None):
+        count = len(ids)
+        columns = [
+            ids.tolist()
+            ,[f'dim_{value}' for value in rng.integers(0, 100, count)]
+            ,rng.random(count).round(2).tolist()
+            ,dates if dates is not None else [now - timedelta(days = 1)] * count
+        ] + extra_values(count)
+        if deleted is not None:
+            columns.append(deleted)
+        return list(zip(*columns))
+
+    # changes which will be ingested: updates and deletes of existing records and inserts of new records
+    base_changes = round(changes * (1 - scenario['duplicate_rate']))
+    updates = round(base_changes * scenario['update_ratio'])
+    deletes = round(base_changes * scenario['delete_ratio'])
+    inserts = base_changes - updates - deletes
+
+    changed_ids = rng.choice(np.arange(1, rows + 1), updates + deletes, replace = False)
+    change_ids = np.concatenate([changed_ids, np.arange(rows + 1, rows + inserts + 1)])
+    change_deleted = [0] * updates + [1] * deletes + [0] * inserts
+    change_dates = [now - timedelta(seconds = int(seconds)) for seconds in rng.integers(1, 3_600, base_changes)]
+
+    # older changes of the same records, which are overwritten by the changes above
+    duplicates = rng.integers(0, base_changes, changes - base_changes)
+    change_ids = np.concatenate([change_ids, change_ids[duplicates]])
+    change_deleted += [0] * len(duplicates)
+    change_dates += [change_dates[i] - timedelta(seconds = 3_600) for i in duplicates]
+
+    con = sql.engine.raw_connection()
+    cursor = con.cursor()
+    cursor.execute('drop table if exists source_table')
+    cursor.execute('drop table if exists source_table_changes')
+    cursor.execute(f'create table source_table (ID integer primary key, dim_col text, measure real, date_created timestamp, {columns_ddl})')
+    cursor.execute(f'create table source_table_changes (ID integer, dim_col text, measure real, date_created timestamp, {columns_ddl}, deleted integer)')
+
+    placeholders = ', '.join('?' for _ in range(4 + width))
+    for offset in range(0, rows, batch_size):
+        ids = np.arange(offset + 1, min(offset + batch_size, rows) + 1)
+        cursor.executemany(f'insert into source_table values ({placeholders})', records(ids))
+
+    cursor.executemany(
+        f'insert into source_table_changes values ({placeholders}, ?)'
+        ,records(change_ids, change_deleted, change_dates)
+    )
+
+    con.commit()
+    cursor.close()
+    con.close()
+
+
+def table_files(table_path: Path):
+    "returning a dictionary {file path: size in bytes} of all the files of a delta table saved on the local disk"
+    if not table_path.exists():
+        return {}
+
+    return {path: path.stat().st_size for path in table_path.rglob('*') if path.is_file()}
+
+
+def table_version(table_uri):
+    "returning the current version of a delta table or -1 if it doesn't exist"
+    try:
+        return DeltaTable(table_uri).version()
+    except TableNotFoundError:
+        return -1
+
+
+def measure(load_function, rows, table_path: Path, table_uri, **kwargs):
+    """
+    This function runs a load and returns its metrics. rows is the number of rows processed by the load, or a function which returns it
+    from the result of the load.
+    """
+    files_before = table_files(table_path)
+    version_before = table_version(table_uri)
+
+    start_time = time.perf_counter()
+    with PeakMemory() as memory:
+        result = load_function(**kwargs)
+    seconds = time.perf_counter() - start_time
+
+    if callable(rows):
+        rows = rows(result)
+
+    files_after = table_files(table_path)
+    new_files = [path for path in files_after if path not in files_before]
+
+    return {
+        'seconds': seconds
+        ,'rows': rows
+        ,'rows_per_second': rows / seconds
+        ,'peak_rss_bytes': memory.peak
+        ,'bytes_written': sum(files_after[path] for path in new_files)
+        ,'files_created': len(new_files)
+        ,'versions_created': table_version(table_uri) - version_before
+        ,'result': result
+    }
+
+
+def run_scenario(scenario):
+    """
+    This function generates data of a scenario in a temporary directory, runs full and incremental load of that data and returns their metrics.
+    """
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory() as work_path:
+        sql = LocalSQL(Path(work_path) / 'source.db')
+        backend = LocalStorageBackend(Path(work_path) / 'lake')
+        generate_tables(sql, scenario, rng)
+
+        di = DataIngestion(sql = sql, storage_backend = backend)
+        container_name, target_table_path = 'benchmark', 'benchmark/table'
+        di.create_container(container_name)
+
+        table_path = backend.local_path(container_name, target_table_path)
+        table_uri = backend.table_uri(container_name, target_table_path)
+
+        full_load = measure(
+            di.full_load
+            ,scenario['rows']
+            ,table_path
+            ,table_uri
+            ,source_table_name = 'main.source_table'
+            ,container_name = container_name
+            ,target_table_path = target_table_path
+            ,batch_size = batch_size
+        )
+
+        # duplicated changes of the same row are merged once, so only rows applied to the target table are counted
+        incr_load = measure(
+            di.incr_load
+            ,lambda result: result['rows_updated'] + result['rows_inserted'] + result['rows_deleted']
+            ,table_path
+            ,table_uri
+            ,source_table_name = 'main.source_table'
+            ,container_name = container_name
+            ,target_table_path = target_table_path
+            ,changes_table_name = 'main.source_table_changes'
+            ,change_created_date_column = 'date_created'
+            ,pk = 'ID'
+            ,deleted_col = 'deleted'
+        )
+
+        sql.engine.dispose()
+
+    return {
+        'scenario': scenario
+        ,'full_load': full_load
+        ,'incr_load': incr_load
+    }
+
+
+def compare(results, baseline):
+    """
+    This function compares rows per second of every load with the baseline and returns a list of regressions.
+    """
+    baseline_loads = {
+        (scenario['scenario']['name'], load_type): scenario[load_type]
+        for scenario in baseline['scenarios'] for load_type in ('full_load', 'incr_load')
+    }
+
+    regressions = []
+    for scenario in results['scenarios']:
+        for load_type in ('full_load', 'incr_load'):
+            previous = baseline_loads.get((scenario['scenario']['name'], load_type))
+            if previous is None:
+                continue
+
+            change = scenario[load_type]['rows_per_second'] / previous['rows_per_second'] - 1
+            print(f"{scenario['scenario']['name']} {load_type}: {change:+.1%} rows per second compared to the baseline")
+
+            if change < -regression_threshold:
+                regressions.append({'scenario': scenario['scenario']['name'], 'load_type': load_type, 'change': change})
+
+    return regressions
+
+
+if __name__ == '__main__':
+    results = {
+        'date': datetime.now().isoformat()
+        ,'python': platform.python_version()
+        ,'pyarrow': pa.__version__
+        ,'deltalake': deltalake.__version__
+        ,'batch_size': batch_size
+        ,'scenarios': []
+    }
+
+    for scenario in scenarios:
+        result = run_scenario(scenario)
+        results['scenarios'].append(result)
+
+        for load_type in ('full_load', 'incr_load'):
+            metrics = result[load_type]
+            print(
+                f"{scenario['name']} {load_type}: {metrics['rows_per_second']:,.0f} rows/s, peak RSS {metrics['peak_rss_bytes'] / 1024 ** 2:,.0f} MiB, "
+                f"{metrics['bytes_written'] / 1024 ** 2:,.1f} MiB in {metrics['files_created']} files, {metrics['versions_created']} versions"
+            )
+
+    results_path.mkdir(parents = True, exist_ok = True)
+    results_file = results_path / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    results_file.write_text(json.dumps(results, indent = 4, default = str))
+    print(f'Results saved in {results_file}')
+
+    if baseline_path is not None:
+        regressions = compare(results, json.loads(Path(baseline_path).read_text()))
+        if regressions:
+            print(f'Regressions: {regressions}')
+            sys.exit(1)
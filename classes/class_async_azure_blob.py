@@ -0,0 +1,518 @@
+"""
+These are classes for working with containers, directories and files of the Azure Storage Account (Data Lake) concurrently, using the asyncio
+Data Lake client (azure.storage.filedatalake.aio). They are useful for scripts which touch many paths at once, e.g. checking if many directories
+exist or deleting many directories, where the AzureBlob class waits for one request at a time.
+
+- AsyncAzureBlob: coroutines performing the same operations as the AzureBlob class and bulk helpers (files_exist, create_directories,
+  delete_directories, upload_files, upload_directory) which run many requests at the same time. At most max_concurrency requests are running
+  at once.
+- ConcurrentAzureBlob: synchronous façade of AsyncAzureBlob, which has the same functions as the AzureBlob class, so existing scripts can use it
+  without any changes of their code and call the bulk helpers without using asyncio. Coroutines are run on an event loop in a background thread,
+  so the client and its connections are reused between calls and the façade works also when it is called from a running event loop
+  (e.g. in Jupyter).
+
+The asyncio client needs the aiohttp package. It uses the SAS token credential of a StorageSession, which is refreshed in the background by that
+session.
+"""
+
+from class_load_metrics import LoadMetrics
+from class_storage_session import StorageSession
+
+from azure.storage.filedatalake.aio import DataLakeServiceClient, ExponentialRetry
+from azure.storage.filedatalake import ContentSettings
+import azure.core.exceptions
+
+from pathlib import Path
+import numpy as np
+import threading
+import asyncio
+import os
+
+class AsyncAzureBlob:
+    def __init__(
+        self
+        ,session: StorageSession # session which SAS token credential is used by the client
+        ,max_concurrency = 32 # maximum number of requests running at the same time
+    ):
+        """
+        The client is created when it is used for the first time, so an object can be created outside of an event loop.
+        """
+        self.session = session
+        self.account_name = session.account_name
+        self.max_concurrency = max_concurrency
+
+        self.service_client = None
+        self.semaphore = None
+
+
+    def create_service_client(
+        self
+    ):
+        """
+        This function creates a service client if it was not created yet. It has to be called from the event loop which will use the client.
+        """
+        if self.service_client is not None:
+            return
+
+        # the credential is shared with the session, so a token refreshed by the session is used also by this client
+        self.service_client = DataLakeServiceClient(
+            account_url = f'https://{self.account_name}.dfs.core.windows.net'
+            ,credential = self.session.credential
+            ,retry_policy = ExponentialRetry()
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+
+    def get_service_client(
+        self
+    ) -> DataLakeServiceClient:
+        """
+        Returns the service client.
+        """
+        self.create_service_client()
+
+        return self.service_client
+
+
+    async def close(
+        self
+    ):
+        "This function closes the client and its connections."
+        if self.service_client is not None:
+            await self.service_client.close()
+            self.service_client = None
+
+
+    async def bounded(
+        self
+        ,coroutine
+    ):
+        "Awaits a coroutine when there are less than max_concurrency requests running."
+        self.create_service_client()
+
+        async with self.semaphore:
+            return await coroutine
+
+
+    async def create_container(
+        self
+        ,container_name
+    ):
+        await self.bounded(self.get_service_client().create_file_system(container_name))
+
+
+    async def delete_container(
+        self
+        ,container_name
+    ):
+        await self.bounded(self.get_service_client().delete_file_system(container_name))
+
+
+    async def list_containers(
+        self
+    ):
+        """
+        Returns names of all the containers
+        """
+        service_client = self.get_service_client()
+
+        async with self.semaphore:
+            return [file_system.name async for file_system in service_client.list_file_systems()]
+
+
+    async def create_directory(
+        self
+        ,container_name
+        ,directory_name
+    ):
+        file_system_client = self.get_service_client().get_file_system_client(container_name)
+        await self.bounded(file_system_client.create_directory(directory_name))
+
+
+    async def delete_directory(
+        self
+        ,container_name
+        ,directory_name
+    ):
+        file_system_client = self.get_service_client().get_file_system_client(container_name)
+        await self.bounded(file_system_client.delete_directory(directory_name))
+
+
+    async def rename_directory(
+        self
+        ,container_name
+        ,directory_name
+        ,new_directory_name
+    ):
+        directory_client = self.get_service_client().get_directory_client(container_name, directory_name)
+        await self.bounded(directory_client.rename_directory(new_name = f"{container_name}/{new_directory_name}"))
+
+
+    async def read_file(
+        self
+        ,local_file_path
+        ,block_size # number of bytes read at once
+    ):
+        """
+        Async generator yielding blocks of a local file. The file is read in a thread, so reads don't block the event loop.
+        """
+        file = await asyncio.to_thread(open, local_file_path, 'rb')
+        try:
+            while True:
+                block = await asyncio.to_thread(file.read, block_size)
+                if not block:
+                    break
+                yield block
+        finally:
+            file.close()
+
+
+    async def upload_file(
+        self
+        ,container_name
+        ,cloud_file_path
+        ,local_file_path
+        ,chunk_size = None # size of the chunks in which large files are uploaded. By default it is the default of the storage client.
+        ,max_concurrency = 1 # number of chunks of the file uploaded at the same time
+    ):
+        """
+        This function uploads a local file (see AzureBlob.upload_file). Its MD5 hash is saved in the properties of the file, the same as by
+        the StorageSession class.
+        """
+        file_client = self.get_service_client().get_file_client(container_name, cloud_file_path)
+
+        md5 = await asyncio.to_thread(self.session.local_file_md5, local_file_path)
+        size = await asyncio.to_thread(os.path.getsize, local_file_path)
+        chunk_options = {'chunk_size': chunk_size} if chunk_size is not None else {}
+
+        await self.bounded(file_client.upload_data(
+            self.read_file(local_file_path, chunk_size if chunk_size is not None else 4 * 1024 ** 2)
+            ,length = size
+            ,overwrite = True
+            ,max_concurrency = max_concurrency
+            ,content_settings = ContentSettings(content_md5 = bytearray(md5))
+            ,**chunk_options
+        ))
+
+
+    async def file_checksum(
+        self
+        ,container_name
+        ,file_path
+    ):
+        """
+        Returns the size and the MD5 hash of an uploaded file, or None if the file doesn't exist (see StorageSession.file_checksum).
+        """
+        file_client = self.get_service_client().get_file_client(container_name, file_path)
+        try:
+            properties = await self.bounded(file_client.get_file_properties())
+        except azure.core.exceptions.ResourceNotFoundError:
+            return None
+
+        md5 = properties.content_settings.content_md5
+        return properties.size, bytes(md5) if md5 else None
+
+
+    async def list_directory_content(
+        self
+        ,container_name
+        ,path
+    ):
+        """
+        This function lists all the files and directories which are contained in the given directory (see AzureBlob.list_directory_content).
+        """
+        file_system_client = self.get_service_client().get_file_system_client(container_name)
+
+        async with self.semaphore:
+            try:
+                paths = np.array([path.name async for path in file_system_client.get_paths(path = path)])
+            except azure.core.exceptions.ResourceNotFoundError:
+                raise Exception("Specified directory doesn't exist")
+
+        return paths
+
+
+    async def file_exists(
+        self
+        ,container_name
+        ,file_path
+    ) -> bool:
+        """
+        This function checks if the file (or directory) at the specified path exists in the given container.
+        """
+        file_client = self.get_service_client().get_file_client(container_name, file_path)
+        try:
+            await self.bounded(file_client.get_file_properties())
+            return True
+        except azure.core.exceptions.ResourceNotFoundError:
+            return False
+
+
+    async def files_exist(
+        self
+        ,container_name
+        ,file_paths # list of paths to check
+    ):
+        """
+        This function checks concurrently if the files (or directories) at the specified paths exist. It returns a dictionary {path: bool}.
+        """
+        results = await asyncio.gather(*[self.file_exists(container_name, file_path) for file_path in file_paths])
+
+        return dict(zip(file_paths, results))
+
+
+    async def create_directories(
+        self
+        ,container_name
+        ,directory_names # list of directories to create
+    ):
+        """
+        This function creates the given directories concurrently. Missing parent directories are created by the Data Lake.
+        """
+        await asyncio.gather(*[self.create_directory(container_name, directory_name) for directory_name in directory_names])
+
+
+    async def delete_directories(
+        self
+        ,container_name
+        ,directory_names # list of directories to delete
+        ,missing_ok = False # if True then directories which don't exist are skipped
+    ):
+        """
+        This function deletes the given directories concurrently. It returns a list of the deleted directories.
+
+        All the deletions are awaited even if some of them fail, and then the first error is raised.
+        """
+        async def delete(directory_name):
+            try:
+                await self.delete_directory(container_name, directory_name)
+                return True
+            except azure.core.exceptions.ResourceNotFoundError:
+                if not missing_ok:
+                    raise
+                return False
+
+        results = await asyncio.gather(*[delete(directory_name) for directory_name in directory_names], return_exceptions = True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return [directory_name for directory_name, deleted in zip(directory_names, results) if deleted]
+
+
+    async def upload_files(
+        self
+        ,container_name
+        ,files # list of (cloud_file_path, local_file_path) tuples
+    ):
+        """
+        This function uploads the given local files concurrently.
+        """
+        await asyncio.gather(*[
+            self.upload_file(container_name, cloud_file_path, local_file_path)
+            for cloud_file_path, local_file_path in files
+        ])
+
+
+    async def upload_directory(
+        self
+        ,container_name
+        ,cloud_directory_path # path to the directory in the container into which files are uploaded
+        ,local_directory_path # path to the local directory which is uploaded together with all its subdirectories
+        ,chunk_size = 8 * 1024 ** 2 # size of the chunks in which large files are uploaded
+        ,max_concurrency = 4 # number of chunks of a single file uploaded at the same time
+        ,parallel_files = 4 # number of files uploaded at the same time
+        ,skip_unchanged = True # if True then files which already exist with the same size and MD5 hash are not uploaded again
+    ):
+        """
+        This function uploads all the files from the local directory tree into the given directory in the container, the same as 
+        AzureBlob.upload_directory, and it returns the same summary.
+        """
+        local_directory_path = Path(local_directory_path)
+        local_files = await asyncio.to_thread(
+            lambda: sorted(path for path in local_directory_path.rglob('*') if path.is_file())
+        )
+        files_semaphore = asyncio.Semaphore(parallel_files)
+
+        async def upload(local_file_path):
+            relative_path = local_file_path.relative_to(local_directory_path).as_posix()
+            cloud_file_path = f"{cloud_directory_path.strip('/')}/{relative_path}"
+
+            async with files_semaphore:
+                size = (await asyncio.to_thread(local_file_path.stat)).st_size
+
+                if skip_unchanged:
+                    checksum = await self.file_checksum(container_name, cloud_file_path)
+                    if (
+                        checksum is not None and checksum[0] == size 
+                        and checksum[1] == await asyncio.to_thread(self.session.local_file_md5, local_file_path)
+                    ):
+                        return relative_path, None
+
+                await self.upload_file(container_name, cloud_file_path, local_file_path, chunk_size, max_concurrency)
+
+            return relative_path, size
+
+        results = await asyncio.gather(*[upload(local_file_path) for local_file_path in local_files])
+
+        return {
+            'uploaded': [path for path, size in results if size is not None]
+            ,'skipped': [path for path, size in results if size is None]
+            ,'bytes': sum(size for _, size in results if size is not None)
+        }
+
+
+class ConcurrentAzureBlob:
+    def __init__(
+        self
+        ,account_name # name of the Azure Storage Account (Data Lake)
+        ,access_key # access key to the Azure Storage Account (Data Lake)
+        ,max_concurrency = 32 # maximum number of requests running at the same time
+        ,metrics: LoadMetrics = None # object collecting metrics of operations (see the LoadMetrics class). If it is None then a new one is created.
+        ,session: StorageSession = None # session which SAS token is used. If it is None then a new session is created and closed by this object.
+    ):
+        self.metrics = metrics if metrics is not None else LoadMetrics()
+        self.owns_session = session is None
+        self.session = session if session is not None else StorageSession(account_name, access_key, metrics = self.metrics)
+        self.account_name = self.session.account_name
+        self.access_key = self.session.access_key
+        self.blob = AsyncAzureBlob(self.session, max_concurrency = max_concurrency)
+
+        # event loop running in the background, on which all the coroutines are run
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target = self.loop.run_forever, daemon = True)
+        self.thread.start()
+
+
+    def run(
+        self
+        ,coroutine
+    ):
+        "Runs a coroutine on the background event loop and returns its result"
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+    def close(
+        self
+    ):
+        """
+        This function closes the client and stops the background event loop. The session is closed only if it was created by this object.
+        """
+        self.run(self.blob.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+        if self.owns_session:
+            self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def create_container(self, container_name):
+        self.run(self.blob.create_container(container_name))
+
+
+    def delete_container(self, container_name):
+        self.run(self.blob.delete_container(container_name))
+
+
+    def list_containers(self):
+        """
+        Returns names of all the containers
+        """
+        return self.run(self.blob.list_containers())
+
+
+    def create_directory(self, container_name, directory_name):
+        self.run(self.blob.create_directory(container_name, directory_name))
+
+
+    def delete_directory(self, container_name, directory_name):
+        self.run(self.blob.delete_directory(container_name, directory_name))
+
+
+    def rename_directory(self, container_name, directory_name, new_directory_name):
+        self.run(self.blob.rename_directory(container_name, directory_name, new_directory_name))
+
+
+    def upload_file(self, container_name, cloud_file_path, local_file_path, chunk_size = None, max_concurrency = 1):
+        "See AzureBlob.upload_file"
+        with self.metrics.stage('storage_upload') as stage:
+            stage['bytes'] = os.path.getsize(local_file_path)
+            self.run(self.blob.upload_file(container_name, cloud_file_path, local_file_path, chunk_size, max_concurrency))
+
+
+    def upload_directory(
+        self
+        ,container_name
+        ,cloud_directory_path
+        ,local_directory_path
+        ,chunk_size = 8 * 1024 ** 2
+        ,max_concurrency = 4
+        ,parallel_files = 4
+        ,skip_unchanged = True
+    ):
+        "See AzureBlob.upload_directory"
+        with self.metrics.stage('storage_upload_directory') as stage:
+            summary = self.run(self.blob.upload_directory(
+                container_name
+                ,cloud_directory_path
+                ,local_directory_path
+                ,chunk_size
+                ,max_concurrency
+                ,parallel_files
+                ,skip_unchanged
+            ))
+            stage['rows'] = len(summary['uploaded'])
+            stage['bytes'] = summary['bytes']
+            stage['details'] = {'skipped_files': len(summary['skipped'])}
+
+        return summary
+
+
+    def list_directory_content(self, container_name, path):
+        "See AzureBlob.list_directory_content"
+        with self.metrics.count('storage_list'):
+            return self.run(self.blob.list_directory_content(container_name, path))
+
+
+    def file_exists(self, container_name, file_path) -> bool:
+        with self.metrics.count('storage_exists'):
+            return self.run(self.blob.file_exists(container_name, file_path))
+
+
+    def files_exist(self, container_name, file_paths):
+        "See AsyncAzureBlob.files_exist"
+        with self.metrics.stage('storage_exists') as stage:
+            stage['rows'] = len(file_paths)
+            return self.run(self.blob.files_exist(container_name, file_paths))
+
+
+    def create_directories(self, container_name, directory_names):
+        "See AsyncAzureBlob.create_directories"
+        with self.metrics.stage('storage_create_directories') as stage:
+            stage['rows'] = len(directory_names)
+            self.run(self.blob.create_directories(container_name, directory_names))
+
+
+    def delete_directories(self, container_name, directory_names, missing_ok = False):
+        "See AsyncAzureBlob.delete_directories"
+        with self.metrics.stage('storage_delete_directories') as stage:
+            stage['rows'] = len(directory_names)
+            return self.run(self.blob.delete_directories(container_name, directory_names, missing_ok))
+
+
+    def upload_files(self, container_name, files):
+        "See AsyncAzureBlob.upload_files"
+        with self.metrics.stage('storage_upload') as stage:
+            stage['rows'] = len(files)
+            stage['bytes'] = sum(os.path.getsize(local_file_path) for _, local_file_path in files)
+            self.run(self.blob.upload_files(container_name, files))
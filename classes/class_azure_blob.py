@@ -1,94 +1,78 @@
 """
 This is a class for working with containers, directories and files (creating them, deleting, renaming). This class is a parent to the DeltaLake and ExtractLogs classes.
+
+All the operations are performed using a storage backend, which can be shared by many objects, so they use the same credential and connections.
+By default it is a StorageSession connected to an Azure Storage Account, but it can be any backend from class_storage_backend.py (e.g. 
+LocalStorageBackend which keeps containers on the local disk).
 """
 
-from azure.storage.blob import generate_account_sas, ResourceTypes, AccountSasPermissions
-from azure.storage.filedatalake import DataLakeServiceClient
-import azure.core.exceptions
+from class_storage_session import StorageSession
+from class_storage_backend import StorageBackend
+from class_load_metrics import LoadMetrics
 
-from datetime import datetime, timedelta
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
 
 class AzureBlob:
     def __init__(
         self
-        ,account_name # name of the Azure Storage Account (Data Lake)
-        ,access_key # access key to the Azure Storage Account (Data Lake)
+        ,account_name = None # name of the Azure Storage Account (Data Lake)
+        ,access_key = None # access key to the Azure Storage Account (Data Lake)
+        ,session: StorageBackend = None # storage backend shared with other objects. If it is None then a new StorageSession is created.
+        ,metrics: LoadMetrics = None # object collecting metrics of operations (see the LoadMetrics class). If it is None then a new one is created.
     ):
-        self.account_name = account_name
-        self.access_key = access_key
-        # Create a service client which will be used for performing all the operations on containers, directories and files.
-        self.create_service_client()
+        # Storage backend which will be used for performing all the operations on containers, directories and files.
+        self.session = session if session is not None else StorageSession(account_name, access_key)
+        self.account_name = self.session.account_name
+        self.access_key = self.session.access_key
+        self.metrics = metrics if metrics is not None else LoadMetrics()
+
+
+    @property
+    def service_client(self):
+        return self.session.get_service_client()
 
 
     def create_service_client(
         self
     ):
         """
-        This function creates a service client if it was not created yet. It will be used for performing all the operations on containers, directories and files.
-
-        It generates at first a SAS token if it was not generated yet or if it expired.
+        This function creates a service client of the session if it was not created yet. Its SAS token is refreshed by the session in the background.
         """
-        if (
-            not hasattr(self, 'sas_expiry_date')
-        ) or (
-            hasattr(self, 'sas_expiry_date') and self.sas_expiry_date < datetime.utcnow()
-        ):
-            sas = self.create_account_sas()
+        self.session.create_service_client()
 
-            self.service_client = DataLakeServiceClient(
-                account_url = f'https://{self.account_name}.dfs.core.windows.net'
-                ,credential = sas
-            )
 
-
-    def create_account_sas(
+    def close(
         self
     ):
         """
-        Function for creating an account SAS token (This is needed for authentication when connecting to Azure Blob Storage).
+        This function closes the storage backend (e.g. stops refreshing the SAS token of a StorageSession). The backend can be shared with
+        other objects, so it should be closed once all of them are finished.
         """
-        # Define the start and expiry time for the SAS 
-        start_time = datetime.utcnow()
-        self.sas_expiry_date = start_time + timedelta(
-            # hours = 1
-            minutes = 10
-            # seconds = 5
-        )
-    
-        # Define the SAS permissions
-        sas_permissions = AccountSasPermissions(read=True, write=True, delete=True, list=True)
-    
-        # Define the SAS resource types
-        sas_resource_types = ResourceTypes(service=True, container=True, object=True)
-
-        # Generate the SAS
-        sas = generate_account_sas(
-            account_name = self.account_name
-            ,account_key = self.access_key
-            ,resource_types = sas_resource_types
-            ,permission = sas_permissions
-            ,expiry = self.sas_expiry_date
-            ,start = start_time
-        )
-
-        return sas
-        
+        self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
 
     def create_container(
         self
         ,container_name
     ):
-        self.create_service_client()
-        self.service_client.create_file_system(container_name)
+        self.session.create_container(container_name)
 
 
     def delete_container(
         self
         ,container_name
     ):
-        self.create_service_client()
-        self.service_client.delete_file_system(container_name)
+        self.session.delete_container(container_name)
 
 
     def list_containers(
@@ -97,10 +81,7 @@ class AzureBlob:
         """
         Returns names of all the containers
         """
-        self.create_service_client()
-        file_systems = self.service_client.list_file_systems()
-        
-        return [file_system.name for file_system in file_systems]            
+        return self.session.list_containers()
 
 
     def create_directory(
@@ -108,9 +89,7 @@ class AzureBlob:
         ,container_name
         ,directory_name
     ):
-        self.create_service_client()
-        file_system_client = self.service_client.get_file_system_client(container_name)
-        file_system_client.create_directory(directory_name)
+        self.session.create_directory(container_name, directory_name)
 
 
     def delete_directory(
@@ -118,9 +97,7 @@ class AzureBlob:
         ,container_name
         ,directory_name
     ):
-        self.create_service_client()
-        file_system_client = self.service_client.get_file_system_client(container_name)
-        file_system_client.delete_directory(directory_name)
+        self.session.delete_directory(container_name, directory_name)
 
     
     def rename_directory(
@@ -129,9 +106,7 @@ class AzureBlob:
         ,directory_name
         ,new_directory_name
     ):
-        self.create_service_client()
-        directory_client = self.service_client.get_directory_client(container_name, directory_name)
-        directory_client.rename_directory(new_name = f"{container_name}/{new_directory_name}")
+        self.session.rename_directory(container_name, directory_name, new_directory_name)
 
     
     def upload_file(
@@ -139,12 +114,65 @@ class AzureBlob:
         ,container_name
         ,cloud_file_path
         ,local_file_path
+        ,chunk_size = None # size of the chunks in which large files are uploaded. By default it is the default of the storage client.
+        ,max_concurrency = 1 # number of chunks of the file uploaded at the same time
+    ):
+        with self.metrics.stage('storage_upload') as stage:
+            stage['bytes'] = os.path.getsize(local_file_path)
+            self.session.upload_file(container_name, cloud_file_path, local_file_path, chunk_size, max_concurrency)
+
+
+    def upload_directory(
+        self
+        ,container_name
+        ,cloud_directory_path # path to the directory in the container into which files are uploaded
+        ,local_directory_path # path to the local directory which is uploaded together with all its subdirectories
+        ,chunk_size = 8 * 1024 ** 2 # size of the chunks in which large files are uploaded
+        ,max_concurrency = 4 # number of chunks of a single file uploaded at the same time
+        ,parallel_files = 4 # number of files uploaded at the same time
+        ,skip_unchanged = True # if True then files which already exist with the same size and MD5 hash are not uploaded again
     ):
-        self.create_service_client()
-        file_client = self.service_client.get_file_client(container_name, cloud_file_path)
+        """
+        This function uploads all the files from the local directory tree into the given directory in the container, keeping their relative
+        paths. Up to parallel_files * max_concurrency requests are sent at the same time.
+
+        If skip_unchanged is True then for every file its size and MD5 hash are compared with the uploaded file. The MD5 hash is saved during 
+        every upload, so repeated uploads of the same directory send only new and changed files. The MD5 hash of a local file is calculated
+        only when its size is equal to the size of the uploaded file. Files which are deleted locally are not deleted from the container.
+
+        It returns a dictionary with lists of the uploaded and skipped files (relative paths) and the number of uploaded bytes.
+        """
+        local_directory_path = Path(local_directory_path)
+        local_files = sorted(path for path in local_directory_path.rglob('*') if path.is_file())
 
-        with open(file = local_file_path, mode = "rb") as data:
-            file_client.upload_data(data, overwrite = True)
+        def upload(local_file_path):
+            relative_path = local_file_path.relative_to(local_directory_path).as_posix()
+            cloud_file_path = f"{cloud_directory_path.strip('/')}/{relative_path}"
+            size = local_file_path.stat().st_size
+
+            if skip_unchanged:
+                checksum = self.session.file_checksum(container_name, cloud_file_path)
+                if checksum is not None and checksum[0] == size and checksum[1] == self.session.local_file_md5(local_file_path):
+                    return relative_path, None
+
+            self.session.upload_file(container_name, cloud_file_path, local_file_path, chunk_size, max_concurrency)
+
+            return relative_path, size
+
+        with self.metrics.stage('storage_upload_directory') as stage:
+            with ThreadPoolExecutor(max_workers = parallel_files) as executor:
+                results = list(executor.map(upload, local_files))
+
+            summary = {
+                'uploaded': [path for path, size in results if size is not None]
+                ,'skipped': [path for path, size in results if size is None]
+                ,'bytes': sum(size for _, size in results if size is not None)
+            }
+            stage['rows'] = len(summary['uploaded'])
+            stage['bytes'] = summary['bytes']
+            stage['details'] = {'skipped_files': len(summary['skipped'])}
+
+        return summary
 
     
     def list_directory_content(
@@ -159,15 +187,8 @@ class AzureBlob:
         For example if path = 'directory1' then it might return: 'directory1/file1.csv', 'directory1/directory2', 'directory1/directory2/file2.csv'.
         If given directory doesn't exist then it will raise an exception.
         """
-        self.create_service_client()
-        file_system_client = self.service_client.get_file_system_client(container_name)
-        try:
-            paths = file_system_client.get_paths(path = path)
-            paths = np.array([path.name for path in paths])
-        except azure.core.exceptions.ResourceNotFoundError:
-            raise Exception("Specified directory doesn't exist")
-
-        return paths
+        with self.metrics.count('storage_list'):
+            return self.session.list_directory_content(container_name, path)
 
 
     def file_exists(
@@ -178,10 +199,5 @@ class AzureBlob:
         """
         This function checks if the file (or directory) at the specified path exists in the given container.
         """
-        self.create_service_client()
-        file_client = self.service_client.get_file_client(container_name, file_path)
-        try:
-            file_client.get_file_properties()
-            return True
-        except azure.core.exceptions.ResourceNotFoundError:
-            return False
\ No newline at end of file
+        with self.metrics.count('storage_exists'):
+            return self.session.file_exists(container_name, file_path)
@@ -3,40 +3,101 @@ This is a class for creating data ingestion pipelines.
 """
 
 from class_sql import SQL
-from class_delta_lake import DeltaLake
 from class_extract_logs import ExtractLogs
+from class_storage_session import StorageSession
+from class_delta_maintenance import DeltaMaintenance
+from class_load_metrics import LoadMetrics
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, contextmanager
+import threading
+import time
+import datetime
+import decimal
+import base64
+import json
 
 class DataIngestion(ExtractLogs):
     def __init__(
         self
-        ,sql_server
-        ,sql_database
-        ,dl_account_name
-        ,dl_access_key
+        ,sql_server = None
+        ,sql_database = None
+        ,dl_account_name = None
+        ,dl_access_key = None
         ,sql_username = None
         ,sql_password = None
         ,sql_driver = 'ODBC Driver 18 for SQL Server'
         ,extract_logs_container_name = 'extract-logs' # name of the container where we will be storing extract logs
         ,extract_logs_path = 'extract_logs' # path to the delta table where we will be saving extract logs.
+        ,storage_backend = None # storage backend (see class_storage_backend.py). If it is None then the Azure Data Lake given by
+                                # dl_account_name and dl_access_key is used.
+        ,sql = None # object used for reading from the SQL db (SQL or its subclass). If it is None then it is created using the sql_* arguments.
+        ,metrics = None # LoadMetrics object collecting metrics of every stage of loads. If it is None then a new one is created.
     ):
+        # metrics are shared by all the objects used by loads, so every stage of a load is recorded in the same place (see the 
+        # LoadMetrics class)
+        metrics = metrics if metrics is not None else LoadMetrics()
+
+        # a single session (credential and pool of connections) or other storage backend is shared by all the objects working with 
+        # the Data Lake. self.dl (DeltaLake) is created by the ExtractLogs class using that backend.
         super().__init__(
-            account_name = dl_account_name
-            ,access_key = dl_access_key
-            ,container_name = extract_logs_container_name
+            container_name = extract_logs_container_name
             ,extract_logs_path = extract_logs_path
+            ,session = storage_backend if storage_backend is not None else StorageSession(dl_account_name, dl_access_key, metrics = metrics)
+            ,metrics = metrics
         )
 
-        self.sql = SQL(
-            server = sql_server
-            ,database = sql_database
-            ,username = sql_username
-            ,password = sql_password
-            ,driver = sql_driver
-        )
-        self.dl = DeltaLake(
-            account_name = dl_account_name
-            ,access_key = dl_access_key
-        )
+        if sql is not None:
+            self.sql = sql
+            self.sql.metrics = self.metrics
+        else:
+            self.sql = SQL(
+                server = sql_server
+                ,database = sql_database
+                ,username = sql_username
+                ,password = sql_password
+                ,driver = sql_driver
+                ,metrics = self.metrics
+            )
+
+        # maintenance (compaction, Z-ordering, checkpoints, vacuum) of the target tables
+        self.maintenance = DeltaMaintenance(self.dl)
+
+        # limits of the number of SQL connections used by loads and of the number of loads writing into the Data Lake at the same time. 
+        # They are set by the run_loads function, by default there are no limits.
+        self.sql_slots = nullcontext()
+        self.storage_slots = nullcontext()
+        self.max_sql_connections = None
+        # loads which need multiple SQL connections acquire their slots one at a time while holding this lock, so two such loads can't
+        # wait for each other's slots
+        self.sql_slots_lock = threading.Lock()
+
+
+    @contextmanager
+    def sql_connection_slots(
+        self
+        ,connections # number of SQL connections used at the same time
+    ):
+        """
+        Context manager holding one slot of the SQL connections limit (see the run_loads function) per connection. A load can't hold more
+        slots than the limit, so if it uses more connections then it holds all the slots.
+        """
+        if self.max_sql_connections is None:
+            yield
+            return
+
+        slots = self.sql_slots
+        connections = min(connections, self.max_sql_connections)
+        with self.sql_slots_lock:
+            for _ in range(connections):
+                slots.acquire()
+        try:
+            yield
+        finally:
+            for _ in range(connections):
+                slots.release()
 
 
     def full_load(
@@ -45,22 +106,312 @@ class DataIngestion(ExtractLogs):
         ,container_name # name of the container which contains our target table or where we want to create it.
         ,target_table_path # a full path (starting from the root) to the target table in a Data Lake.
         ,if_exists = 'overwrite' # 'overwrite' or 'pass'
+        ,batch_size = 100_000 # number of rows fetched from the source table at once
+        ,parallel_workers = 1 # number of connections used for reading the source table at the same time
+        ,split_column = None # numeric or date column used for splitting the source table into ranges. By default it is the primary key.
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+        ,chunks = None # number of chunks of a resumable load (see the resumable_full_load function). None means a regular load.
+        ,projection = None # columns read from the source table and their casts (see the select_list function). None means all the columns.
     ):
         """
         This function is inserting data into the target delta table in the Data Lake from the entire source table in SQL db.
 
+        Data is streamed from the source table to the target table in record batches of batch_size rows, so memory usage doesn't
+        depend on the size of the source table.
+
+        If parallel_workers > 1 then the source table is split into parallel_workers ranges of the split_column and those ranges are 
+        read concurrently, each one on its own connection. All of them are written into the target table in a single write, so they are 
+        committed together in one Delta transaction.
+
+        If partition_spec is given, then partition columns are added to every batch and the target table is partitioned by them.
+
+        If projection is given, then only the selected columns are read from the source table (see the select_list function).
+
+        If chunks is given, then the load is resumable: the source table is loaded in chunks and a rerun after a failure loads only chunks
+        which were not finished (see the resumable_full_load function).
+
         The if_exists argument determines what happens when the target table already exist. It can have one of the following values:
             - 'overwrite':  Overwrite the the target table.
             - 'pass':       Don't change the target table at all.
         """
 
-        if if_exists == 'overwrite':
-            source_table = self.sql.read_query(f'select * from {source_table_name}')
-            self.dl.write_deltalake(source_table, container_name, target_table_path)
-        elif if_exists == 'pass' and not self.file_exists(container_name, target_table_path):
-            query = f"select * from {source_table_name}"
-            source_table = self.sql.read_query(query)
-            self.dl.write_deltalake(source_table, container_name, target_table_path)
+        with self.metrics.table(target_table_path):
+            if if_exists == 'overwrite' or (
+                if_exists == 'pass' and not self.file_exists(container_name, target_table_path)
+            ):
+                if chunks:
+                    return self.resumable_full_load(
+                        source_table_name
+                        ,container_name
+                        ,target_table_path
+                        ,chunks = chunks
+                        ,split_column = split_column
+                        ,batch_size = batch_size
+                        ,parallel_workers = parallel_workers
+                        ,partition_spec = partition_spec
+                        ,projection = projection
+                    )
+
+                # data is streamed from SQL into the Data Lake, so the load needs both SQL connections (one per parallel worker) and a storage
+                # writer at the same time
+                with self.sql_connection_slots(parallel_workers), self.storage_slots, self.metrics.stage('full_load'):
+                    select_list = self.select_list(source_table_name, projection)
+
+                    if parallel_workers > 1:
+                        split_column = split_column or self.sql.primary_key_column(source_table_name)
+                        queries = self.range_queries(source_table_name, split_column, parallel_workers, select_list)
+                        source_table = self.sql.read_queries_reader(queries, parallel_workers, batch_size)
+                    else:
+                        source_table = self.sql.read_query_reader(f'select {select_list} from {source_table_name}', batch_size)
+
+                    if partition_spec:
+                        source_table = self.partitioned_reader(source_table, partition_spec)
+
+                    self.dl.write_deltalake(
+                        source_table
+                        ,container_name
+                        ,target_table_path
+                        ,partition_by = self.dl.partition_columns(partition_spec) or None
+                    )
+
+
+    def resumable_full_load(
+        self
+        ,source_table_name # name of the source table in a SQL db of the following format: <db_name>.<schema_name>.<table_name>
+        ,container_name # name of the container which contains our target table or where we want to create it.
+        ,target_table_path # a full path (starting from the root) to the target table in a Data Lake.
+        ,chunks = 16 # number of ranges of the split_column into which the source table is split
+        ,split_column = None # numeric or date column used for splitting the source table into ranges. By default it is the primary key.
+        ,batch_size = 100_000 # number of rows fetched from the source table at once
+        ,parallel_workers = 1 # number of chunks loaded at the same time, each one on its own connection
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+        ,projection = None # columns read from the source table and their casts (see the select_list function)
+    ):
+        """
+        This function is overwriting the target delta table with the entire source table, loading it in chunks which can be resumed after 
+        a failure.
+
+        The source table is split into chunks ranges of the split_column (see the range_queries function). Every chunk is written as Parquet 
+        files into the directory of the target table, without committing them, and a marker with the list of its files is saved in the 
+        _staging directory of the target table. When all the chunks are finished, their files are committed in a single Delta transaction 
+        which overwrites the target table, and files in the _staging directory are deleted. Until then readers see the previous version of the table.
+
+        If a load fails, then its rerun (with the same source table, split_column, chunks, partition_spec and projection) loads only chunks which don't 
+        have a marker. Ranges of the chunks are saved in the _staging/manifest.json file when the load starts, so a rerun uses the same ranges 
+        even if the source table has changed. If a rerun has different arguments, then the staged chunks are discarded. Files of chunks which 
+        failed in the middle are never committed and they are deleted by vacuum (see the DeltaMaintenance class).
+
+        It returns a dictionary with the number of chunks, the number of chunks loaded by previous runs and the number of loaded rows.
+        """
+        filesystem = self.dl.table_filesystem(container_name, target_table_path)
+        partition_by = self.dl.partition_columns(partition_spec) or None
+        split_column = split_column or self.sql.primary_key_column(source_table_name)
+        load_arguments = {
+            'source_table_name': source_table_name
+            ,'split_column': split_column
+            ,'chunks': chunks
+            ,'partition_spec': partition_spec
+            ,'projection': projection
+        }
+
+        manifest = self.read_staging_file(filesystem, 'manifest')
+        if manifest is not None and manifest['arguments'] != json.loads(json.dumps(load_arguments)):
+            # the deltalake storage handler doesn't support delete_dir_contents of pyarrow filesystems, so the whole directory is deleted
+            filesystem.delete_dir(self.staging_directory)
+            manifest = None
+
+        if manifest is None:
+            with self.sql_slots:
+                queries = self.range_queries(source_table_name, split_column, chunks, self.select_list(source_table_name, projection))
+            manifest = {
+                'arguments': load_arguments
+                ,'queries': [[query, self.encode_values(params)] for query, params in queries]
+                ,'schema': None
+            }
+            self.write_staging_file(filesystem, 'manifest', manifest)
+
+        markers = {}
+        for chunk in range(len(manifest['queries'])):
+            marker = self.read_staging_file(filesystem, f'chunk_{chunk:05d}')
+            if marker is not None:
+                markers[chunk] = marker
+        resumed_chunks = len(markers)
+
+        def load_chunk(chunk):
+            query, params = manifest['queries'][chunk]
+            schema = manifest['schema'] and pa.ipc.read_schema(pa.py_buffer(base64.b64decode(manifest['schema'])))
+
+            with self.metrics.table(target_table_path), self.sql_slots, self.storage_slots, self.metrics.stage('chunk_load') as stage:
+                source_table = self.sql.read_query_reader(query, batch_size, self.decode_values(params))
+                if partition_spec:
+                    source_table = self.partitioned_reader(source_table, partition_spec)
+                # all the chunks are written with the schema of the first one
+                if schema is not None and source_table.schema != schema:
+                    source_table = pa.RecordBatchReader.from_batches(schema, (batch.cast(schema) for batch in source_table))
+
+                parts = self.dl.write_parquet_parts(source_table, container_name, target_table_path, f'chunk-{chunk:05d}', partition_by)
+                stage['rows'] = sum(json.loads(part['stats'])['numRecords'] for part in parts)
+                stage['details'] = {'chunk': chunk}
+
+            if manifest['schema'] is None:
+                manifest['schema'] = base64.b64encode(source_table.schema.serialize().to_pybytes()).decode()
+                self.write_staging_file(filesystem, 'manifest', manifest)
+
+            markers[chunk] = {'rows': stage['rows'], 'parts': parts}
+            self.write_staging_file(filesystem, f'chunk_{chunk:05d}', markers[chunk])
+
+        pending_chunks = [chunk for chunk in range(len(manifest['queries'])) if chunk not in markers]
+
+        # the first chunk is loaded alone, so the schema of the table is known before the remaining chunks are loaded concurrently
+        if manifest['schema'] is None and pending_chunks:
+            load_chunk(pending_chunks.pop(0))
+
+        with ThreadPoolExecutor(max_workers = parallel_workers) as executor:
+            futures = [executor.submit(load_chunk, chunk) for chunk in pending_chunks]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+
+        schema = pa.ipc.read_schema(pa.py_buffer(base64.b64decode(manifest['schema'])))
+        with self.storage_slots:
+            self.dl.commit_parquet_parts(
+                container_name
+                ,target_table_path
+                ,[part for chunk in sorted(markers) for part in markers[chunk]['parts']]
+                ,schema
+                ,partition_by
+            )
+        filesystem.delete_dir(self.staging_directory)
+
+        return {
+            'chunks': len(manifest['queries'])
+            ,'resumed_chunks': resumed_chunks
+            ,'rows': sum(marker['rows'] for marker in markers.values())
+        }
+
+
+    # directory inside of the target table directory where progress of resumable loads is saved. The deltalake library ignores 
+    # directories which names start with '_'.
+    staging_directory = '_staging'
+
+
+    def read_staging_file(self, filesystem, name):
+        "Returns the content of the <name>.json file from the staging directory or None if it doesn't exist"
+        try:
+            with filesystem.open_input_file(f'{self.staging_directory}/{name}.json') as file:
+                return json.loads(file.read())
+        except FileNotFoundError:
+            return None
+
+
+    def write_staging_file(self, filesystem, name, content):
+        "Saves content as the <name>.json file in the staging directory"
+        # the stream of the deltalake filesystem accepts only bytes written by pyarrow, so they are written through a pyarrow buffer
+        with filesystem.open_output_stream(f'{self.staging_directory}/{name}.json') as file, pa.BufferedOutputStream(file, 1024 ** 2) as buffer:
+            buffer.write(json.dumps(content).encode())
+
+
+    def encode_values(self, values):
+        """
+        Converting query parameters into values which can be saved as JSON. Dates, datetimes and decimals are saved as 
+        {'type': <type>, 'value': <string>}.
+        """
+        if values is None:
+            return None
+
+        encoded = []
+        for value in values:
+            if isinstance(value, datetime.datetime):
+                value = {'type': 'datetime', 'value': value.isoformat()}
+            elif isinstance(value, datetime.date):
+                value = {'type': 'date', 'value': value.isoformat()}
+            elif isinstance(value, decimal.Decimal):
+                value = {'type': 'decimal', 'value': str(value)}
+            encoded.append(value)
+
+        return encoded
+
+
+    def decode_values(self, values):
+        "Converting query parameters saved by the encode_values function back into python values"
+        if values is None:
+            return None
+
+        decoders = {
+            'datetime': datetime.datetime.fromisoformat
+            ,'date': datetime.date.fromisoformat
+            ,'decimal': decimal.Decimal
+        }
+
+        return [decoders[value['type']](value['value']) if isinstance(value, dict) else value for value in values]
+
+
+    def partitioned_reader(
+        self
+        ,reader: pa.RecordBatchReader # batches read from the source table
+        ,partition_spec # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+    ) -> pa.RecordBatchReader:
+        """
+        This function returns a reader which adds partition columns to every batch read from the given reader.
+        """
+        # schema of the batches with partition columns, taken from an empty batch
+        schema = self.dl.add_partition_columns(reader.schema.empty_table(), partition_spec).schema
+
+        return pa.RecordBatchReader.from_batches(
+            schema
+            ,(self.dl.add_partition_columns(batch, partition_spec) for batch in reader)
+        )
+
+
+    def range_queries(
+        self
+        ,source_table_name # name of the source table in a SQL db of the following format: <db_name>.<schema_name>.<table_name>
+        ,split_column # numeric or date column used for splitting the source table into ranges
+        ,ranges_count # number of ranges
+        ,select_list = '*' # list of the columns read by the queries (see the select_list function)
+    ):
+        """
+        This function splits the source table into ranges_count ranges of equal width between the min and max value of the split_column and
+        returns a list of (query, params) tuples, one query per range. Rows where split_column is null are read together with the first range.
+
+        Only numeric and date / datetime columns can be split. For other columns (e.g. a text primary key) it raises an exception.
+        """
+
+        bounds = self.sql.read_query_arrow(f'select min({split_column}), max({split_column}) from {source_table_name}')
+        min_value, max_value = bounds.column(0)[0].as_py(), bounds.column(1)[0].as_py()
+
+        if min_value is None:
+            return [(f'select {select_list} from {source_table_name}', None)]
+
+        # only values which can be split into ranges of equal width are supported, e.g. text or uniqueidentifier keys are not
+        if isinstance(min_value, bool) or not isinstance(min_value, (int, float, decimal.Decimal, datetime.date)):
+            raise Exception(
+                f"Column {split_column} of {source_table_name} has values of type {type(min_value).__name__} which can't be split into ranges. "
+                "Give a numeric or date split_column explicitly."
+            )
+
+        # boundaries of the ranges. Integer columns are split on integer values.
+        if isinstance(min_value, int):
+            boundaries = [min_value + (max_value - min_value) * i // ranges_count for i in range(ranges_count + 1)]
+        else:
+            boundaries = [min_value + (max_value - min_value) * i / ranges_count for i in range(ranges_count + 1)]
+        boundaries = sorted(set(boundaries))
+
+        if len(boundaries) == 1:
+            return [(f'select {select_list} from {source_table_name}', None)]
+
+        queries = []
+        for i in range(len(boundaries) - 1):
+            last_range = i == len(boundaries) - 2
+            query = f"""
+                select {select_list} from {source_table_name}
+                where
+                    ({split_column} >= ? and {split_column} {'<=' if last_range else '<'} ?)
+                    {f'or {split_column} is null' if i == 0 else ''}
+            """
+            queries.append((query, [boundaries[i], boundaries[i + 1]]))
+
+        return queries
 
 
     def incr_load(
@@ -72,6 +423,9 @@ class DataIngestion(ExtractLogs):
         ,change_created_date_column # name of the column in the changes table indicating when the record was created
         ,pk # name of the primary key column in the source table
         ,deleted_col # name of the column in the changes table indicating if given record was deleted in the source table
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+        ,projection = None # columns read from the source and changes tables and their casts (see the select_list function)
+        ,commit_lag_seconds = 0 # changes created less than this number of seconds before the load are left for the next load
     ):
         """
         This function is loading data incrementally from the source table in the SQL db into the target delta table in the Data Lake using the changes table.
@@ -90,39 +444,768 @@ class DataIngestion(ExtractLogs):
 
         where PK is a primary key, 'deleted' column indicates if given record has been deleted, and col1 and col2 columns contains
         a new or modified values for that record.
+
+        If partition_spec is given, then the target table is partitioned according to it and merges rewrite only partitions which have 
+        any changes. The same partition_spec needs to be used for every load of a given table.
+
+        Only the columns of the target table (and the columns needed by the load) are read from the changes table, unless the columns 
+        are given in the projection (see the load_projection function).
+
+        Changes are read from the last extract date (the newest change_created_date_column value ingested so far) up to the current time of 
+        the SQL server minus commit_lag_seconds. A change which is committed after it was read, but whose change_created_date_column value 
+        is older than the new last extract date (e.g. a change created by a long-running transaction), is never ingested. commit_lag_seconds 
+        should be longer than transactions writing into the changes table, so such changes are still in the window of the next load.
+
+        It returns a dictionary with the number of rows which were updated, inserted and deleted in the target table.
         """
 
-        # if the target table doesn't exist yet, then create it and ingest into it the entire data from the source table.
-        # Otherwise don't do anything.
-        self.full_load(
-            source_table_name = source_table_name
-            ,container_name = container_name
-            ,target_table_path = target_table_path
-            ,if_exists = 'pass'
+        with self.metrics.table(target_table_path):
+            # if the target table doesn't exist yet, then create it and ingest into it the entire data from the source table.
+            # Otherwise don't do anything.
+            self.full_load(
+                source_table_name = source_table_name
+                ,container_name = container_name
+                ,target_table_path = target_table_path
+                ,if_exists = 'pass'
+                ,partition_spec = partition_spec
+                ,projection = projection
+            )
+
+            select_list = self.select_list(
+                changes_table_name
+                ,self.load_projection(container_name, target_table_path, partition_spec, projection)
+                ,required_columns = [pk, change_created_date_column, deleted_col]
+            )
+
+            # the newest change_created_date_column value which was ingested into our target table the last time
+            last_extract_date = self.find_last_extract_date(target_table_path)
+
+            with self.sql_slots:
+                # upper bound of the changes which will be ingested now, captured at the start of the load. Changes created after it will be
+                # ingested by the next load.
+                extract_upper_bound = self.sql.current_datetime() - datetime.timedelta(seconds = commit_lag_seconds)
+
+                # load data from the changes table between the last extract date and the upper bound. Both dates are passed as typed datetime2
+                # parameters, so SQL Server can seek on an index on the change_created_date_column and reuse the same plan for every load.
+                query = f"""
+                    select
+                        {select_list}
+                    from
+                        {changes_table_name}
+                    where
+                        {change_created_date_column} > ?
+                        and {change_created_date_column} <= ?
+                """
+                with self.metrics.stage('changes_fetch') as stage:
+                    changes_df = self.sql.read_query_arrow(query, params = [last_extract_date, extract_upper_bound])
+                    stage['rows'] = changes_df.num_rows
+                    stage['bytes'] = changes_df.nbytes
+
+            # the newest change which is ingested now. It will be the lower bound of the next load.
+            new_extract_date = pc.max(changes_df.column(change_created_date_column)).as_py()
+
+            # keep only the newest change of every record, so the merge gets one source row per key
+            with self.metrics.stage('latest_changes') as stage:
+                stage['rows'] = changes_df.num_rows
+                changes_df = self.latest_changes(changes_df, pk, change_created_date_column)
+                stage['details'] = {'rows_after': changes_df.num_rows}
+
+            with self.storage_slots:
+                # update the target table in Data Lake using the changes table
+                merge_metrics = self.dl.update_delta_table(
+                    changes_df
+                    ,container_name
+                    ,target_table_path
+                    ,pk
+                    ,deleted_col
+                    ,partition_spec
+                )
+
+                # update the last extracted date in extract logs for the given target table
+                if new_extract_date is not None:
+                    self.update_last_extract_date(target_table_path, new_extract_date)
+
+            return merge_metrics
+
+
+    def latest_changes(
+        self
+        ,changes: pa.Table # changes table
+        ,pk # name of the primary key column
+        ,change_created_date_column # name of the column in the changes table indicating when the record was created
+    ) -> pa.Table:
+        """
+        This function compacts the changes table so it contains only the newest change for every primary key.
+
+        It sorts the table by the primary key and by change_created_date_column descending and keeps the first row of every key. 
+        Everything is done using vectorized Arrow compute functions. If there are multiple changes of the same record with the same 
+        date, the one which was returned later by the query is kept.
+        """
+        if changes.num_rows < 2:
+            return changes
+
+        row_number_column = '__row_number'
+        changes = changes.append_column(row_number_column, pa.array(range(changes.num_rows), type = pa.int64()))
+
+        indices = pc.sort_indices(
+            changes
+            ,sort_keys = [
+                (pk, 'ascending')
+                ,(change_created_date_column, 'descending')
+                ,(row_number_column, 'descending')
+            ]
         )
+        changes = changes.take(indices).drop_columns([row_number_column])
+
+        # the first row of every key is the one which has a different key than the previous row
+        keys = changes.column(pk)
+        first_of_key = pc.fill_null(pc.not_equal(keys.slice(1), keys.slice(0, len(keys) - 1)), True)
+        mask = pa.concat_arrays([pa.array([True])] + first_of_key.chunks)
+
+        return changes.filter(mask)
+
+
+    def hash_incr_load(
+        self
+        ,source_table_name # name of the source table in the SQL db of the following format: <db_name>.<schema_name>.<table_name>
+        ,container_name # name of the container with the target table
+        ,target_table_path # path to the target table in Data Lake container
+        ,pk # name of the primary key column in the source table
+        ,hash_columns = None # list of columns which are compared. By default all the columns except of the primary key.
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+        ,keys_per_query = 1_000 # number of primary key values in a single query fetching changed rows
+        ,projection = None # columns read from the source table and their casts (see the select_list function)
+    ):
+        """
+        This function is loading data incrementally from a source table which doesn't have a changes table, by comparing hashes of its rows.
+
+        A hash of every row of the source table is calculated on the SQL side (see the SQL.row_hash_expression function) and only the primary 
+        keys and hashes are fetched. They are compared with the hash index of the target table, which is a delta table with the primary key 
+        and the hash of every row saved in the target table, stored in the _hash_index directory of the target table. Then:
+            - rows which are missing in the index or which have a different hash are inserted or updated,
+            - keys which are in the index but not in the source table are deleted,
+        in a single merge (see the DeltaLake.update_delta_table function). Only the changed rows are fetched from the SQL db, keys_per_query 
+        keys at a time. Finally the hash index is overwritten with the current hashes.
+
+        The first load of a table (or a load of a table without the hash index) fetches hashes of the whole source table and then the whole
+        table is loaded by the full_load function. Rows changed between those two queries have a different hash in the index than in the
+        target table, so they are loaded again by the next load.
+
+        Only the columns of the target table are hashed and read, unless the columns are given in the projection (see the load_projection 
+        function).
+
+        It returns a dictionary with the number of rows which were updated, inserted and deleted in the target table.
+        """
+        index_path = f"{target_table_path.rstrip('/')}/{self.hash_index_directory}"
+        hash_column = '__row_hash'
+
+        with self.metrics.table(target_table_path):
+            index_exists = self.file_exists(container_name, f'{index_path}/_delta_log')
+            initial_load = not index_exists or not self.file_exists(container_name, target_table_path)
+            if not initial_load:
+                projection = self.load_projection(container_name, target_table_path, partition_spec, projection)
+
+            if hash_columns is None:
+                hash_columns = [column for column in self.projected_columns(source_table_name, projection) if column != pk]
+            row_hash = self.sql.row_hash_expression(hash_columns)
+
+            # primary keys and hashes of all the rows of the source table
+            with self.sql_slots, self.metrics.stage('hash_fetch') as stage:
+                source_hashes = self.sql.read_query_arrow(f'select {pk}, {row_hash} as {hash_column} from {source_table_name}')
+                stage['rows'] = source_hashes.num_rows
+                stage['bytes'] = source_hashes.nbytes
+
+            if initial_load:
+                self.full_load(
+                    source_table_name = source_table_name
+                    ,container_name = container_name
+                    ,target_table_path = target_table_path
+                    ,if_exists = 'overwrite'
+                    ,partition_spec = partition_spec
+                    ,projection = projection
+                )
+                with self.storage_slots:
+                    self.dl.write_deltalake(self.hash_index_batches(source_hashes), container_name, index_path)
+
+                return {'rows_updated': 0, 'rows_inserted': source_hashes.num_rows, 'rows_deleted': 0}
+
+            with self.metrics.stage('hash_compare') as stage:
+                index = self.dl.read_deltalake(container_name, index_path, as_batches = True).read_all()
+                joined = source_hashes.join(
+                    index.rename_columns([pk, '__index_hash'])
+                    ,keys = pk
+                    ,join_type = 'full outer'
+                )
+                changed = joined.filter(pc.and_kleene(
+                    pc.is_valid(joined[hash_column])
+                    ,pc.or_kleene(pc.is_null(joined['__index_hash']), pc.not_equal(joined[hash_column], joined['__index_hash']))
+                )).column(pk)
+                deleted = joined.filter(pc.is_null(joined[hash_column])).column(pk)
+
+                stage['rows'] = joined.num_rows
+                stage['details'] = {'changed_keys': len(changed), 'deleted_keys': len(deleted)}
+
+            if len(changed) == 0 and len(deleted) == 0:
+                return {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+
+            # changed rows are fetched together with their hashes, so the index contains hashes of the rows which are saved in the target 
+            # table even if they change again in the meantime
+            with self.sql_slots, self.metrics.stage('changes_fetch') as stage:
+                select_list = self.select_list(source_table_name, projection, required_columns = [pk])
+                changed_keys = changed.to_pylist()
+                changed_rows = []
+                for i in range(0, len(changed_keys), keys_per_query):
+                    keys = changed_keys[i:i + keys_per_query]
+                    query = f"""
+                        select {select_list}, {row_hash} as {hash_column}
+                        from {source_table_name}
+                        where {pk} in ({', '.join('?' for _ in keys)})
+                    """
+                    changed_rows.append(self.sql.read_query_arrow(query, params = keys))
+
+                changed_rows = pa.concat_tables(changed_rows) if changed_rows else None
+                stage['rows'] = changed_rows.num_rows if changed_rows is not None else 0
+
+            merge_metrics = self.merge_keyed_changes(
+                container_name
+                ,target_table_path
+                ,pk
+                ,changed_rows.drop_columns([hash_column]) if changed_rows is not None else None
+                ,deleted
+                ,partition_spec
+            )
 
-        # date when the last time we were updating our target table (extracting data)
-        last_extract_date = self.find_last_extract_date(target_table_path)
+            with self.storage_slots:
+                # the new index contains current hashes of unchanged rows and hashes of the fetched rows. Keys which were changed but not 
+                # fetched (deleted in the meantime) keep their hashes, so they are deleted by the next load.
+                if changed_rows is not None:
+                    fetched_hashes = changed_rows.select([pk, hash_column])
+                    source_hashes = pa.concat_tables([
+                        source_hashes.filter(pc.invert(pc.is_in(source_hashes[pk], fetched_hashes[pk])))
+                        ,fetched_hashes.cast(source_hashes.schema)
+                    ])
+                self.dl.write_deltalake(self.hash_index_batches(source_hashes), container_name, index_path)
 
-        # load data from the changes table after the last extracted date
+            return merge_metrics
+
+
+    def tracked_incr_load(
+        self
+        ,source_table_name # name of the source table in the SQL db of the following format: <db_name>.<schema_name>.<table_name>
+        ,container_name # name of the container with the target table
+        ,target_table_path # path to the target table in Data Lake container
+        ,pk # name of the primary key column in the source table
+        ,mode = 'change_tracking' # 'change_tracking', 'cdc' or 'rowversion'
+        ,rowversion_column = None # name of the rowversion column of the source table (for the 'rowversion' mode)
+        ,capture_instance = None # name of the CDC capture instance (for the 'cdc' mode). By default it is <schema_name>_<table_name>.
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+        ,projection = None # columns read from the source table and their casts (see the select_list function)
+    ):
+        """
+        This function is loading data incrementally from the source table using changes tracked by SQL Server itself, so no changes table 
+        is needed and there is no risk of missing changes because of differences between clocks. The mode argument determines how changes 
+        are found:
+            - 'change_tracking': Change Tracking needs to be enabled for the source table. Changed keys are read from CHANGETABLE(CHANGES ...)
+                                 and joined with the source table. Keys which don't exist in the source table anymore are deleted.
+            - 'cdc':             Change Data Capture needs to be enabled for the source table (with net changes support). Net changes are 
+                                 read from the cdc.fn_cdc_get_net_changes_<capture_instance> function, including deletes.
+            - 'rowversion':      Rows with a rowversion value greater than the saved one are read (an index on the rowversion column makes 
+                                 it a range seek). Deletes can't be detected in this mode.
+        The version of the database (Change Tracking version, rowversion or LSN) up to which changes were loaded is saved as 
+        last_change_version in the extract logs. It is captured before changes are read, so changes made during a load are loaded again 
+        by the next load (merges are idempotent).
+
+        If there is no saved version, the target table doesn't exist or the saved version is older than the oldest version for which 
+        changes are still kept by SQL Server, then the whole table is loaded by the full_load function.
+
+        Source tables need to be in the database of the SQL connection, because the change tracking functions are database scoped.
+
+        Only the columns of the target table are read, unless the columns are given in the projection (see the load_projection function).
+
+        It returns a dictionary with the number of rows which were updated, inserted and deleted in the target table.
+        """
+        if mode not in ('change_tracking', 'cdc', 'rowversion'):
+            raise Exception(f"Unknown mode: {mode}")
+        if mode == 'rowversion' and rowversion_column is None:
+            raise Exception("rowversion_column needs to be given in the 'rowversion' mode")
+        if mode == 'cdc' and capture_instance is None:
+            capture_instance = '_'.join(source_table_name.split('.')[-2:])
+
+        with self.metrics.table(target_table_path):
+            last_version = self.find_last_change_version(target_table_path)
+
+            with self.sql_slots:
+                current_version, min_version = self.change_versions(source_table_name, mode, capture_instance)
+
+            if (
+                last_version is None
+                or (min_version is not None and last_version < min_version)
+                or not self.file_exists(container_name, target_table_path)
+            ):
+                self.full_load(
+                    source_table_name = source_table_name
+                    ,container_name = container_name
+                    ,target_table_path = target_table_path
+                    ,if_exists = 'overwrite'
+                    ,partition_spec = partition_spec
+                    ,projection = projection
+                )
+                self.update_last_change_version(target_table_path, current_version)
+
+                rows = self.dl.cached_delta_table(container_name, target_table_path).history(1)[0].get('operationMetrics', {}).get('num_added_rows')
+                return {'rows_updated': 0, 'rows_inserted': rows, 'rows_deleted': 0}
+
+            if current_version <= last_version:
+                return {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+
+            projection = self.load_projection(container_name, target_table_path, partition_spec, projection)
+
+            with self.sql_slots, self.metrics.stage('changes_fetch') as stage:
+                changes = self.tracked_changes(
+                    source_table_name
+                    ,pk
+                    ,mode
+                    ,last_version
+                    ,current_version
+                    ,rowversion_column
+                    ,capture_instance
+                    ,projection
+                )
+                stage['rows'] = changes.num_rows
+                stage['bytes'] = changes.nbytes
+                stage['details'] = {'mode': mode, 'from_version': last_version, 'to_version': current_version}
+
+            deleted = pc.equal(changes['__deleted'], 1)
+            merge_metrics = self.merge_keyed_changes(
+                container_name
+                ,target_table_path
+                ,pk
+                ,changes.filter(pc.invert(deleted)).drop_columns(['__deleted'])
+                ,changes.filter(deleted).column(pk)
+                ,partition_spec
+            )
+
+            self.update_last_change_version(target_table_path, current_version)
+
+            return merge_metrics
+
+
+    def change_versions(
+        self
+        ,source_table_name # name of the source table
+        ,mode # 'change_tracking', 'cdc' or 'rowversion' (see the tracked_incr_load function)
+        ,capture_instance = None # name of the CDC capture instance
+    ):
+        """
+        This function returns a tuple (current version, minimum valid version) of the source table as ints, where:
+            - 'change_tracking': the current Change Tracking version of the database and the minimum valid version of the table.
+            - 'cdc':             the maximum LSN of the database and the minimum LSN of the capture instance.
+            - 'rowversion':      min_active_rowversion() (the lowest rowversion which may still be committed) and None, because 
+                                 rowversion values are never cleaned up.
+        """
+        if mode == 'change_tracking':
+            query = 'select change_tracking_current_version() as current_version, change_tracking_min_valid_version(object_id(?)) as min_version'
+            params = [source_table_name]
+        elif mode == 'cdc':
+            query = 'select sys.fn_cdc_get_max_lsn() as current_version, sys.fn_cdc_get_min_lsn(?) as min_version'
+            params = [capture_instance]
+        else:
+            query = 'select min_active_rowversion() as current_version, null as min_version'
+            params = None
+
+        versions = self.sql.read_query_arrow(query, params = params).to_pylist()[0]
+        current_version, min_version = versions['current_version'], versions['min_version']
+
+        if current_version is None:
+            raise Exception(f"Changes of {source_table_name} are not tracked in the '{mode}' mode")
+
+        return self.version_to_int(current_version), self.version_to_int(min_version)
+
+
+    def tracked_changes(
+        self
+        ,source_table_name # name of the source table
+        ,pk # name of the primary key column
+        ,mode # 'change_tracking', 'cdc' or 'rowversion' (see the tracked_incr_load function)
+        ,from_version # version after which changes are read (exclusive)
+        ,to_version # version up to which changes are read
+        ,rowversion_column = None # name of the rowversion column
+        ,capture_instance = None # name of the CDC capture instance
+        ,projection = None # columns read from the source table and their casts (see the select_list function)
+    ) -> pa.Table:
+        """
+        This function reads changes of the source table between from_version and to_version. It returns a table with the columns of the 
+        source table and the __deleted column, which is 1 for keys deleted at the source (other columns of those rows are not used).
+        """
+        if mode == 'change_tracking':
+            # the current values of changed rows are read, so rows changed again after to_version are already loaded in their newest version
+            columns = [column for column in self.projected_columns(source_table_name, projection) if column != pk]
+            select_list = self.select_list(source_table_name, {**(projection or {}), 'columns': columns}, table_alias = 't')
+            query = f"""
+                select
+                    ct.[{pk}] as [{pk}]
+                    {', ' + select_list if columns else ''}
+                    ,case when t.[{pk}] is null then 1 else 0 end as __deleted
+                from
+                    changetable(changes {source_table_name}, ?) ct
+                    left join {source_table_name} t on t.[{pk}] = ct.[{pk}]
+            """
+            return self.sql.read_query_arrow(query, params = [from_version])
+
+        select_list = self.select_list(source_table_name, projection, required_columns = [pk])
+
+        if mode == 'cdc':
+            # operation 1 is a delete. Other operations (insert, update, merge) contain the newest values of the row.
+            query = f"""
+                select
+                    {select_list}
+                    ,case when [__$operation] = 1 then 1 else 0 end as __deleted
+                from
+                    cdc.fn_cdc_get_net_changes_{capture_instance}(sys.fn_cdc_increment_lsn(?), ?, 'all')
+            """
+            changes = self.sql.read_query_arrow(query, params = [self.int_to_version(from_version, 10), self.int_to_version(to_version, 10)])
+            return changes.drop_columns([column for column in changes.column_names if column.startswith('__$')])
+
+        # rowversion: from_version is the lowest rowversion which wasn't committed during the previous load, so it is inclusive
         query = f"""
             select
-                *
+                {select_list}
+                ,0 as __deleted
             from
-                {changes_table_name}
+                {source_table_name}
             where
-                {change_created_date_column} > '{last_extract_date}'
+                [{rowversion_column}] >= ?
+                and [{rowversion_column}] < ?
         """
-        changes_df = self.sql.read_query(query)
+        return self.sql.read_query_arrow(query, params = [self.int_to_version(from_version, 8), self.int_to_version(to_version, 8)])
+
+
+    def version_to_int(self, version):
+        "Converting a rowversion or LSN (big-endian binary values) into an int. Change Tracking versions are already ints."
+        if isinstance(version, (bytes, bytearray)):
+            return int.from_bytes(version, 'big')
+
+        return version
+
+
+    def int_to_version(self, version: int, length):
+        "Converting an int into a rowversion (length = 8) or LSN (length = 10) binary value"
+        return version.to_bytes(length, 'big')
+
+
+    def merge_keyed_changes(
+        self
+        ,container_name # name of the container with the target table
+        ,target_table_path # path to the target table in Data Lake container
+        ,pk # name of the primary key column
+        ,upserts: pa.Table # rows inserted or updated at the source (or None)
+        ,deleted_keys: pa.Array # primary keys of rows deleted at the source
+        ,partition_spec = None # partition specification of the target table (see the DeltaLake.add_partition_columns function)
+    ):
+        """
+        This function applies rows inserted or updated at the source and keys of rows deleted at the source to the target table in a single
+        merge (see the DeltaLake.update_delta_table function). Deleted rows are read from the target table, so the merge knows their 
+        partition columns and rewrites only the partitions which contain them.
+
+        It returns a dictionary with the number of rows which were updated, inserted and deleted in the target table.
+        """
+        deleted_col = '__deleted'
+        changes = []
+        if isinstance(deleted_keys, pa.ChunkedArray):
+            deleted_keys = deleted_keys.combine_chunks()
+
+        if upserts is not None and upserts.num_rows > 0:
+            changes.append(upserts.append_column(deleted_col, pa.repeat(0, upserts.num_rows)))
+
+        if len(deleted_keys) > 0:
+            source_columns = upserts.column_names if upserts is not None else self.delta_source_columns(container_name, target_table_path, partition_spec)
+            deleted_rows = self.dl.read_deltalake(
+                container_name
+                ,target_table_path
+                ,as_batches = True
+                ,columns = source_columns
+                ,predicate = pc.field(pk).isin(deleted_keys)
+            ).read_all()
+            deleted_rows = deleted_rows.append_column(deleted_col, pa.repeat(1, deleted_rows.num_rows))
+            changes.append(deleted_rows.cast(changes[0].schema) if changes else deleted_rows)
+
+        if not changes or sum(len(table) for table in changes) == 0:
+            return {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+
+        with self.storage_slots:
+            return self.dl.update_delta_table(
+                pa.concat_tables(changes)
+                ,container_name
+                ,target_table_path
+                ,pk
+                ,deleted_col
+                ,partition_spec
+            )
+
+
+    # directory inside of the target table directory where the hash index used by the hash_incr_load function is saved. The deltalake 
+    # library ignores directories which names start with '_'.
+    hash_index_directory = '_hash_index'
+
+
+    def hash_index_batches(self, hashes: pa.Table) -> pa.RecordBatchReader:
+        "Returns hashes as a stream of record batches, so they are written into multiple files of the hash index"
+        return pa.RecordBatchReader.from_batches(hashes.schema, hashes.to_batches(max_chunksize = 1_000_000))
+
+
+    def delta_source_columns(self, container_name, target_table_path, partition_spec):
+        "Returns columns of the target table without the partition columns added by the partition_spec"
+        added_columns = [
+            column for partition, column in zip(partition_spec or [], self.dl.partition_columns(partition_spec))
+            if partition.get('transform', 'identity') != 'identity'
+        ]
+        delta_table = self.dl.read_deltalake(container_name, target_table_path)
+
+        return [column for column in self.dl.delta_table_columns(delta_table) if column not in added_columns]
+
 
-        # update the target table in Data Lake using the changes table
-        self.dl.update_delta_table(
-            changes_df
-            ,container_name
-            ,target_table_path
-            ,pk
-            ,deleted_col
+    def load_projection(
+        self
+        ,container_name # name of the container with the target table
+        ,target_table_path # path to the target table in Data Lake container
+        ,partition_spec = None # partition specification of the target table
+        ,projection = None # projection given for the load (see the select_list function)
+    ):
+        """
+        This function returns the projection used by incremental loads of an existing target table. If projection doesn't have columns,
+        then the columns of the target table are used, so columns which are not saved in the target table (e.g. LOB columns added to the 
+        source table later) are not read. Merges ignore such columns anyway.
+        """
+        projection = dict(projection or {})
+        if projection.get('columns') is None:
+            projection['columns'] = self.delta_source_columns(container_name, target_table_path, partition_spec)
+
+        return projection
+
+
+    def projected_columns(
+        self
+        ,source_table_name # name of the source table
+        ,projection = None # see the select_list function
+        ,required_columns = None # columns which are always read
+    ):
+        """
+        This function returns names of the columns read from the source table with the given projection. If the projection doesn't have
+        columns, then the columns of the source table are read from SQL (without fetching any rows).
+        """
+        projection = projection or {}
+        columns = projection.get('columns')
+        if columns is None:
+            columns = self.sql.query_columns(f'select * from {source_table_name}').names
+
+        required_columns = required_columns or []
+        exclude_columns = projection.get('exclude_columns') or []
+
+        columns = list(columns) + [column for column in required_columns if column not in columns]
+
+        return [column for column in columns if column not in exclude_columns or column in required_columns]
+
+
+    def select_list(
+        self
+        ,source_table_name # name of the source table
+        ,projection = None # columns read from the source table and their casts, see below
+        ,required_columns = None # columns needed by the load (e.g. the primary key), which are always read
+        ,table_alias = None # alias of the source table in the query
+    ):
+        """
+        This function returns the list of columns of a select statement reading from the source table. projection is a dictionary with 
+        the following (optional) keys:
+            - 'columns':            list of columns which are read. By default all the columns of the source table.
+            - 'exclude_columns':    list of columns which are not read, e.g. LOB columns which are not needed in the Data Lake.
+            - 'casts':              dictionary {column: sql type} of columns which are cast at the source, so only the bytes which are 
+                                    stored are transferred, e.g. {'description': 'nvarchar(200)', 'amount': 'decimal(18, 2)'}. 
+                                    Cast columns keep their names.
+        For example: {'exclude_columns': ['document'], 'casts': {'description': 'nvarchar(200)'}}
+
+        If projection is empty, then it returns '*'.
+        """
+        prefix = f'{table_alias}.' if table_alias else ''
+
+        if not projection:
+            return f'{prefix}*'
+
+        casts = projection.get('casts') or {}
+
+        return ', '.join(
+            f'cast({prefix}[{column}] as {casts[column]}) as [{column}]' if column in casts else f'{prefix}[{column}]'
+            for column in self.projected_columns(source_table_name, projection, required_columns)
+        )
+
+
+    def export_to_sql(
+        self
+        ,container_name # name of the container with the source delta table
+        ,source_table_path # path to the source delta table in the Data Lake container
+        ,sql_table_name # name of the target SQL table
+        ,sql_schema_name # name of the schema of the target SQL table
+        ,columns = None # list of columns which will be exported. None means all the columns.
+        ,predicate = None # pyarrow.compute expression used for filtering exported rows, e.g. pc.field('deleted') == 0
+        ,incremental = True # if True then only files added since the last exported version are exported, when it is possible
+        ,batch_size = 50_000 # number of rows read from the delta table and inserted into SQL at once
+        ,tablock = False # whether to insert with the TABLOCK hint
+    ):
+        """
+        This function is exporting data from a delta table in the Data Lake into a SQL table (reverse ETL).
+
+        Data is streamed from the delta table in record batches of batch_size rows and every batch is bulk inserted into SQL (see the 
+        SQL.bulk_insert function), so memory usage doesn't depend on the size of the table. Only the given columns are read and the predicate 
+        is pushed down to partitions and Parquet statistics.
+
+        The exported version of the delta table is saved in the extract logs under the '<sql_schema_name>.<sql_table_name>' key. 
+        If incremental = True and all the commits since the last exported version only appended data, then only files added by those 
+        commits are appended into the SQL table. Otherwise (first export, merges, deletes, overwrites or compaction of the delta table) 
+        the whole table is exported and the SQL table is replaced using a staging table, so it is never partially loaded.
+
+        It returns a dictionary with the number of exported rows, seconds, rows per second, the exported version and 
+        the export mode ('full', 'incremental' or 'skipped' if there are no new versions).
+        """
+        delta_table = self.dl.cached_delta_table(container_name, source_table_path)
+
+        if delta_table is None:
+            raise Exception("Table doesn't exist")
+
+        export_log_key = f'{sql_schema_name}.{sql_table_name}'
+        version = delta_table.version()
+        last_exported_version = self.extract_logs.get(export_log_key, {}).get('last_exported_version')
+
+        files = None
+        if incremental and last_exported_version is not None:
+            if last_exported_version == version:
+                return {'rows': 0, 'seconds': 0, 'rows_per_second': None, 'version': version, 'mode': 'skipped'}
+
+            files = self.dl.appended_files(delta_table, last_exported_version)
+
+        source_table = self.dl.read_batches(
+            delta_table
+            ,columns = columns
+            ,predicate = predicate
+            ,files = files
+            ,batch_size = batch_size
         )
 
-        # update the last extracted data in extract logs for the given target table
-        self.update_last_extract_date(target_table_path)
\ No newline at end of file
+        with self.sql_slots:
+            metrics = self.sql.bulk_insert(
+                source_table
+                ,sql_table_name
+                ,sql_schema_name
+                ,if_exists = 'replace' if files is None else 'append'
+                ,batch_size = batch_size
+                ,tablock = tablock
+            )
+
+        self.update_extract_log(export_log_key, last_exported_version = version)
+
+        return {
+            **metrics
+            ,'version': version
+            ,'mode': 'full' if files is None else 'incremental'
+        }
+
+
+    def run_loads(
+        self
+        ,full_loads = None # list of dictionaries with arguments of the full_load function, one dictionary per table
+        ,incr_loads = None # list of dictionaries with arguments of the incr_load function, one dictionary per table
+        ,hash_incr_loads = None # list of dictionaries with arguments of the hash_incr_load function, one dictionary per table
+        ,tracked_incr_loads = None # list of dictionaries with arguments of the tracked_incr_load function, one dictionary per table
+        ,workers = 4 # number of tables loaded at the same time
+        ,max_sql_connections = None # maximum number of SQL connections used by loads at the same time. None means no limit.
+        ,max_storage_writers = None # maximum number of loads writing into the Data Lake at the same time. None means no limit.
+        ,maintain = False # if True then maintenance of every successfully loaded target table is performed after its load
+    ):
+        """
+        This function loads multiple tables concurrently using a pool of workers threads.
+
+        Tables are started from the one which took the longest time during the previous run (durations are saved in the extract logs),
+        so the longest loads don't end up at the end of the run. Tables which were never loaded before are started first.
+
+        It returns a list with a summary of every load of the following format:
+        [
+            {
+                'load_type': 'full', 'incremental', 'hash' or 'tracked'
+                ,'target_table_path': 'source_data/table1'
+                ,'status': 'succeeded' or 'failed'
+                ,'seconds': 12.3
+                ,'result': value returned by the load function (None if the load failed)
+                ,'error': repr of the exception (None if the load succeeded)
+                ,'stages': list of records of all the stages of the load (see the LoadMetrics class)
+            }
+            ,...
+        ]
+        A failure of one table doesn't stop loading other tables.
+
+        max_sql_connections counts connections and not loads: a full load with parallel_workers > 1 holds one slot per worker (at most all
+        the slots) and every chunk of a resumable load being loaded holds its own slot.
+
+        If maintain = True then after every successful load the target table is maintained using the self.maintenance object (see the 
+        DeltaMaintenance class), the thresholds of that object decide if it needs compaction. Tables loaded incrementally are Z-ordered 
+        by the primary key used for merges. A summary of maintenance is saved under the 'maintenance' key.
+        """
+        loads = (
+            [('full', self.full_load, kwargs) for kwargs in full_loads or []]
+            + [('incremental', self.incr_load, kwargs) for kwargs in incr_loads or []]
+            + [('hash', self.hash_incr_load, kwargs) for kwargs in hash_incr_loads or []]
+            + [('tracked', self.tracked_incr_load, kwargs) for kwargs in tracked_incr_loads or []]
+        )
+
+        # longest loads first, loads without a saved duration before all the others
+        def last_load_seconds(load):
+            seconds = self.extract_logs.get(load[2]['target_table_path'], {}).get('last_load_seconds')
+            return float('inf') if seconds is None else seconds
+
+        loads = sorted(loads, key = last_load_seconds, reverse = True)
+
+        def run_load(load_type, load_function, kwargs):
+            start_time = time.perf_counter()
+            summary = {
+                'load_type': load_type
+                ,'target_table_path': kwargs['target_table_path']
+                ,'result': None
+                ,'error': None
+            }
+
+            with self.metrics.table(kwargs['target_table_path']) as stages:
+                summary['stages'] = stages
+
+                try:
+                    summary['result'] = load_function(**kwargs)
+                    summary['status'] = 'succeeded'
+                except Exception as e:
+                    summary['status'] = 'failed'
+                    summary['error'] = repr(e)
+
+                summary['seconds'] = time.perf_counter() - start_time
+
+                if summary['status'] == 'succeeded':
+                    self.update_extract_log(kwargs['target_table_path'], last_load_seconds = summary['seconds'])
+
+                    if maintain:
+                        with self.storage_slots:
+                            summary['maintenance'] = self.maintenance.maintain(
+                                kwargs['container_name']
+                                ,kwargs['target_table_path']
+                                ,zorder_columns = [kwargs['pk']] if 'pk' in kwargs else None
+                            )
+
+            return summary
+
+        self.sql_slots = threading.BoundedSemaphore(max_sql_connections) if max_sql_connections else nullcontext()
+        self.storage_slots = threading.BoundedSemaphore(max_storage_writers) if max_storage_writers else nullcontext()
+        self.max_sql_connections = max_sql_connections or None
+
+        try:
+            with ThreadPoolExecutor(max_workers = workers) as executor:
+                futures = [executor.submit(run_load, *load) for load in loads]
+                summaries = [future.result() for future in futures]
+        finally:
+            self.sql_slots = nullcontext()
+            self.storage_slots = nullcontext()
+            self.max_sql_connections = None
+
+        return summaries
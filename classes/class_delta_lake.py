@@ -1,52 +1,112 @@
 """
 This is a class for working with delta tables (creating, writing data, reading data, updating them incrementally). It extends the AzureBlob class.
+
+DeltaTable objects are cached per table, so reading the same table again only loads the new versions of its transaction log 
+instead of replaying the log from the last checkpoint.
 """
 
 from class_azure_blob import AzureBlob
 
-from deltalake.writer import write_deltalake
+from deltalake.writer import write_deltalake, AddAction, DeltaJSONEncoder, DEFAULT_DATA_SKIPPING_NUM_INDEX_COLS
+from deltalake.writer import get_file_stats_from_metadata, get_partitions_from_path
+from deltalake._internal import write_new_deltalake
+from deltalake.fs import DeltaStorageHandler
 from deltalake import DeltaTable
+from deltalake.table import filters_to_expression
+from deltalake.exceptions import TableNotFoundError
+import deltalake
+from collections import OrderedDict
+import threading
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+from typing import Union
 import json
+import zlib
+import uuid
+import time
+
+# commit_parquet_parts uses internal functions of deltalake which change between releases. It was tested with this release line
+# (requirements.txt pins deltalake==0.25.5) and tests/test_resumable_full_load.py checks that committed parts can be read back.
+COMMIT_PARTS_DELTALAKE_VERSION = '0.25.'
 
 class DeltaLake(AzureBlob):
     def __init__(
         self
-        ,account_name # name of the Azure Storage Account (Data Lake)
-        ,access_key # access key to the Azure Storage Account (Data Lake)
+        ,account_name = None # name of the Azure Storage Account (Data Lake)
+        ,access_key = None # access key to the Azure Storage Account (Data Lake)
+        ,session = None # storage backend shared with other objects. If it is None then a new StorageSession is created.
+        ,max_cached_tables = 64 # maximum number of cached DeltaTable objects
+        ,metrics = None # LoadMetrics object shared with other objects. If it is None then a new one is created.
     ):
         super().__init__(
             account_name
             ,access_key
+            ,session
+            ,metrics
         )
 
-        self.account_name = account_name
-        self.access_key = access_key
+        # cache of DeltaTable objects of the following format: {table URI: DeltaTable}. The least recently used tables are dropped first.
+        self.max_cached_tables = max_cached_tables
+        self.delta_tables = OrderedDict()
+        self.delta_tables_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+    def table_uri(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table inside of a given container
+    ):
+        """
+        Returns the URI of the delta table which is used by the deltalake library.
+        """
+        return self.session.table_uri(container_name, path)
+
+
+    def storage_options(
+        self
+    ):
+        """
+        Returns storage options used by the deltalake library for connecting to the Data Lake.
+        """
+        return self.session.storage_options()
 
 
     def write_deltalake(
         self
-        ,df: pd.DataFrame # dataframe which we want to save as a delta table
+        ,data: Union[pd.DataFrame, pa.RecordBatchReader] # dataframe or a stream of record batches which we want to save as a delta table
         ,container_name # name of the container where we will save our delta table
         ,path # path where we will save our delta table inside of a given container
         ,mode = 'overwrite' # 'overwrite' or 'append'
+        ,schema_mode = None # None, 'merge' or 'overwrite'. It indicates what happens if data has a different schema than the existing table.
+        ,partition_by = None # list of columns by which the table is partitioned
     ):
         """
-        Function for saving a dataframe as a delta table in Data Lake.
+        Function for saving a dataframe or a stream of record batches as a delta table in Data Lake.
         The mode argument indicates what happens if the table already exists at the specified path.
+
+        When data is a RecordBatchReader, batches are written to Parquet files as they are read from the reader, so the whole
+        table is never kept in memory at once.
+
+        A 'delta_write' record is emitted with the number of written rows and operation metrics of the new version.
         """
         
-        storage_options = {
-            "account_name": self.account_name
-            ,"access_key": self.access_key
-        }
-        
-        write_deltalake(
-            f'abfss://{container_name}@{self.account_name}.dfs.core.windows.net/{path}'
-            ,df
-            ,storage_options = storage_options
-            ,mode = mode
-        )
+        with self.metrics.stage('delta_write') as stage:
+            write_deltalake(
+                self.table_uri(container_name, path)
+                ,data
+                ,storage_options = self.storage_options()
+                ,mode = mode
+                ,schema_mode = schema_mode
+                ,partition_by = partition_by
+            )
+
+            stage['details'] = self.cached_delta_table(container_name, path).history(1)[0].get('operationMetrics', {})
+            stage['rows'] = stage['details'].get('num_added_rows')
 
     
     def read_deltalake(
@@ -54,29 +114,448 @@ class DeltaLake(AzureBlob):
         ,container_name # name of the container where our delta table is saved from which we will read the data.
         ,path # path to the delta table from which we will read the data.
         ,to_pandas = False # if to_pandas = True then it will return a pandas.DataFrame instead of DeltaTable.
+        ,columns = None # list of columns to read. None means all the columns.
+        ,partitions = None # partition filters, e.g. [('year', '=', 2024), ('country', 'in', ['PL', 'DE'])]
+        ,predicate = None # row filter as a pyarrow.compute expression, e.g. pc.field('measure') > 10, or in the same format as partitions
+        ,version = None # version of the delta table to read (time travel). None means the latest version.
+        ,timestamp = None # datetime or ISO 8601 string. The newest version of the delta table committed before it is read.
+        ,as_batches = False # if as_batches = True then it will return a pyarrow.RecordBatchReader instead of DeltaTable.
+        ,batch_size = 100_000 # maximum number of rows in a batch returned by the RecordBatchReader
     ):
         """
         Read data from the delta table in Data Lake.
+
+        By default the latest version of the delta table is returned as a DeltaTable object. If to_pandas or as_batches is True then 
+        data is read and only the given columns are read. Partition filters skip whole files and the predicate is pushed down 
+        to Parquet statistics, so row groups which can't contain matching rows are not downloaded. With as_batches = True data is 
+        streamed in batches, so memory usage doesn't depend on the size of the table.
+
+        columns, partitions and predicate can't be applied to a DeltaTable object, so an exception is raised if they are given without
+        to_pandas or as_batches.
+
+        If version or timestamp is given then an older version of the table is loaded. That DeltaTable object is not cached.
         """
-        if not self.file_exists(container_name, path):
+        if not (to_pandas or as_batches) and (columns is not None or partitions is not None or predicate is not None):
+            raise Exception("columns, partitions and predicate can be used only with to_pandas = True or as_batches = True")
+
+        if version is not None or timestamp is not None:
+            delta_table = self.delta_table_version(container_name, path, version, timestamp)
+        else:
+            delta_table = self.cached_delta_table(container_name, path)
+
+        if delta_table is None:
             raise Exception("Table doesn't exist")
 
-        storage_options = {
-            "account_name": self.account_name
-            ,"access_key": self.access_key
-        }
-        
-        delta_table = DeltaTable(
-            f'abfss://{container_name}@{self.account_name}.dfs.core.windows.net/{path}'
-            ,storage_options = storage_options
-        )
+        if to_pandas or as_batches:
+            batches = self.read_batches(
+                delta_table
+                ,columns = columns
+                ,partitions = partitions
+                ,predicate = predicate
+                ,batch_size = batch_size
+            )
 
-        if to_pandas:
-            return delta_table.to_pandas()
+            if as_batches:
+                return batches
+            else:
+                return batches.read_pandas()
         else:
             return delta_table
 
+
+    def delta_table_version(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+        ,version = None # version of the delta table
+        ,timestamp = None # datetime or ISO 8601 string. The newest version of the delta table committed before it is loaded.
+    ):
+        """
+        This function returns a DeltaTable object loaded at the given version or timestamp. It returns None if the table doesn't exist.
+        """
+        try:
+            delta_table = DeltaTable(
+                self.table_uri(container_name, path)
+                ,version = version
+                ,storage_options = self.storage_options()
+            )
+        except TableNotFoundError:
+            return None
+
+        if timestamp is not None:
+            delta_table.load_as_version(timestamp)
+
+        return delta_table
+
+
+    def read_batches(
+        self
+        ,delta_table: DeltaTable # delta table from which we will read the data
+        ,columns = None # list of columns to read. None means all the columns.
+        ,partitions = None # partition filters, e.g. [('year', '=', 2024)]. Files from other partitions are not read.
+        ,predicate = None # pyarrow.compute expression or filters in the same format as partitions, used for filtering rows
+        ,files = None # list of data files (paths relative to the table root, as in DeltaTable.files()) to read. None means all the files.
+        ,batch_size = 100_000 # maximum number of rows in a batch
+    ) -> pa.RecordBatchReader:
+        """
+        This function returns a pyarrow.RecordBatchReader which streams data from the given version of a delta table, so memory usage 
+        doesn't depend on the size of the table. Only the given columns are read and the predicate is pushed down to partitions and
+        to Parquet statistics, so files and row groups which can't contain matching rows are skipped.
+        """
+        dataset = delta_table.to_pyarrow_dataset(partitions = partitions)
+
+        if files is not None:
+            files = set(files)
+            dataset = ds.FileSystemDataset(
+                [fragment for fragment in dataset.get_fragments() if fragment.path in files]
+                ,dataset.schema
+                ,dataset.format
+                ,dataset.filesystem
+            )
+
+        if isinstance(predicate, list):
+            predicate = filters_to_expression(predicate)
+
+        return dataset.scanner(columns = columns, filter = predicate, batch_size = batch_size).to_reader()
+
+
+    def appended_files(
+        self
+        ,delta_table: DeltaTable # delta table in the newest version which we are interested in
+        ,from_version # version of the delta table after which we are looking for new files
+    ):
+        """
+        This function returns a list of data files which were added to the delta table after from_version, if all the commits after 
+        that version only appended data. Otherwise (merges, deletes, overwrites, compaction) it returns None, because new files can 
+        contain rows which already existed in from_version and rows can be removed.
+
+        It returns None also if from_version can't be loaded anymore (e.g. its log files were cleaned up) or if it isn't older than the 
+        current version (e.g. the table was recreated after from_version).
+        """
+        if from_version >= delta_table.version():
+            return None
+
+        operations = [
+            commit for commit in delta_table.history(limit = delta_table.version() - from_version)
+            if commit['version'] > from_version
+        ]
+
+        for commit in operations:
+            appended = commit['operation'] == 'WRITE' and commit.get('operationParameters', {}).get('mode') == 'Append'
+            if not appended and commit['operation'] not in ('VACUUM START', 'VACUUM END'):
+                return None
+
+        try:
+            old_files = set(
+                DeltaTable(delta_table.table_uri, version = from_version, storage_options = self.storage_options()).files()
+            )
+        except Exception:
+            return None
+
+        return [file for file in delta_table.files() if file not in old_files]
+
+
+    def cached_delta_table(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+    ):
+        """
+        This function returns a DeltaTable object for the given table, updated to its latest version. It returns None if the table doesn't exist.
+
+        If the table was read before then the cached DeltaTable is updated by loading only the new versions of the transaction log. 
+        Otherwise a new DeltaTable is created and cached. Because of that, a table shouldn't be deleted and created again at the same path 
+        while this object is in use.
+        """
+        uri = self.table_uri(container_name, path)
+
+        with self.delta_tables_lock:
+            delta_table = self.delta_tables.get(uri)
+            if delta_table is not None:
+                self.delta_tables.move_to_end(uri)
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+        if delta_table is not None:
+            try:
+                delta_table.update_incremental()
+                return delta_table
+            except Exception:
+                # the table has been deleted since it was cached
+                with self.delta_tables_lock:
+                    self.delta_tables.pop(uri, None)
+
+        try:
+            delta_table = DeltaTable(uri, storage_options = self.storage_options())
+        except TableNotFoundError:
+            return None
+
+        with self.delta_tables_lock:
+            self.delta_tables[uri] = delta_table
+            if len(self.delta_tables) > self.max_cached_tables:
+                self.delta_tables.popitem(last = False)
+
+        return delta_table
+
+
+    def cache_info(
+        self
+    ):
+        """
+        Returns statistics of the DeltaTable cache.
+        """
+        return {
+            'hits': self.cache_hits
+            ,'misses': self.cache_misses
+            ,'size': len(self.delta_tables)
+            ,'max_size': self.max_cached_tables
+        }
+
     
+    def upsert_delta_table(
+        self
+        ,data: Union[pd.DataFrame, pa.Table] # records which we want to insert or update in the delta table
+        ,container_name # name of the container which contains the delta table
+        ,path # path to the delta table
+        ,key # name of the column identifying records
+        ,merge_schema = False # if True then columns from data which don't exist in the delta table are added to it
+    ):
+        """
+        This function updates records of the delta table which have the same key as records from data and inserts the remaining ones.
+        If the delta table doesn't exist yet then it is created from data.
+        """
+        delta_table = self.cached_delta_table(container_name, path)
+
+        if delta_table is None:
+            self.write_deltalake(data, container_name, path)
+            return
+
+        with self.metrics.stage('delta_upsert') as stage:
+            stage['rows'] = len(data)
+            stage['details'] = (
+                delta_table.merge(
+                    source = data
+                    ,predicate = f'target.{key} = source.{key}'
+                    ,source_alias = "source"
+                    ,target_alias = "target"
+                    ,merge_schema = merge_schema
+                )
+                .when_matched_update_all()
+                .when_not_matched_insert_all()
+                .execute()
+            )
+
+
+    def table_filesystem(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+    ) -> pa_fs.FileSystem:
+        """
+        Returns a pyarrow filesystem which root is the directory of the given delta table (it doesn't need to exist yet).
+        """
+        return pa_fs.PyFileSystem(DeltaStorageHandler(self.table_uri(container_name, path), self.storage_options()))
+
+
+    def write_parquet_parts(
+        self
+        ,data: pa.RecordBatchReader # data which will be written
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+        ,part_name # prefix of the names of the written files, unique for every call
+        ,partition_by = None # list of columns by which the delta table is partitioned
+    ):
+        """
+        This function writes data as Parquet files into the directory of a delta table without committing them, so they are not a part 
+        of the table until they are committed by the commit_parquet_parts function. If partition_by is given then files are written into
+        the partition directories.
+
+        It returns a list of written files, which can be saved as JSON, of the following format:
+        [{'path': 'year=2024/part-0-<uuid>-0.parquet', 'size': 1024, 'partition_values': {'year': '2024'}, 'stats': '<JSON statistics>'}, ...]
+        Statistics of the files are taken from the Parquet footers, the same way as the deltalake library does it.
+        """
+        parts = []
+
+        def visitor(written_file):
+            file_path, partition_values = get_partitions_from_path(written_file.path)
+            stats = get_file_stats_from_metadata(
+                written_file.metadata
+                ,num_indexed_cols = DEFAULT_DATA_SKIPPING_NUM_INDEX_COLS
+                ,columns_to_collect_stats = None
+            )
+            parts.append({
+                'path': file_path
+                ,'size': written_file.size
+                ,'partition_values': partition_values
+                ,'stats': json.dumps(stats, cls = DeltaJSONEncoder)
+            })
+
+        partitioning = None
+        if partition_by:
+            partitioning = ds.partitioning(pa.schema([data.schema.field(column) for column in partition_by]), flavor = 'hive')
+
+        ds.write_dataset(
+            data
+            ,base_dir = '/'
+            ,basename_template = f'{part_name}-{uuid.uuid4()}-{{i}}.parquet'
+            ,format = 'parquet'
+            ,partitioning = partitioning
+            ,file_visitor = visitor
+            ,existing_data_behavior = 'overwrite_or_ignore'
+            ,filesystem = self.table_filesystem(container_name, path)
+        )
+
+        return parts
+
+
+    def commit_parquet_parts(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+        ,parts # list of files written by the write_parquet_parts function
+        ,schema: pa.Schema # schema of the files
+        ,partition_by = None # list of columns by which the delta table is partitioned
+    ):
+        """
+        This function commits files written by the write_parquet_parts function as a new version of the delta table, overwriting its current
+        content (the table is created if it doesn't exist). All the files become visible at once in a single Delta transaction.
+
+        The deltalake library doesn't have a public function for committing existing files, so the functions used by its pyarrow writer 
+        are used. They are internal and change between releases, so other releases than the tested one are rejected.
+        """
+        if not deltalake.__version__.startswith(COMMIT_PARTS_DELTALAKE_VERSION):
+            raise Exception(
+                f"commit_parquet_parts uses internal functions of deltalake {COMMIT_PARTS_DELTALAKE_VERSION}x, "
+                f"but deltalake {deltalake.__version__} is installed"
+            )
+
+        add_actions = [
+            AddAction(part['path'], part['size'], part['partition_values'], int(time.time() * 1000), True, part['stats'])
+            for part in parts
+        ]
+        delta_table = self.cached_delta_table(container_name, path)
+
+        with self.metrics.stage('delta_commit') as stage:
+            stage['rows'] = sum(json.loads(part['stats'])['numRecords'] for part in parts)
+            stage['bytes'] = sum(part['size'] for part in parts)
+
+            if delta_table is None:
+                write_new_deltalake(
+                    self.table_uri(container_name, path)
+                    ,schema
+                    ,add_actions
+                    ,'overwrite'
+                    ,partition_by or []
+                    ,None
+                    ,None
+                    ,None
+                    ,self.storage_options()
+                    ,None
+                )
+            else:
+                delta_table._table.create_write_transaction(add_actions, 'overwrite', partition_by or [], schema, None)
+                delta_table.update_incremental()
+
+
+    def partition_columns(
+        self
+        ,partition_spec # list of partitions specifications (see the add_partition_columns function)
+    ):
+        """
+        This function returns names of the columns by which a table with the given partition_spec is partitioned.
+        """
+        columns = []
+
+        for partition in partition_spec or []:
+            transform = partition.get('transform', 'identity')
+            columns.append(partition['column'] if transform == 'identity' else f"{partition['column']}_{transform}")
+
+        return columns
+
+
+    def add_partition_columns(
+        self
+        ,data: Union[pa.Table, pa.RecordBatch] # data to which we add partition columns
+        ,partition_spec # list of partitions specifications
+    ):
+        """
+        This function adds to data the columns by which the table is partitioned, according to the partition_spec. partition_spec is a list of
+        dictionaries, one for every level of partitioning, of the following format:
+            - {'column': 'region'}:                                 partition by values of the 'region' column.
+            - {'column': 'created_date', 'transform': 'year'}:      partition by the year of the 'created_date' column. The partition column is
+                                                                    called 'created_date_year' and has values like 2024. Transforms 'month' 
+                                                                    (values like 202401) and 'day' (values like 20240115) work the same way.
+            - {'column': 'ID', 'transform': 'bucket', 'buckets': 16}:   partition by a hash of the 'ID' column into 16 buckets. The partition 
+                                                                        column is called 'ID_bucket' and has values from 0 to 15.
+
+        Partition columns need to be derived from columns which don't change for a given record (like the primary key or a creation date),
+        otherwise a modified record would end up in two partitions.
+        """
+        for partition, partition_column in zip(partition_spec or [], self.partition_columns(partition_spec)):
+            transform = partition.get('transform', 'identity')
+            if transform == 'identity':
+                continue
+
+            values = data.column(partition['column'])
+            if isinstance(values, pa.ChunkedArray):
+                values = values.combine_chunks()
+
+            if transform == 'year':
+                partition_values = pc.year(values)
+            elif transform == 'month':
+                partition_values = pc.add(pc.multiply(pc.year(values), 100), pc.month(values))
+            elif transform == 'day':
+                partition_values = pc.add(
+                    pc.add(pc.multiply(pc.year(values), 10000), pc.multiply(pc.month(values), 100))
+                    ,pc.day(values)
+                )
+            elif transform == 'bucket':
+                buckets = partition['buckets']
+                if not pa.types.is_integer(values.type):
+                    # hash values of other types (like strings) with a hash which doesn't change between runs
+                    values = pa.array(
+                        [None if value is None else zlib.crc32(str(value).encode()) for value in values.to_pylist()]
+                        ,type = pa.int64()
+                    )
+                partition_values = pc.abs(pc.subtract(values, pc.multiply(pc.divide(values, buckets), buckets)))
+            else:
+                raise Exception(f"Unknown partition transform: {transform}")
+
+            data = data.append_column(partition_column, pc.cast(partition_values, pa.int32()))
+
+        return data
+
+
+    def partition_predicate(
+        self
+        ,data: pa.Table # data which will be merged into the table
+        ,partition_spec # list of partitions specifications (see the add_partition_columns function)
+    ):
+        """
+        This function returns a predicate on the partition columns of the target table which matches only the partitions with values 
+        present in data (which needs to contain partition columns already). Adding it to a merge predicate makes the merge read and 
+        rewrite only those partitions.
+        """
+        predicates = []
+
+        for partition_column in self.partition_columns(partition_spec):
+            values = pc.unique(data.column(partition_column)).to_pylist()
+            literals = [
+                str(value) if isinstance(value, (int, float)) else "'" + str(value).replace("'", "''") + "'"
+                for value in values if value is not None
+            ]
+
+            if len(literals) == 0:
+                predicates.append(f'target.{partition_column} is null')
+            elif None in values:
+                predicates.append(f"(target.{partition_column} in ({', '.join(literals)}) or target.{partition_column} is null)")
+            else:
+                predicates.append(f"target.{partition_column} in ({', '.join(literals)})")
+
+        return ' and '.join(predicates)
+
+
     def delta_table_columns(self, delta_table: DeltaTable):
         """
         This function returns a list of column names for a given delta table.
@@ -90,11 +569,12 @@ class DeltaLake(AzureBlob):
 
     def update_delta_table(
         self
-        ,changes_df: pd.DataFrame  # changes table which contains data about what changes happened to the source table
+        ,changes_df: Union[pd.DataFrame, pa.Table]  # changes table which contains data about what changes happened to the source table
         ,container_name # name of the container which contains the table which we want to update
         ,target_table_path # path to the target delta table which will be updated based on the changes_df table
         ,pk # name of the primary key
         ,deleted_col # name of the column from the changes_df table indicating if given record was deleted in the source table
+        ,partition_spec = None # partition specification of the target table (see the add_partition_columns function)
     ):
         """
         This function is incrementally ingesting data from the source table into the target one using the changes table.
@@ -113,56 +593,53 @@ class DeltaLake(AzureBlob):
 
         where PK is a primary key, 'deleted' column indicates if given record has been deleted, and col1 and col2 columns contains
         a new or modified values for that record.
+
+        If the target table is partitioned (partition_spec is not None), then the merge predicate contains also a predicate on the partition 
+        columns, so only partitions which have any changes are read and rewritten.
+
+        It returns a dictionary with the number of rows which were updated, inserted and deleted in the target table. All the metrics of 
+        the merge are emitted in a 'delta_merge' record.
         """
         
         target_dt = self.read_deltalake(container_name, target_table_path)
         target_dt_columns = self.delta_table_columns(target_dt)
 
-        # update records in the target table which were modified at the source
-        (
-            target_dt.merge(
-                source = changes_df
-                ,predicate = f"""
-                    target.{pk} = source.{pk}
-                    and source.{deleted_col} = 0
-                """
-                ,source_alias = "source"
-                ,target_alias = "target"
-            )
-            .when_matched_update(
-                updates = {col: f'source.{col}' for col in target_dt_columns}
-            )
-            .execute()
-        )
+        predicate = f'target.{pk} = source.{pk}'
 
-        # insert into the target table new records from the source
-        (
-            target_dt.merge(
-                source = changes_df
-                ,predicate = f"""
-                    target.{pk} = source.{pk}
-                """
-                ,source_alias = "source"
-                ,target_alias = "target"
-            )
-            .when_not_matched_insert(
-                updates = {col: f'source.{col}' for col in target_dt_columns}
-            )
-            .execute()
-        )
+        if partition_spec:
+            if isinstance(changes_df, pd.DataFrame):
+                changes_df = pa.Table.from_pandas(changes_df, preserve_index = False)
+            changes_df = self.add_partition_columns(changes_df, partition_spec)
+            predicate = f'{self.partition_predicate(changes_df, partition_spec)} and {predicate}'
 
-        # delete records from the target table which were deleted at the source
-        (
-            target_dt.merge(
-                source = changes_df
-                ,predicate = f"""
-                    target.{pk} = source.{pk}
-                """
-                ,source_alias = "source"
-                ,target_alias = "target"
-            )
-            .when_matched_delete(
-                predicate = f'source.{deleted_col} = 1'
+        # update records modified at the source, delete records deleted at the source and insert new records from the source
+        # in a single merge, so the target table is scanned and rewritten only once and only one new version of it is created.
+        with self.metrics.stage('delta_merge') as stage:
+            metrics = (
+                target_dt.merge(
+                    source = changes_df
+                    ,predicate = predicate
+                    ,source_alias = "source"
+                    ,target_alias = "target"
+                )
+                .when_matched_update(
+                    updates = {col: f'source.{col}' for col in target_dt_columns}
+                    ,predicate = f'source.{deleted_col} = 0'
+                )
+                .when_matched_delete(
+                    predicate = f'source.{deleted_col} = 1'
+                )
+                .when_not_matched_insert(
+                    updates = {col: f'source.{col}' for col in target_dt_columns}
+                    ,predicate = f'source.{deleted_col} = 0'
+                )
+                .execute()
             )
-            .execute()
-        )
\ No newline at end of file
+            stage['rows'] = len(changes_df)
+            stage['details'] = metrics
+
+        return {
+            'rows_updated': metrics['num_target_rows_updated']
+            ,'rows_inserted': metrics['num_target_rows_inserted']
+            ,'rows_deleted': metrics['num_target_rows_deleted']
+        }
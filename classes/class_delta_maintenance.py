@@ -0,0 +1,214 @@
+"""
+This is a class for maintaining delta tables (compacting small files, Z-ordering, creating checkpoints, vacuuming). It is used by the 
+DataIngestion and ExtractLogs classes and it can be also run on a schedule (see the data_processing/data_lake_maintenance.py script).
+
+Every incremental load and every update of extract logs adds a few small Parquet files and a new version to the transaction log of a table.
+Over time this slows down reads and merges, so when a table has too many small files (by their number or their total size) or too many 
+versions since the last checkpoint, this class rewrites the small files into bigger ones, creates a checkpoint and removes files which are 
+no longer used. Z-ordering rewrites the whole table, so it is used instead of a plain compaction only when enough data was added since the 
+last OPTIMIZE.
+"""
+
+from class_delta_lake import DeltaLake
+
+from deltalake.fs import DeltaStorageHandler
+import pyarrow.compute as pc
+import json
+
+class DeltaMaintenance:
+    def __init__(
+        self
+        ,dl: DeltaLake # object used for reading delta tables
+        ,small_file_size = 32 * 1024 ** 2 # files smaller than this number of bytes are considered small
+        ,max_small_files = 20 # number of small files in a table above which the table is compacted
+        ,max_small_files_bytes = 256 * 1024 ** 2 # total size in bytes of small files in a table above which the table is compacted
+        ,min_zorder_new_data_ratio = 0.1 # part of the table size which has to be added since the last OPTIMIZE to Z-order the table
+        ,optimize_history_limit = 100 # number of the latest commits of a table searched for the last OPTIMIZE
+        ,max_versions_since_checkpoint = 50 # number of versions since the last checkpoint above which a new checkpoint is created
+        ,vacuum_retention_hours = 168 # files removed from the table earlier than this number of hours ago are deleted. None means no vacuum.
+        ,target_file_size = None # size in bytes of files created by compaction. None means the deltalake default.
+    ):
+        self.dl = dl
+        self.small_file_size = small_file_size
+        self.max_small_files = max_small_files
+        self.max_small_files_bytes = max_small_files_bytes
+        self.min_zorder_new_data_ratio = min_zorder_new_data_ratio
+        self.optimize_history_limit = optimize_history_limit
+        self.max_versions_since_checkpoint = max_versions_since_checkpoint
+        self.vacuum_retention_hours = vacuum_retention_hours
+        self.target_file_size = target_file_size
+
+        # last OPTIMIZE of the checked tables, so only commits added since the previous check are searched, of the following format:
+        # {table uri: (version of the table when it was checked, commit timestamp of the last OPTIMIZE or None)}
+        self.optimize_commits = {}
+
+
+    def table_stats(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+        ,bytes_since_optimize = False # if True then the size of files added after the last OPTIMIZE is also returned
+    ):
+        """
+        This function returns statistics of a delta table used to decide if it needs maintenance:
+        {
+            'version': current version of the table
+            ,'files': number of files
+            ,'size_bytes': total size of the files
+            ,'small_files': number of files smaller than small_file_size
+            ,'small_files_bytes': total size of the small files
+            ,'bytes_since_optimize': total size of the files added after the last OPTIMIZE (None unless bytes_since_optimize is True)
+            ,'versions_since_checkpoint': number of versions created after the last checkpoint
+        }
+        """
+        delta_table = self.dl.read_deltalake(container_name, path)
+        add_actions = delta_table.get_add_actions(flatten = True)
+        file_sizes = add_actions.column('size_bytes')
+        small_files = pc.less(file_sizes, self.small_file_size)
+
+        return {
+            'version': delta_table.version()
+            ,'files': len(file_sizes)
+            ,'size_bytes': pc.sum(file_sizes).as_py() or 0
+            ,'small_files': pc.sum(small_files).as_py() or 0
+            ,'small_files_bytes': pc.sum(pc.filter(file_sizes, small_files)).as_py() or 0
+            ,'bytes_since_optimize': self.bytes_since_optimize(delta_table, add_actions) if bytes_since_optimize else None
+            ,'versions_since_checkpoint': delta_table.version() - self.last_checkpoint_version(delta_table)
+        }
+
+
+    def bytes_since_optimize(
+        self
+        ,delta_table
+        ,add_actions = None # flattened add actions of the delta table, if they were already read
+    ):
+        """
+        This function returns the total size of the files added to a delta table after its last OPTIMIZE (all the files if the table 
+        wasn't optimized within the last optimize_history_limit commits).
+        """
+        if add_actions is None:
+            add_actions = delta_table.get_add_actions(flatten = True)
+        file_sizes = add_actions.column('size_bytes')
+
+        last_optimize_timestamp = self.last_optimize_timestamp(delta_table)
+        if last_optimize_timestamp is not None:
+            # files created by OPTIMIZE have a modification time not later than its commit
+            file_sizes = pc.filter(
+                file_sizes
+                ,pc.greater(add_actions.column('modification_time').cast('int64'), last_optimize_timestamp)
+            )
+
+        return pc.sum(file_sizes).as_py() or 0
+
+
+    def last_optimize_timestamp(
+        self
+        ,delta_table
+    ):
+        """
+        This function returns the commit timestamp (milliseconds since the epoch) of the last OPTIMIZE of a delta table, or None if 
+        the table wasn't optimized within the last optimize_history_limit commits. Only commits added since the previous check of the 
+        table are read, so the cost doesn't grow with the history of the table.
+        """
+        version = delta_table.version()
+        checked_version, timestamp = self.optimize_commits.get(delta_table.table_uri, (-1, None))
+        if checked_version > version:
+            # the table was recreated since the previous check
+            checked_version, timestamp = -1, None
+
+        limit = min(version - checked_version, self.optimize_history_limit)
+        if limit > 0:
+            for commit in delta_table.history(limit = limit):
+                if commit.get('operation') == 'OPTIMIZE':
+                    timestamp = commit['timestamp']
+                    break
+
+        self.optimize_commits[delta_table.table_uri] = (version, timestamp)
+        return timestamp
+
+
+    def last_checkpoint_version(
+        self
+        ,delta_table
+    ):
+        """
+        This function returns the version of the last checkpoint of a delta table, or -1 if the table doesn't have any checkpoint yet.
+        """
+        storage = DeltaStorageHandler(delta_table.table_uri, self.dl.storage_options())
+
+        try:
+            last_checkpoint = json.loads(storage.open_input_file('_delta_log/_last_checkpoint').read())
+        except FileNotFoundError:
+            return -1
+
+        return last_checkpoint['version']
+
+
+    def maintain(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table
+        ,zorder_columns = None # list of columns (for example the primary key used for merges) by which files are Z-ordered during compaction
+        ,force = False # if True then the table is compacted, checkpointed and vacuumed regardless of the thresholds
+    ):
+        """
+        This function performs maintenance of a delta table:
+            - If the table has more than max_small_files small files or its small files have more than max_small_files_bytes bytes, 
+              they are compacted into bigger ones. If zorder_columns are given and at least min_zorder_new_data_ratio of the table was
+              added since the last OPTIMIZE, the table is Z-ordered by them instead, so merges on those columns need to read fewer files.
+            - If the table was compacted or it has more than max_versions_since_checkpoint versions since the last checkpoint, a new 
+              checkpoint is created and expired transaction log files are removed.
+            - If the table was compacted, files which are no longer used by the table and were removed from it earlier than 
+              vacuum_retention_hours ago are deleted.
+
+        It returns a dictionary with the statistics of the table before maintenance and with a summary of what was done.
+        The summary is also emitted in a 'delta_maintenance' record.
+        """
+        with self.dl.metrics.stage('delta_maintenance') as stage:
+            stats = self.table_stats(container_name, path)
+            delta_table = self.dl.read_deltalake(container_name, path)
+            report = {
+                'stats': stats
+                ,'optimize': None
+                ,'checkpoint': False
+                ,'vacuumed_files': 0
+            }
+
+            needs_compaction = (
+                stats['small_files'] > self.max_small_files
+                or stats['small_files_bytes'] > self.max_small_files_bytes
+            )
+            # the size of new data is checked only when the table is going to be compacted
+            needs_zorder = False
+            if zorder_columns and force:
+                needs_zorder = True
+            elif zorder_columns and needs_compaction:
+                stats['bytes_since_optimize'] = self.bytes_since_optimize(delta_table)
+                needs_zorder = stats['bytes_since_optimize'] >= self.min_zorder_new_data_ratio * stats['size_bytes']
+
+            if force or needs_compaction:
+                if needs_zorder:
+                    report['optimize'] = delta_table.optimize.z_order(zorder_columns, target_size = self.target_file_size)
+                else:
+                    report['optimize'] = delta_table.optimize.compact(target_size = self.target_file_size)
+
+            if force or report['optimize'] is not None or stats['versions_since_checkpoint'] > self.max_versions_since_checkpoint:
+                delta_table.create_checkpoint()
+                delta_table.cleanup_metadata()
+                report['checkpoint'] = True
+
+            if self.vacuum_retention_hours is not None and (force or report['optimize'] is not None):
+                report['vacuumed_files'] = len(delta_table.vacuum(
+                    retention_hours = self.vacuum_retention_hours
+                    ,dry_run = False
+                ))
+
+            stage['details'] = {
+                'files': stats['files']
+                ,'compacted': report['optimize'] is not None
+                ,'z_ordered': report['optimize'] is not None and needs_zorder
+                ,'checkpoint': report['checkpoint']
+                ,'vacuumed_files': report['vacuumed_files']
+            }
+
+        return report
@@ -2,36 +2,66 @@
 This is a class for working with extract logs which are used for incremental load. This class is a parent to the DataIngestion class.
 
 Extract logs contains information about when the last time data was ingested from the source into the target table. It is used to determine
-which records needs to be ingested into the target table.
+which records needs to be ingested into the target table. The last extract date is the newest value of the change created date column which 
+was ingested into the target table and it is stored as a timestamp.
+
+Extract logs are kept in memory in a dictionary indexed by the table path, so looking up a table doesn't depend on the number of tables in
+the logs. When a record of a single table changes, only that record is upserted into the extract logs delta table and the table is compacted 
+from time to time, so the cost of saving the logs doesn't grow with the number of tables or with the number of loads.
 """
 
 from class_azure_blob import AzureBlob
 from class_delta_lake import DeltaLake
+from class_delta_maintenance import DeltaMaintenance
 
-import pandas as pd
-import os
+import pyarrow as pa
+import threading
 from datetime import datetime
+import decimal
 
 class ExtractLogs(AzureBlob):
+    # schema of the extract logs delta table
+    extract_logs_schema = pa.schema([
+        ('table_path', pa.string())
+        ,('last_extract_date', pa.timestamp('us'))
+        ,('last_load_seconds', pa.float64())
+        ,('last_exported_version', pa.int64())
+        # Change Tracking version, rowversion or CDC LSN of the last tracked incremental load. LSNs have 10 bytes, so they don't fit into int64.
+        ,('last_change_version', pa.decimal128(38, 0))
+    ])
+
     def __init__(
         self
-        ,account_name # name of the Azure Storage Account (Data Lake)
-        ,access_key # access key to the Azure Storage Account (Data Lake)
+        ,account_name = None # name of the Azure Storage Account (Data Lake)
+        ,access_key = None # access key to the Azure Storage Account (Data Lake)
         ,container_name = 'extract-logs' # name of the container where we will be storing extract logs
         ,extract_logs_path = 'extract_logs' # a full path (starting from the root) to the delta table where we will be saving extract logs.
+        ,extract_logs_max_files = 20 # number of files in the extract logs delta table above which that table is compacted
+        ,session = None # storage backend shared with other objects. If it is None then a new StorageSession is created.
+        ,metrics = None # LoadMetrics object shared with other objects. If it is None then a new one is created.
     ):
         super().__init__(
             account_name
             ,access_key
+            ,session
+            ,metrics
         )
 
-        self.dl = DeltaLake(
-            account_name
-            ,access_key
+        self.dl = DeltaLake(session = self.session, metrics = self.metrics)
+        # extract logs are compacted when they have more than extract_logs_max_files files. All of them are small.
+        self.extract_logs_maintenance = DeltaMaintenance(
+            self.dl
+            ,max_small_files = extract_logs_max_files
         )
 
         self.extract_logs_path = extract_logs_path
         self.container_name = container_name
+        self.extract_logs_max_files = extract_logs_max_files
+        # number of upserts of the extract logs since they were last checked for compaction. Every upsert adds at most a single file, so 
+        # the extract logs delta table is checked only after extract_logs_max_files upserts.
+        self.extract_logs_saves = 0
+        # extract logs can be updated by multiple loads running at the same time
+        self.extract_logs_lock = threading.Lock()
 
         if container_name not in self.list_containers():
             self.create_container(container_name)
@@ -45,23 +75,100 @@ class ExtractLogs(AzureBlob):
         """
         Load information from the extract log delta table about when the last time data for every table was extracted.
         Class parameters specifies where that extract log delta table is located. 
+
+        Logs are saved in the self.extract_logs dictionary of the following format:
+        {
+            'table_path': {
+                'last_extract_date': datetime(2024, 1, 1, 0, 0, 0), 'last_load_seconds': 12.3, 'last_exported_version': None
+                ,'last_change_version': None
+            }
+            ,...
+        }
         
-        If this file doesn't exist yet then this function creates an empty dataframe assigned to the self.extract_logs attribute.
+        If the extract log delta table doesn't exist yet then this function creates an empty dictionary.
         """
-        # check if we don't have the extract logs delta table created in the Data Lake yet
-        if not self.file_exists(self.container_name, self.extract_logs_path):
-            self.extract_logs = pd.DataFrame(columns = ['table_path', 'last_extract_date'])
-        else:
+        self.extract_logs = {}
+
+        # check if we have the extract logs delta table created in the Data Lake
+        delta_table = self.dl.cached_delta_table(self.container_name, self.extract_logs_path)
+
+        if delta_table is not None:
             # load extract logs from the extract logs delta table in the Data Lake
-            self.extract_logs = self.dl.read_deltalake(self.container_name, self.extract_logs_path, to_pandas = True)
+            extract_logs = delta_table.to_pyarrow_table()
+
+            # extract logs saved before last extract dates were stored as timestamps keep them as '%Y-%m-%d,%H-%M-%S' strings
+            legacy_dates = extract_logs.schema.field('last_extract_date').type == pa.string()
+
+            for record in extract_logs.to_pylist():
+                table_path = record.pop('table_path')
+                if legacy_dates and record['last_extract_date'] is not None:
+                    record['last_extract_date'] = datetime.strptime(record['last_extract_date'], '%Y-%m-%d,%H-%M-%S')
+                self.extract_logs[table_path] = record
+
+            # rewrite extract logs with the current schema
+            if legacy_dates:
+                self.save_extract_logs()
 
 
     def save_extract_logs(self):
         """
-        This function is saving the extract logs in the delta table in the Data Lake. Location of that table
+        This function is saving all the extract logs in the delta table in the Data Lake, overwriting that table. Location of that table
         is specified by the class parameters.
         """
-        self.dl.write_deltalake(self.extract_logs, self.container_name, self.extract_logs_path)
+        self.dl.write_deltalake(
+            self.extract_logs_table(list(self.extract_logs))
+            ,self.container_name
+            ,self.extract_logs_path
+            ,schema_mode = 'overwrite'
+        )
+
+
+    def save_extract_log(self, table_path):
+        """
+        This function is saving extract logs of a single table in the delta table in the Data Lake. The record for that table is 
+        upserted, so the rest of the extract logs delta table is not rewritten.
+
+        After every extract_logs_max_files upserts the extract logs delta table is checked and if it consists of more than 
+        extract_logs_max_files files, then it is compacted. Other saves don't read the state of that table.
+        """
+        with self.metrics.stage('extract_logs_save'):
+            self.dl.upsert_delta_table(
+                self.extract_logs_table([table_path])
+                ,self.container_name
+                ,self.extract_logs_path
+                ,key = 'table_path'
+                ,merge_schema = True
+            )
+
+            self.extract_logs_saves += 1
+            if self.extract_logs_saves >= self.extract_logs_max_files:
+                self.compact_extract_logs()
+
+
+    def extract_logs_table(self, table_paths) -> pa.Table:
+        """
+        This function returns extract logs of the given tables as a pyarrow table with the extract_logs_schema schema.
+        """
+        return pa.Table.from_pylist(
+            [
+                {'table_path': table_path, **self.extract_logs[table_path]} for table_path in table_paths
+            ]
+            ,schema = self.extract_logs_schema
+        )
+
+
+    def compact_extract_logs(self, force = False):
+        """
+        This function compacts the extract logs delta table if it consists of more than extract_logs_max_files files (or always if 
+        force = True). Small files created by upserts are rewritten into a single file and a checkpoint is created, so reading the 
+        extract logs doesn't need to replay the whole history of that table.
+        """
+        self.extract_logs_maintenance.maintain(
+            self.container_name
+            ,self.extract_logs_path
+            ,force = force
+        )
+        self.extract_logs_saves = 0
 
 
     def find_last_extract_date(self, table_path):
@@ -69,36 +176,54 @@ class ExtractLogs(AzureBlob):
         Find the last extract date for a given table path in the extract logs.
 
         If there is no record for a given table path in the extract logs then this function
-        returns '1900-01-01,00-00-00' string.
+        returns 1900-01-01 00:00:00.
         """
-        indexes = self.extract_logs[self.extract_logs.table_path == table_path].index
+        record = self.extract_logs.get(table_path)
         
-        if len(indexes) == 0:
-            return '1900-01-01,00-00-00'
-        else:
-            last_extract_date = self.extract_logs.loc[indexes[0], 'last_extract_date']
+        if record is None or record.get('last_extract_date') is None:
+            return datetime(1900, 1, 1)
 
-        return last_extract_date
+        return record['last_extract_date']
 
 
-    def update_last_extract_date(self, table_path):
+    def find_last_change_version(self, table_path):
         """
-        Update the last extract date for a given table path in the self.extract_logs dataframe and save
-        logs in the Data Lake. If there is no record for that table yet then create it.
+        Find the last change version (see the DataIngestion.tracked_incr_load function) for a given table path in the extract logs. 
+        It returns an int or None if the table was never loaded that way.
         """
-        
-        indexes = self.extract_logs[self.extract_logs.table_path == table_path].index
-        
-        if len(indexes) == 0:
-            self.extract_logs = pd.concat((
-                self.extract_logs
-                ,pd.DataFrame(
-                    [[table_path, datetime.utcnow().strftime('%Y-%m-%d,%H-%M-%S')]]
-                    ,columns = ['table_path', 'last_extract_date']
-                )
-            ))
-        else:
-            self.extract_logs.loc[indexes[0], 'last_extract_date'] = datetime.utcnow().strftime('%Y-%m-%d,%H-%M-%S')
-
-        # save extract logs in the Data Lake
-        self.save_extract_logs()
\ No newline at end of file
+        version = self.extract_logs.get(table_path, {}).get('last_change_version')
+
+        return int(version) if version is not None else None
+
+
+    def update_extract_log(self, table_path, **values):
+        """
+        Update values of the columns given as keyword arguments in the extract logs record for a given table path and save that record 
+        in the Data Lake. If there is no record for that table yet then create it.
+        """
+        with self.extract_logs_lock:
+            self.extract_logs.setdefault(table_path, {}).update(values)
+
+            # save extract logs of that table in the Data Lake
+            self.save_extract_log(table_path)
+
+
+    def update_last_extract_date(self, table_path, last_extract_date: datetime):
+        """
+        Update the last extract date for a given table path in the extract logs and save logs in the Data Lake. 
+        If there is no record for that table yet then create it.
+        """
+        self.update_extract_log(
+            table_path
+            ,last_extract_date = last_extract_date
+        )
+
+
+    def update_last_change_version(self, table_path, last_change_version: int):
+        """
+        Update the last change version for a given table path in the extract logs and save logs in the Data Lake.
+        """
+        self.update_extract_log(
+            table_path
+            ,last_change_version = decimal.Decimal(last_change_version)
+        )
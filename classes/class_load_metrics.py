@@ -0,0 +1,260 @@
+"""
+This is a class for collecting metrics of data ingestion. It is shared by the DataIngestion, SQL, DeltaLake and AzureBlob classes, which record
+every stage of a load (fetching data from SQL, writing and merging delta tables, saving extract logs etc.) with its:
+    - wall time in seconds
+    - number of rows and bytes (when they are known)
+    - number of retries of requests sent to the storage account by the Azure storage clients (requests sent by the deltalake library
+      are retried by that library and they are not counted)
+
+Every record is a dictionary of the following format:
+{
+    'table': 'source_data/table2' # target table of the load during which the stage was run (None outside of loads)
+    ,'stage': 'sql_fetch'
+    ,'status': 'succeeded' or 'failed'
+    ,'seconds': 1.2
+    ,'rows': 100000
+    ,'bytes': 5000000
+    ,'rows_per_second': 83333.3
+    ,'retries': 0
+    ,'details': {...} # additional values specific to a stage, e.g. merge metrics
+}
+Stages can be nested, e.g. the 'full_load' stage contains the 'sql_fetch' and 'delta_write' stages.
+
+Cheap operations which are run many times (e.g. checking if a file exists) are not recorded one by one. They are counted using the count function
+and a single record with the number of calls and their total wall time is emitted per operation at the end of the load of a table.
+
+Records are logged as JSON by the 'data_ingestion.metrics' logger (on the INFO level) and passed to the callback function if it is given.
+Records of a table are also collected while the table is loaded (see the table function), so they can be added to the load summary.
+
+Optionally a single table can be profiled: while it is loaded, cProfile and tracemalloc are running and their results are saved in the
+profile_path directory. tracemalloc traces the whole process, so allocations of other tables loaded at the same time are included.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import cProfile
+import tracemalloc
+import threading
+import logging
+import json
+import time
+
+class LoadMetrics:
+    def __init__(
+        self
+        ,callback = None # function called with every record
+        ,logger_name = 'data_ingestion.metrics' # name of the logger used for logging records
+        ,profile_table = None # path of the target table which will be profiled during its load (or None)
+        ,profile_path = 'profiles' # directory where profiles are saved
+    ):
+        self.callback = callback
+        self.logger = logging.getLogger(logger_name)
+        self.profile_table = profile_table
+        self.profile_path = profile_path
+
+        # the current table and the number of retries are kept per thread, because multiple tables are loaded at the same time
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # records of the tables which are being loaded, of the following format: {table path: list of records}
+        self.collectors = {}
+        # counted operations of the tables which are being loaded, of the following format: {table path: {operation: [calls, seconds]}}
+        self.counters = {}
+
+
+    def current_table(self):
+        "Returns the table which is being loaded by the current thread"
+        return getattr(self.local, 'table', None)
+
+
+    def retries(self):
+        "Returns the number of retries of requests sent by the current thread"
+        return getattr(self.local, 'retries', 0)
+
+
+    def count_retry(self):
+        "Counts a retry of a request sent by the current thread"
+        self.local.retries = self.retries() + 1
+
+
+    @contextmanager
+    def table(
+        self
+        ,table_path # path of the target table which is loaded
+    ):
+        """
+        Context manager which marks the stages run by the current thread as stages of the given table. It yields a list to which all the
+        records of that table are added until the end of the context. If the table is already loaded (by the current thread or by another
+        thread, e.g. when a load reads data using a pool of threads) then it yields the same list. The table is profiled only by the first 
+        context of a given table.
+        """
+        if table_path is None or self.current_table() == table_path:
+            yield self.collectors.get(table_path)
+            return
+
+        previous_table = self.current_table()
+        with self.lock:
+            records = self.collectors.get(table_path)
+            owner = records is None
+            if owner:
+                records = self.collectors[table_path] = []
+                self.counters[table_path] = {}
+        self.local.table = table_path
+
+        profiler = self.start_profile() if owner and table_path == self.profile_table else None
+
+        try:
+            yield records
+        finally:
+            if profiler is not None:
+                self.save_profile(table_path, profiler)
+
+            self.local.table = previous_table
+            if owner:
+                with self.lock:
+                    counters = self.counters.pop(table_path, {})
+                for operation, (calls, seconds) in counters.items():
+                    self.record(operation, seconds = seconds, table = table_path, rows = calls, details = {'calls': calls})
+
+                with self.lock:
+                    self.collectors.pop(table_path, None)
+
+
+    @contextmanager
+    def stage(
+        self
+        ,stage # name of the stage
+        ,table = None # table of the stage. By default it is the table which is loaded by the current thread.
+    ):
+        """
+        Context manager measuring a stage. It yields a record in which the code of the stage can set 'rows', 'bytes' and 'details'.
+        The record is emitted at the end of the context, also when the stage fails.
+        """
+        record = {'rows': None, 'bytes': None, 'details': None}
+        retries = self.retries()
+        start_time = time.perf_counter()
+
+        try:
+            yield record
+            status = 'succeeded'
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            self.record(
+                stage
+                ,seconds = time.perf_counter() - start_time
+                ,table = table if table is not None else self.current_table()
+                ,status = status
+                ,retries = self.retries() - retries
+                ,**record
+            )
+
+
+    @contextmanager
+    def count(
+        self
+        ,operation # name of the counted operation
+    ):
+        """
+        Context manager counting a call of an operation and its wall time in the table which is loaded by the current thread. Unlike the 
+        stage function it doesn't emit a record, the counters of a table are emitted at the end of its load. Calls outside of loads 
+        are not counted.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            table = self.current_table()
+            if table is not None:
+                seconds = time.perf_counter() - start_time
+                with self.lock:
+                    counters = self.counters.get(table)
+                    if counters is not None:
+                        counter = counters.setdefault(operation, [0, 0.0])
+                        counter[0] += 1
+                        counter[1] += seconds
+
+
+    def record(
+        self
+        ,stage # name of the stage
+        ,seconds # wall time of the stage
+        ,table = None # table of the stage. By default it is the table which is loaded by the current thread.
+        ,status = 'succeeded'
+        ,rows = None
+        ,bytes = None
+        ,retries = 0
+        ,details = None
+    ):
+        """
+        Emitting a record of a stage measured outside of the stage function, e.g. a stream of batches which is read by another thread.
+        """
+        record = {
+            'table': table if table is not None else self.current_table()
+            ,'stage': stage
+            ,'status': status
+            ,'seconds': seconds
+            ,'rows': rows
+            ,'bytes': bytes
+            ,'rows_per_second': rows / seconds if rows is not None and seconds > 0 else None
+            ,'retries': retries
+            ,'details': details
+        }
+
+        with self.lock:
+            records = self.collectors.get(record['table'])
+        if records is not None:
+            records.append(record)
+
+        self.logger.info(json.dumps(record, default = str))
+
+        if self.callback is not None:
+            self.callback(record)
+
+
+    def start_profile(self):
+        "Starting cProfile for the current thread and tracemalloc"
+        profiler = cProfile.Profile()
+        profiler.enable()
+        tracemalloc.start()
+        self.profile_start_time = time.perf_counter()
+
+        return profiler
+
+
+    def save_profile(
+        self
+        ,table_path
+        ,profiler: cProfile.Profile
+    ):
+        """
+        Stopping cProfile and tracemalloc and saving their results in the profile_path directory:
+            - <table>.prof - cProfile statistics, which can be opened with pstats or snakeviz
+            - <table>_memory.txt - 25 lines of code which allocated the most memory still allocated at the end of the load
+        A 'profile' record with paths of those files and the peak traced memory is emitted.
+        """
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profile_path = Path(self.profile_path)
+        profile_path.mkdir(parents = True, exist_ok = True)
+        file_name = table_path.strip('/').replace('/', '_')
+
+        stats_file = profile_path / f'{file_name}.prof'
+        profiler.dump_stats(stats_file)
+
+        memory_file = profile_path / f'{file_name}_memory.txt'
+        memory_file.write_text('\n'.join(str(stat) for stat in snapshot.statistics('lineno')[:25]))
+
+        self.record(
+            'profile'
+            ,seconds = time.perf_counter() - self.profile_start_time
+            ,table = table_path
+            ,details = {
+                'stats_file': stats_file.as_posix()
+                ,'memory_file': memory_file.as_posix()
+                ,'peak_traced_memory_bytes': peak_memory
+            }
+        )
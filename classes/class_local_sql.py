@@ -0,0 +1,74 @@
+"""
+This is a local stand-in for the SQL class which keeps the database in a SQLite file. It is used together with the LocalStorageBackend for running
+the DataIngestion class without SQL Server, e.g. in benchmarks (see benchmarks/benchmark_loads.py) and for profiling.
+
+Only the functions used for reading data are supported. Table names have the <schema_name>.<table_name> format, where the schema is 'main'.
+Columns declared as 'timestamp' are returned as datetimes. Types of the columns are inferred from the first batch of rows, columns which have
+only nulls in the first batch are read as strings.
+"""
+
+from class_sql import SQL
+from class_load_metrics import LoadMetrics
+
+import sqlalchemy as sa
+import sqlite3
+import datetime
+import hashlib
+import json
+
+class LocalSQL(SQL):
+    def __init__(
+        self
+        ,database_path # path to the SQLite database file. It is created if it doesn't exist.
+        ,metrics: LoadMetrics = None # object collecting metrics of queries (see the LoadMetrics class). If it is None then a new one is created.
+    ):
+        self.metrics = metrics if metrics is not None else LoadMetrics()
+
+        # batches are fetched by the deltalake writer on its own threads, so connections can't be bound to the thread which created them
+        self.engine = sa.create_engine(
+            f'sqlite:///{database_path}'
+            ,connect_args = {'check_same_thread': False, 'detect_types': sqlite3.PARSE_DECLTYPES}
+        )
+        sa.event.listen(self.engine, 'connect', self.register_functions)
+
+    def register_functions(self, connection, connection_record):
+        "registering the row_hash function, used instead of hashbytes which doesn't exist in SQLite"
+
+        def row_hash(*values):
+            return hashlib.sha256(json.dumps(values, default = str).encode()).digest()
+
+        connection.create_function('row_hash', -1, row_hash, deterministic = True)
+
+    def arrow_type(self, type_code, precision, scale):
+        "SQLite doesn't report types of the columns, so they are inferred from the first batch (see the SQL.read_query_reader function)"
+
+        return None
+
+    def primary_key_column(
+        self
+        ,table_name # name of the table of the following format: <schema_name>.<table_name>
+    ):
+        "returning the name of the first column of the primary key of a given table"
+
+        schema_name, table_name = table_name.split('.')[-2:]
+        columns = self.read_query_arrow(
+            'select name from pragma_table_info(?, ?) where pk = 1'
+            ,params = [table_name, schema_name]
+        ).column(0).to_pylist()
+
+        if len(columns) == 0:
+            raise Exception(f"Table {table_name} doesn't have a primary key")
+
+        return columns[0]
+
+    def current_datetime(self) -> datetime.datetime:
+        "returning the current date and time. Dates in the SQLite database are saved in the local time."
+
+        return datetime.datetime.now()
+
+    def row_hash_expression(self, columns, table_alias = None):
+        "returning a sql expression calculating a SHA-256 hash of the values of the given columns in a row"
+
+        prefix = f'{table_alias}.' if table_alias else ''
+
+        return f"row_hash({', '.join(prefix + column for column in columns)})"
@@ -8,7 +8,22 @@ numpy==2.2.5
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import sqlalchemy as sa
+import datetime
+import decimal
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from class_load_metrics import LoadMetrics
+
+try:
+    import pyodbc
+except ImportError: # pyodbc needs the unixODBC driver manager which is not installed everywhere
+    pyodbc = None
 
 class SQL:
     def __init__(
@@ -18,7 +33,9 @@ class SQL:
         ,username = None
         ,password = None
         ,driver = 'ODBC Driver 18 for SQL Server'
+        ,metrics: LoadMetrics = None # object collecting metrics of queries (see the LoadMetrics class). If it is None then a new one is created.
     ):
+        self.metrics = metrics if metrics is not None else LoadMetrics()
         
         if username == None and password == None:
             connection_url = f'mssql://@{server}/{database}?driver={driver}'
@@ -34,6 +51,300 @@ class SQL:
             df = pd.read_sql(sql = sa.text(query), con = con)
         
         return df
+
+    def read_query_reader(
+        self
+        ,query
+        ,batch_size = 100_000 # maximum number of rows in a single record batch
+        ,params = None # list of values for the '?' parameter markers in the query
+    ) -> pa.RecordBatchReader:
+        """
+        Executing a sql query and returning its result as a pyarrow RecordBatchReader. Rows are fetched from the cursor batch_size rows at a time,
+        so only a single batch is kept in memory no matter how many rows the query returns.
+
+        Rows are converted straight into Arrow arrays without creating a pandas DataFrame. Types of the columns are taken from the cursor
+        description (see the arrow_type function), so strings don't become object columns and nullable integers don't become floats.
+        Columns of types which can't be mapped are read as strings. The connection is closed once the reader is exhausted (or when the 
+        query fails).
+
+        Once the reader is exhausted a 'sql_fetch' record is emitted with the time spent on executing the query and fetching and converting 
+        rows (without the time spent by the consumer of the batches), the number of rows and the size of the batches in bytes.
+        """
+        # batches can be read by another thread (e.g. by the deltalake writer), so the table is taken from the thread which executes the query
+        table = self.metrics.current_table()
+        fetch = {'seconds': 0, 'rows': 0, 'bytes': 0}
+        start_time = time.perf_counter()
+
+        con = cursor = None
+        try:
+            con = self.engine.raw_connection()
+            cursor = con.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            columns = [column[0] for column in cursor.description]
+            types = [self.arrow_type(column[1], column[4], column[5]) for column in cursor.description]
+
+            first_batch = self.rows_to_record_batch(cursor.fetchmany(batch_size), columns, types)
+        except BaseException:
+            # after that point the connection is closed by the reader
+            if cursor is not None:
+                cursor.close()
+            if con is not None:
+                con.close()
+            raise
+
+        # types which were inferred from the first batch are fixed for the next batches. Columns which had only nulls are read as strings.
+        types = [
+            column_type if column_type is not None else (pa.string() if pa.types.is_null(inferred_type) else inferred_type)
+            for column_type, inferred_type in zip(types, first_batch.schema.types)
+        ]
+        first_batch = first_batch.cast(pa.schema(zip(columns, types)))
+
+        def measured(batch, start_time):
+            fetch['seconds'] += time.perf_counter() - start_time
+            fetch['rows'] += batch.num_rows
+            fetch['bytes'] += batch.nbytes
+            return batch
+
+        first_batch = measured(first_batch, start_time)
+
+        def batches():
+            try:
+                if first_batch.num_rows > 0:
+                    yield first_batch
+
+                while True:
+                    start_time = time.perf_counter()
+                    rows = cursor.fetchmany(batch_size)
+                    if len(rows) == 0:
+                        break
+                    yield measured(self.rows_to_record_batch(rows, columns, types), start_time)
+            finally:
+                cursor.close()
+                con.close()
+                self.metrics.record('sql_fetch', table = table, **fetch)
+
+        return pa.RecordBatchReader.from_batches(first_batch.schema, batches())
+
+    def read_query_arrow(
+        self
+        ,query
+        ,batch_size = 100_000 # number of rows fetched from the cursor at once
+        ,params = None # list of values for the '?' parameter markers in the query
+    ) -> pa.Table:
+        "saving a result of a sql query in a pyarrow table"
+
+        return self.read_query_reader(query, batch_size, params).read_all()
+
+    def read_queries_reader(
+        self
+        ,queries # list of (query, params) tuples. All the queries need to return the same columns.
+        ,workers = 4 # number of queries executed at the same time, each one on its own connection
+        ,batch_size = 100_000 # maximum number of rows in a single record batch
+    ) -> pa.RecordBatchReader:
+        """
+        Executing multiple sql queries concurrently and returning their combined results as a single pyarrow RecordBatchReader.
+
+        Every query is read on its own connection in a thread pool of the given size. Batches are passed to the reader through a bounded
+        queue, so at most a few batches per worker are kept in memory. Batches from different queries are returned in the order in which
+        they were fetched. If any of the queries fails, the exception is raised when reading from the reader.
+        """
+
+        batches_queue = queue.Queue(maxsize = workers * 2)
+        stop = threading.Event()
+        # queries are executed by the threads of the pool, so metrics of them are assigned to the table of the current thread
+        table = self.metrics.current_table()
+
+        def put(item):
+            # wait for a free place in the queue unless the reader has been closed
+            while not stop.is_set():
+                try:
+                    batches_queue.put(item, timeout = 0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def read_query(query, params):
+            with self.metrics.table(table):
+                enqueue_batches(query, params)
+
+        def enqueue_batches(query, params):
+            try:
+                if stop.is_set():
+                    return
+                reader = self.read_query_reader(query, batch_size, params)
+                if not put(('schema', reader.schema)):
+                    return
+                for batch in reader:
+                    if not put(('batch', batch)):
+                        return
+                put(('done', None))
+            except Exception as e:
+                put(('error', e))
+
+        executor = ThreadPoolExecutor(max_workers = workers)
+        for query, params in queries:
+            executor.submit(read_query, query, params)
+
+        def messages():
+            finished = 0
+            while finished < len(queries):
+                kind, value = batches_queue.get()
+                if kind == 'error':
+                    raise value
+                elif kind == 'done':
+                    finished += 1
+                else:
+                    yield kind, value
+
+        def batches(first_messages, schema):
+            try:
+                for kind, value in first_messages:
+                    if kind == 'batch':
+                        yield value if value.schema == schema else value.cast(schema)
+            finally:
+                stop.set()
+                executor.shutdown(wait = True, cancel_futures = True)
+
+        # the schema of the reader is taken from the first query which starts returning results
+        first_messages = messages()
+        try:
+            schema = next(kind_value[1] for kind_value in first_messages if kind_value[0] == 'schema')
+        except BaseException:
+            stop.set()
+            executor.shutdown(wait = True, cancel_futures = True)
+            raise
+
+        return pa.RecordBatchReader.from_batches(schema, batches(first_messages, schema))
+
+    def primary_key_column(
+        self
+        ,table_name # name of the table of the following format: <db_name>.<schema_name>.<table_name>
+    ):
+        "returning the name of the first column of the primary key of a given table"
+
+        query = f"""
+            select
+                c.name
+            from
+                sys.indexes i
+                join sys.index_columns ic on ic.object_id = i.object_id and ic.index_id = i.index_id
+                join sys.columns c on c.object_id = ic.object_id and c.column_id = ic.column_id
+            where
+                i.is_primary_key = 1
+                and ic.key_ordinal = 1
+                and i.object_id = object_id(?)
+        """
+        columns = self.read_query_arrow(query, params = [table_name]).column(0).to_pylist()
+
+        if len(columns) == 0:
+            raise Exception(f"Table {table_name} doesn't have a primary key")
+
+        return columns[0]
+
+    def current_datetime(self) -> datetime.datetime:
+        "returning the current date and time of the SQL server"
+
+        return self.read_query_arrow('select sysdatetime()').column(0)[0].as_py()
+
+    def query_columns(self, query) -> pa.Schema:
+        "returning the schema of the result of a sql query, without fetching any rows"
+
+        return self.read_query_reader(f'select * from ({query}) q where 1 = 0').schema
+
+    def row_hash_expression(
+        self
+        ,columns # list of columns which are hashed
+        ,table_alias = None # alias of the table with the columns
+    ):
+        """
+        returning a sql expression calculating a SHA2_256 hash (binary(32)) of the values of the given columns in a row. Values are
+        serialized as JSON (with nulls), so rows with different values or with a null in a different column have different hashes.
+        """
+        prefix = f'{table_alias}.' if table_alias else ''
+        json_columns = ', '.join(f'{prefix}[{column}]' for column in columns)
+
+        return f"hashbytes('SHA2_256', (select {json_columns} for json path, without_array_wrapper, include_null_values))"
+
+    def arrow_type(
+        self
+        ,type_code # python type of the column reported by the driver in cursor.description
+        ,precision # precision (or size) of the column reported in cursor.description
+        ,scale # scale of the column reported in cursor.description
+    ):
+        """
+        Mapping a SQL Server column described in cursor.description into a pyarrow type. pyodbc reports SQL Server types as python types together
+        with their precision and scale, so they are mapped in the following way:
+
+            bit                                                         -> bool
+            tinyint, smallint                                           -> int16
+            int                                                         -> int32
+            bigint                                                      -> int64
+            decimal(p, s), numeric(p, s), money, smallmoney             -> decimal128(p, s)
+            real                                                        -> float32
+            float                                                       -> float64
+            date                                                        -> date32
+            time                                                        -> time64[us]
+            datetime, datetime2, smalldatetime                          -> timestamp[us]
+            char, varchar, nchar, nvarchar, text, ntext, xml,
+            uniqueidentifier                                            -> string
+            binary, varbinary, image, rowversion                        -> binary
+
+        Other types (e.g. sql_variant or geography) are mapped into string and their values are converted into strings. Types are never 
+        inferred from the data, because a batch with only nulls would give a null type which doesn't match the next batches.
+        """
+
+        if type_code is bool:
+            return pa.bool_()
+        elif type_code is int:
+            if precision is not None and precision <= 5:
+                return pa.int16()
+            elif precision is not None and precision <= 10:
+                return pa.int32()
+            else:
+                return pa.int64()
+        elif type_code is decimal.Decimal and precision is not None and scale is not None:
+            return pa.decimal128(precision, scale)
+        elif type_code is float:
+            return pa.float32() if precision is not None and precision <= 24 else pa.float64()
+        elif type_code is datetime.datetime:
+            return pa.timestamp('us')
+        elif type_code is datetime.date:
+            return pa.date32()
+        elif type_code is datetime.time:
+            return pa.time64('us')
+        elif type_code is str:
+            return pa.string()
+        elif type_code in (bytes, bytearray):
+            return pa.binary()
+        else:
+            return pa.string()
+
+    def rows_to_record_batch(
+        self
+        ,rows # list of rows fetched from a cursor
+        ,columns # names of the columns
+        ,types # pyarrow types of the columns. If a type is None then it is inferred from the data.
+    ) -> pa.RecordBatch:
+        "converting rows fetched from a cursor into a pyarrow record batch"
+
+        # transpose rows into columns
+        values = list(zip(*rows)) if len(rows) > 0 else [[] for _ in columns]
+
+        arrays = []
+        for column_values, column_type in zip(values, types):
+            try:
+                arrays.append(pa.array(column_values, type = column_type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                if column_type != pa.string():
+                    raise
+                # values of types which are not mapped (see the arrow_type function) are converted into strings
+                arrays.append(pa.array([None if value is None else str(value) for value in column_values], type = column_type))
+
+        return pa.RecordBatch.from_arrays(arrays, names = columns)
     
     def read_sql_file(self, file_path):
         "saving a result of a sql query from a file to a dataframe"
@@ -70,13 +381,31 @@ class SQL:
         ,sql_table_name # name of the SQL table into which we will insert data.
         ,sql_schema_name # name of the schema of the SQL table into which we will insert data.
         ,if_exists # 'append' or 'replace'
+        ,method = 'multi' # 'multi' or 'bulk'
+        ,batch_size = 50_000 # number of rows sent in one batch when method = 'bulk'
+        ,tablock = False # whether to insert with the TABLOCK hint when method = 'bulk'
     ):
         """
         Inserting data from a dataframe into a sql database.
         
         Argument if_exists indicates what happens if table in SQL db given by the sql_table_name argument already exists.
         Possible values for that argument are: 'append' or 'replace'.
+
+        Argument method indicates how data is sent:
+            - 'multi' - pandas to_sql with multi-row INSERT statements
+            - 'bulk' - parameter arrays sent through pyodbc fast_executemany (see the bulk_insert method).
+            In that case a dictionary with load metrics is returned.
         """
+
+        if method == 'bulk':
+            return self.bulk_insert(
+                data = dataframe
+                ,sql_table_name = sql_table_name
+                ,sql_schema_name = sql_schema_name
+                ,if_exists = if_exists
+                ,batch_size = batch_size
+                ,tablock = tablock
+            )
         
         col_count = len(dataframe.columns)
         max_params = 1000
@@ -97,4 +426,233 @@ class SQL:
                 ,if_exists = if_exists
                 ,chunksize = chunksize
                 ,method = "multi"
-            )
\ No newline at end of file
+            )
+
+    def bulk_insert(
+        self
+        ,data # pandas DataFrame, pyarrow Table or pyarrow RecordBatchReader
+        ,sql_table_name # name of the SQL table into which we will insert data.
+        ,sql_schema_name # name of the schema of the SQL table into which we will insert data.
+        ,if_exists = 'append' # 'append' or 'replace'
+        ,batch_size = 50_000 # number of rows sent to the server in one executemany call
+        ,tablock = False # whether to insert with the TABLOCK hint
+        ,column_types = None # optional dictionary {column_name: sql type} used when creating a table, e.g. {'name': 'nvarchar(100)'}
+    ):
+        """
+        Inserting data into a sql table using pyodbc fast_executemany.
+
+        Rows are sent as parameter arrays of batch_size rows. Types and sizes of parameters are set explicitly (setinputsizes)
+        based on the Arrow schema of the data so the driver doesn't have to guess them from the first row.
+        If the table doesn't exist then it is created using the same types (column_types can overwrite them).
+        Sizes of string and binary columns are measured on the whole data for a DataFrame / Table. For a RecordBatchReader
+        they are measured on each batch separately and new tables get nvarchar(max) / varbinary(max) columns, because
+        later batches can contain longer values than the first one.
+
+        With tablock = True rows are inserted with the TABLOCK hint, so SQL Server takes a single table lock instead of
+        row locks, but it blocks other sessions writing to the table. Rows are still fully logged, parameter arrays 
+        are sent as INSERT statements and not through the bulk load API.
+
+        With if_exists = 'replace' data is loaded into the [schema].[table__staging] table which is then swapped with the
+        target table (drop + sp_rename) in the same transaction, so readers never see a partially loaded table.
+        Everything is committed at the end.
+
+        Returns a dictionary with the number of inserted rows, number of seconds and number of rows per second.
+        """
+        if pyodbc is None:
+            raise Exception("bulk_insert requires pyodbc")
+
+        if if_exists not in ('append', 'replace'):
+            raise Exception(f"Incorrect value of if_exists: {if_exists}")
+
+        start = time.perf_counter()
+
+        if isinstance(data, pd.DataFrame):
+            data = pa.Table.from_pandas(data, preserve_index = False)
+
+        if isinstance(data, pa.Table):
+            schema = data.schema
+            sizes = self.column_sizes(data)
+            batches = data.to_batches(max_chunksize = batch_size)
+        else:
+            schema = data.schema
+            sizes = None
+            batches = data
+
+        if if_exists == 'replace':
+            target_table_name = f'{sql_table_name}__staging'
+        else:
+            target_table_name = sql_table_name
+
+        full_name = f'[{sql_schema_name}].[{target_table_name}]'
+        column_names = ', '.join(f'[{name}]' for name in schema.names)
+        placeholders = ', '.join('?' for _ in schema.names)
+        hint = ' with (tablock)' if tablock else ''
+        insert_query = f'insert into {full_name}{hint} ({column_names}) values ({placeholders})'
+
+        con = self.engine.raw_connection()
+        cursor = con.cursor()
+        cursor.fast_executemany = True
+        rows_count = 0
+        bytes_count = 0
+
+        try:
+            # if schema doesnt exist then create it
+            cursor.execute(f"""IF NOT EXISTS (SELECT * FROM sys.schemas WHERE name = '{sql_schema_name}') 
+            exec ('CREATE SCHEMA {sql_schema_name}')""")
+
+            if if_exists == 'replace':
+                cursor.execute(f"if object_id('{full_name}') is not null drop table {full_name}")
+
+            table_created = False
+
+            for batch in batches:
+                batch = self.sql_compatible_batch(batch)
+                if batch.num_rows == 0:
+                    continue
+                bytes_count += batch.nbytes
+
+                batch_sizes = sizes if sizes is not None else self.column_sizes(batch)
+
+                if not table_created:
+                    create_sizes = sizes if sizes is not None else {name: math.inf for name in batch_sizes}
+                    self.create_sql_table(cursor, full_name, schema, create_sizes, column_types)
+                    table_created = True
+
+                cursor.setinputsizes([
+                    self.sql_column_type(field, batch_sizes.get(field.name))[1] for field in schema
+                ])
+
+                for offset in range(0, batch.num_rows, batch_size):
+                    chunk = batch.slice(offset, batch_size)
+                    rows = list(zip(*[column.to_pylist() for column in chunk.columns]))
+                    cursor.executemany(insert_query, rows)
+                    rows_count += len(rows)
+
+            # empty data still creates the table
+            if not table_created:
+                create_sizes = sizes if sizes is not None else {
+                    field.name: math.inf for field in schema 
+                    if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+                    or pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type)
+                }
+                self.create_sql_table(cursor, full_name, schema, create_sizes, column_types)
+
+            if if_exists == 'replace':
+                final_name = f'[{sql_schema_name}].[{sql_table_name}]'
+                cursor.execute(f"if object_id('{final_name}') is not null drop table {final_name}")
+                cursor.execute(f"exec sp_rename '{sql_schema_name}.{target_table_name}', '{sql_table_name}'")
+
+            con.commit()
+        except:
+            con.rollback()
+            self.metrics.record('sql_bulk_insert', time.perf_counter() - start, status = 'failed', rows = rows_count, bytes = bytes_count)
+            raise
+        finally:
+            cursor.close()
+            con.close()
+
+        seconds = time.perf_counter() - start
+        self.metrics.record('sql_bulk_insert', seconds, rows = rows_count, bytes = bytes_count)
+
+        return {
+            'rows': rows_count
+            ,'seconds': seconds
+            ,'rows_per_second': rows_count / seconds if seconds > 0 else None
+        }
+
+    def create_sql_table(self, cursor, full_name, schema: pa.Schema, sizes, column_types = None):
+        """
+        Creating a SQL table (given by full_name, '[schema].[table]') with columns created based on the Arrow schema,
+        if it doesn't exist yet. sizes is a dictionary {column_name: max length} used for string and binary columns.
+        """
+        column_types = column_types or {}
+        columns = ', '.join(
+            f'[{field.name}] ' + column_types.get(field.name, self.sql_column_type(field, sizes.get(field.name))[0])
+            for field in schema
+        )
+        cursor.execute(f"if object_id('{full_name}') is null create table {full_name} ({columns})")
+
+    def column_sizes(self, data):
+        """
+        Returns a dictionary {column_name: max length} for string and binary columns of a pyarrow Table or RecordBatch.
+        Length of strings is measured in characters and length of binary values in bytes.
+        """
+        sizes = {}
+        for name, column in zip(data.schema.names, data.columns):
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                size = pc.max(pc.utf8_length(column)).as_py()
+            elif pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type):
+                size = pc.max(pc.binary_length(column)).as_py()
+            else:
+                continue
+            sizes[name] = size or 1
+
+        return sizes
+
+    def sql_compatible_batch(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """
+        Casting columns which can't be sent to SQL Server as they are: timestamps are cast to naive (UTC) timestamps
+        with microseconds precision, the same as datetime2(6), and uint64 values are cast to decimal(20, 0) because
+        they don't fit into bigint.
+        """
+        columns = []
+        for column in batch.columns:
+            if pa.types.is_timestamp(column.type) and (column.type.tz is not None or column.type.unit == 'ns'):
+                column = column.cast(pa.timestamp('us'), safe = False)
+            elif pa.types.is_uint64(column.type):
+                column = column.cast(pa.decimal128(20, 0))
+            columns.append(column)
+
+        return pa.RecordBatch.from_arrays(columns, names = batch.schema.names)
+
+    def sql_column_type(self, field: pa.Field, size = None):
+        """
+        Mapping an Arrow field into a SQL Server type. Returns a tuple (column definition, pyodbc input size) where
+        the input size is used in the cursor.setinputsizes method. size is the max length of a string or binary column
+        (None means nvarchar(4000) / varbinary(8000) and math.inf means nvarchar(max) / varbinary(max)).
+        """
+        arrow_type = field.type
+        
+        if pa.types.is_boolean(arrow_type):
+            result = ('bit', pyodbc.SQL_BIT)
+        elif pa.types.is_int8(arrow_type) or pa.types.is_int16(arrow_type) or pa.types.is_uint8(arrow_type):
+            result = ('smallint', pyodbc.SQL_SMALLINT)
+        elif pa.types.is_int32(arrow_type) or pa.types.is_uint16(arrow_type):
+            result = ('int', pyodbc.SQL_INTEGER)
+        elif pa.types.is_uint64(arrow_type):
+            # values are cast to decimals by the sql_compatible_batch function
+            result = ('decimal(20, 0)', (pyodbc.SQL_DECIMAL, 20, 0))
+        elif pa.types.is_integer(arrow_type):
+            result = ('bigint', pyodbc.SQL_BIGINT)
+        elif pa.types.is_float16(arrow_type) or pa.types.is_float32(arrow_type):
+            result = ('real', pyodbc.SQL_REAL)
+        elif pa.types.is_float64(arrow_type):
+            result = ('float', pyodbc.SQL_DOUBLE)
+        elif pa.types.is_decimal(arrow_type):
+            result = (
+                f'decimal({arrow_type.precision}, {arrow_type.scale})'
+                ,(pyodbc.SQL_DECIMAL, arrow_type.precision, arrow_type.scale)
+            )
+        elif pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            size = size or 4000
+            if size > 4000:
+                result = ('nvarchar(max)', (pyodbc.SQL_WVARCHAR, 0, 0))
+            else:
+                result = (f'nvarchar({size})', (pyodbc.SQL_WVARCHAR, size, 0))
+        elif pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+            size = size or 8000
+            if size > 8000:
+                result = ('varbinary(max)', (pyodbc.SQL_VARBINARY, 0, 0))
+            else:
+                result = (f'varbinary({size})', (pyodbc.SQL_VARBINARY, size, 0))
+        elif pa.types.is_timestamp(arrow_type):
+            result = ('datetime2(6)', (pyodbc.SQL_TYPE_TIMESTAMP, 26, 6))
+        elif pa.types.is_date(arrow_type):
+            result = ('date', pyodbc.SQL_TYPE_DATE)
+        elif pa.types.is_time(arrow_type):
+            # the driver sets the time parameters by itself
+            result = ('time(6)', None)
+        else:
+            raise Exception(f"Arrow type {arrow_type} of the column {field.name} is not supported")
+
+        return result
@@ -0,0 +1,326 @@
+"""
+These are storage backends used by the AzureBlob, DeltaLake and ExtractLogs classes. A backend performs operations on containers, directories
+and files and tells the deltalake library where delta tables are saved (table URIs and storage options).
+
+The following backends are available:
+    - StorageSession (class_storage_session.py) - Azure Data Lake Storage Gen2 account
+    - LocalStorageBackend - a directory on the local disk, where every container is a subdirectory. It doesn't need any storage account, so
+      it is used for tests, profiling and benchmarks.
+    - EmulatorStorageBackend - a local Azure Storage emulator (Azurite). The emulator supports only the blob API (without hierarchical
+      namespace), so directories are prefixes of blob names. The deltalake library connects to the emulator address given by the 
+      AZURITE_BLOB_STORAGE_URL environment variable (http://127.0.0.1:10000 by default).
+
+A backend is shared by all the objects working with the same storage, in the same way as a StorageSession.
+"""
+
+from azure.storage.blob import BlobServiceClient, ContentSettings
+import azure.core.exceptions
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
+import hashlib
+import os
+import shutil
+
+class StorageBackend(ABC):
+    """
+    Interface of a storage backend. Paths of directories and files are relative to the root of a container. A backend has to implement 
+    all the abstract methods.
+    """
+    account_name = None
+    access_key = None
+
+    @abstractmethod
+    def create_container(self, container_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_container(self, container_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_containers(self):
+        "Returns names of all the containers"
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_directory(self, container_name, directory_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_directory(self, container_name, directory_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def rename_directory(self, container_name, directory_name, new_directory_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def upload_file(self, container_name, cloud_file_path, local_file_path, chunk_size = None, max_concurrency = 1):
+        """
+        Uploads a local file. Files larger than chunk_size are uploaded in chunks, max_concurrency chunks at the same time (if the backend 
+        supports it). The MD5 hash of the file is saved together with the file, so it can be compared by the file_checksum function.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def file_checksum(self, container_name, file_path):
+        """
+        Returns a tuple (size in bytes, MD5 hash) of the given file or None if it doesn't exist. The MD5 hash is None if it wasn't saved
+        during the upload.
+        """
+        raise NotImplementedError
+
+    def local_file_md5(self, local_file_path, block_size = 8 * 1024 ** 2) -> bytes:
+        "Returns the MD5 hash of a local file, which is read in blocks of block_size bytes"
+        md5 = hashlib.md5()
+        with open(local_file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                md5.update(block)
+
+        return md5.digest()
+
+    @abstractmethod
+    def list_directory_content(self, container_name, path):
+        """
+        Returns full paths of all the files and directories inside of the given directory (recursively).
+        If given directory doesn't exist then it raises an exception.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def file_exists(self, container_name, file_path) -> bool:
+        "Checks if the file (or directory) at the specified path exists in the given container."
+        raise NotImplementedError
+
+    @abstractmethod
+    def table_uri(self, container_name, path):
+        "Returns the URI of the delta table which is used by the deltalake library."
+        raise NotImplementedError
+
+    @abstractmethod
+    def storage_options(self):
+        "Returns storage options used by the deltalake library."
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(
+        self
+        ,root_path # directory on the local disk where containers are saved as subdirectories. It is created if it doesn't exist.
+    ):
+        self.root_path = Path(root_path).resolve()
+        self.root_path.mkdir(parents = True, exist_ok = True)
+
+
+    def local_path(self, container_name, path = ''):
+        "Returns the path on the local disk of the given path in a container"
+        return self.root_path / container_name / path.strip('/')
+
+
+    def create_container(self, container_name):
+        self.local_path(container_name).mkdir()
+
+
+    def delete_container(self, container_name):
+        shutil.rmtree(self.local_path(container_name))
+
+
+    def list_containers(self):
+        return [path.name for path in self.root_path.iterdir() if path.is_dir()]
+
+
+    def create_directory(self, container_name, directory_name):
+        self.local_path(container_name, directory_name).mkdir(parents = True, exist_ok = True)
+
+
+    def delete_directory(self, container_name, directory_name):
+        shutil.rmtree(self.local_path(container_name, directory_name))
+
+
+    def rename_directory(self, container_name, directory_name, new_directory_name):
+        new_path = self.local_path(container_name, new_directory_name)
+        new_path.parent.mkdir(parents = True, exist_ok = True)
+        os.rename(self.local_path(container_name, directory_name), new_path)
+
+
+    def upload_file(self, container_name, cloud_file_path, local_file_path, chunk_size = None, max_concurrency = 1):
+        path = self.local_path(container_name, cloud_file_path)
+        path.parent.mkdir(parents = True, exist_ok = True)
+        shutil.copyfile(local_file_path, path)
+
+
+    def file_checksum(self, container_name, file_path):
+        # the local disk doesn't keep MD5 hashes of files, so it is calculated
+        path = self.local_path(container_name, file_path)
+        if not path.is_file():
+            return None
+
+        return path.stat().st_size, self.local_file_md5(path)
+
+
+    def list_directory_content(self, container_name, path):
+        directory = self.local_path(container_name, path)
+        if not directory.is_dir():
+            raise Exception("Specified directory doesn't exist")
+
+        container_path = self.local_path(container_name)
+
+        return np.array(sorted(child.relative_to(container_path).as_posix() for child in directory.rglob('*')))
+
+
+    def file_exists(self, container_name, file_path) -> bool:
+        return self.local_path(container_name, file_path).exists()
+
+
+    def table_uri(self, container_name, path):
+        return self.local_path(container_name, path).as_posix()
+
+
+    def storage_options(self):
+        return {}
+
+
+class EmulatorStorageBackend(StorageBackend):
+    # default account and key of Azurite, they are the same for every installation
+    default_account_name = 'devstoreaccount1'
+    default_access_key = 'Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=='
+
+    def __init__(
+        self
+        ,blob_endpoint = 'http://127.0.0.1:10000/devstoreaccount1' # blob endpoint of the emulator
+        ,account_name = default_account_name
+        ,access_key = default_access_key
+    ):
+        self.blob_endpoint = blob_endpoint
+        self.account_name = account_name
+        self.access_key = access_key
+
+        self.service_client = BlobServiceClient(
+            account_url = blob_endpoint
+            ,credential = {'account_name': account_name, 'account_key': access_key}
+        )
+
+
+    def create_container(self, container_name):
+        self.service_client.create_container(container_name)
+
+
+    def delete_container(self, container_name):
+        self.service_client.delete_container(container_name)
+
+
+    def list_containers(self):
+        return [container.name for container in self.service_client.list_containers()]
+
+
+    def create_directory(self, container_name, directory_name):
+        # directories don't exist without hierarchical namespace, they are created together with the first file inside of them
+        pass
+
+
+    def delete_directory(self, container_name, directory_name):
+        container_client = self.service_client.get_container_client(container_name)
+        prefix = directory_name.strip('/') + '/'
+
+        for blob_name in container_client.list_blob_names(name_starts_with = prefix):
+            container_client.delete_blob(blob_name)
+
+
+    def rename_directory(self, container_name, directory_name, new_directory_name):
+        """
+        Blobs can't be renamed, so every blob in the directory is copied to the new directory and then deleted.
+        """
+        container_client = self.service_client.get_container_client(container_name)
+        prefix = directory_name.strip('/') + '/'
+        new_prefix = new_directory_name.strip('/') + '/'
+
+        for blob_name in container_client.list_blob_names(name_starts_with = prefix):
+            source_client = container_client.get_blob_client(blob_name)
+            target_client = container_client.get_blob_client(new_prefix + blob_name[len(prefix):])
+            target_client.upload_blob(source_client.download_blob().readall(), overwrite = True)
+            source_client.delete_blob()
+
+
+    def upload_file(self, container_name, cloud_file_path, local_file_path, chunk_size = None, max_concurrency = 1):
+        """
+        Large files are uploaded in blocks by the blob client. The size of the blocks is set by the client (4 MiB), so chunk_size is ignored.
+        """
+        blob_client = self.service_client.get_blob_client(container_name, cloud_file_path.strip('/'))
+
+        with open(file = local_file_path, mode = "rb") as data:
+            blob_client.upload_blob(
+                data
+                ,overwrite = True
+                ,max_concurrency = max_concurrency
+                ,content_settings = ContentSettings(content_md5 = bytearray(self.local_file_md5(local_file_path)))
+            )
+
+
+    def file_checksum(self, container_name, file_path):
+        blob_client = self.service_client.get_blob_client(container_name, file_path.strip('/'))
+
+        try:
+            properties = blob_client.get_blob_properties()
+        except azure.core.exceptions.ResourceNotFoundError:
+            return None
+
+        md5 = properties.content_settings.content_md5
+        return properties.size, bytes(md5) if md5 else None
+
+
+    def list_directory_content(self, container_name, path):
+        container_client = self.service_client.get_container_client(container_name)
+        prefix = path.strip('/') + '/'
+
+        try:
+            blob_names = list(container_client.list_blob_names(name_starts_with = prefix))
+        except azure.core.exceptions.ResourceNotFoundError:
+            raise Exception("Specified directory doesn't exist")
+
+        if not blob_names:
+            raise Exception("Specified directory doesn't exist")
+
+        # directories are not returned by the blob API, so they are taken from the blob names
+        paths = set(blob_names)
+        for blob_name in blob_names:
+            parts = blob_name.split('/')
+            paths.update('/'.join(parts[:i]) for i in range(prefix.count('/') + 1, len(parts)))
+
+        return np.array(sorted(paths))
+
+
+    def file_exists(self, container_name, file_path) -> bool:
+        container_client = self.service_client.get_container_client(container_name)
+        file_path = file_path.strip('/')
+
+        try:
+            if container_client.get_blob_client(file_path).exists():
+                return True
+            # a directory exists if there is any blob inside of it
+            return next(iter(container_client.list_blob_names(name_starts_with = file_path + '/')), None) is not None
+        except azure.core.exceptions.ResourceNotFoundError:
+            return False
+
+
+    def table_uri(self, container_name, path):
+        return f'az://{container_name}/{path.strip("/")}'
+
+
+    def storage_options(self):
+        return {
+            "account_name": self.account_name
+            ,"access_key": self.access_key
+            ,"use_emulator": "true"
+            ,"allow_http": "true"
+        }
@@ -0,0 +1,379 @@
+"""
+This is a class for sharing a single connection to the Azure Storage Account (Data Lake) between the AzureBlob, DeltaLake and ExtractLogs classes.
+
+A session has one credential and one HTTP transport with a pool of connections, which are used by all the clients it creates. Clients for
+containers (file systems) and files are cached, so many tables and loads can reuse the same warm connections instead of opening new ones.
+
+The credential is a SAS token which is refreshed in the background before it expires. A new token is swapped into the same credential
+object, so the clients (and their connections) are never rebuilt and operations don't need to check the token expiry date.
+
+StorageSession is the storage backend of an Azure Data Lake Storage Gen2 account (see class_storage_backend.py for other backends).
+"""
+
+from class_storage_backend import StorageBackend
+
+from azure.storage.blob import generate_account_sas, ResourceTypes, AccountSasPermissions
+from azure.storage.filedatalake import DataLakeServiceClient, ExponentialRetry, ContentSettings
+from azure.core.pipeline.transport import RequestsTransport
+from azure.core.credentials import AzureSasCredential
+import azure.core.exceptions
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+import requests
+import logging
+import numpy as np
+
+logger = logging.getLogger('data_ingestion.storage')
+
+class CountingRetry(ExponentialRetry):
+    """
+    Retry policy of the storage clients (the default exponential retry) which counts retries in a LoadMetrics object.
+    """
+    def __init__(self, metrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    def increment(self, settings, request, response = None, error = None):
+        retry = super().increment(settings, request, response, error)
+        if retry:
+            self.metrics.count_retry()
+        return retry
+
+
+class StorageSession(StorageBackend):
+    def __init__(
+        self
+        ,account_name # name of the Azure Storage Account (Data Lake)
+        ,access_key # access key to the Azure Storage Account (Data Lake)
+        ,max_connections = 32 # maximum number of HTTP connections kept open in the connection pool
+        ,max_cached_file_clients = 1024 # maximum number of cached file clients
+        ,sas_lifetime = timedelta(minutes = 10) # how long every generated SAS token is valid
+        ,sas_refresh_ratio = 0.8 # part of the SAS token lifetime after which a new token is generated
+        ,sas_retry_delay = timedelta(seconds = 30) # delay after which generating a SAS token is retried when it fails
+        ,metrics = None # LoadMetrics object in which retries of requests are counted (or None)
+    ):
+        self.account_name = account_name
+        self.access_key = access_key
+        self.max_cached_file_clients = max_cached_file_clients
+        self.sas_lifetime = sas_lifetime
+        self.sas_refresh_ratio = sas_refresh_ratio
+        self.sas_retry_delay = sas_retry_delay
+        self.metrics = metrics
+        self.closed = False
+
+        # single HTTP session with a pool of connections shared by all the clients created by this session
+        self.http_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections = max_connections, pool_maxsize = max_connections)
+        self.http_session.mount('https://', adapter)
+        self.transport = RequestsTransport(session = self.http_session, session_owner = False)
+
+        self.lock = threading.Lock()
+        self.file_system_clients = {}
+        self.file_clients = OrderedDict()
+
+        # Create a service client which will be used for performing all the operations on containers, directories and files.
+        self.create_service_client()
+
+
+    def create_service_client(
+        self
+    ):
+        """
+        This function creates a service client if it was not created yet. It will be used for performing all the operations on containers, directories and files.
+
+        The service client uses a SAS token credential which is refreshed in the background (see the refresh_sas function).
+        """
+        if hasattr(self, 'service_client'):
+            return
+
+        self.credential = AzureSasCredential(self.create_account_sas())
+        self.service_client = DataLakeServiceClient(
+            account_url = f'https://{self.account_name}.dfs.core.windows.net'
+            ,credential = self.credential
+            ,transport = self.transport
+            ,retry_policy = CountingRetry(self.metrics) if self.metrics is not None else ExponentialRetry()
+        )
+
+        self.schedule_sas_refresh()
+
+
+    def schedule_sas_refresh(
+        self
+        ,delay: timedelta = None # delay after which the token is refreshed. By default sas_refresh_ratio of the token lifetime.
+    ):
+        """
+        This function schedules generating a new SAS token after sas_refresh_ratio of the lifetime of the current token has passed.
+        """
+        if delay is None:
+            delay = self.sas_lifetime * self.sas_refresh_ratio
+
+        self.sas_refresh_timer = threading.Timer(
+            delay.total_seconds()
+            ,self.refresh_sas
+        )
+        # the timer doesn't keep the program running
+        self.sas_refresh_timer.daemon = True
+        self.sas_refresh_timer.start()
+
+
+    def refresh_sas(
+        self
+    ):
+        """
+        This function generates a new SAS token and swaps it into the credential used by all the clients of this session.
+
+        If that fails, then the error is logged and the refresh is retried after sas_retry_delay, so the refreshing never stops before the 
+        session is closed.
+        """
+        delay = None
+        try:
+            self.credential.update(self.create_account_sas())
+        except Exception:
+            logger.exception(f'Refreshing the SAS token of {self.account_name} failed, retrying in {self.sas_retry_delay}')
+            delay = self.sas_retry_delay
+        finally:
+            if not self.closed:
+                self.schedule_sas_refresh(delay)
+
+
+    def close(
+        self
+    ):
+        """
+        This function stops refreshing the SAS token and closes the connections of this session.
+        """
+        self.closed = True
+        self.sas_refresh_timer.cancel()
+        self.http_session.close()
+
+
+    def create_account_sas(
+        self
+    ):
+        """
+        Function for creating an account SAS token (This is needed for authentication when connecting to Azure Blob Storage).
+        """
+        # Define the start and expiry time for the SAS 
+        start_time = datetime.utcnow()
+        self.sas_expiry_date = start_time + self.sas_lifetime
+    
+        # Define the SAS permissions
+        sas_permissions = AccountSasPermissions(read=True, write=True, delete=True, list=True)
+    
+        # Define the SAS resource types
+        sas_resource_types = ResourceTypes(service=True, container=True, object=True)
+
+        # Generate the SAS
+        sas = generate_account_sas(
+            account_name = self.account_name
+            ,account_key = self.access_key
+            ,resource_types = sas_resource_types
+            ,permission = sas_permissions
+            ,expiry = self.sas_expiry_date
+            ,start = start_time
+        )
+
+        return sas
+
+
+    def get_service_client(
+        self
+    ) -> DataLakeServiceClient:
+        """
+        Returns the service client of this session.
+        """
+        return self.service_client
+
+
+    def get_file_system_client(
+        self
+        ,container_name
+    ):
+        """
+        Returns a cached client for the given container.
+        """
+        with self.lock:
+            if container_name not in self.file_system_clients:
+                self.file_system_clients[container_name] = self.service_client.get_file_system_client(container_name)
+
+            return self.file_system_clients[container_name]
+
+
+    def get_file_client(
+        self
+        ,container_name
+        ,file_path
+    ):
+        """
+        Returns a cached client for the given file. At most max_cached_file_clients clients are cached, the least recently used ones 
+        are dropped first.
+        """
+        file_system_client = self.get_file_system_client(container_name)
+
+        with self.lock:
+            key = (container_name, file_path)
+            if key in self.file_clients:
+                self.file_clients.move_to_end(key)
+            else:
+                self.file_clients[key] = file_system_client.get_file_client(file_path)
+                if len(self.file_clients) > self.max_cached_file_clients:
+                    self.file_clients.popitem(last = False)
+
+            return self.file_clients[key]
+
+
+    def get_directory_client(
+        self
+        ,container_name
+        ,directory_name
+    ):
+        """
+        Returns a client for the given directory.
+        """
+        return self.get_file_system_client(container_name).get_directory_client(directory_name)
+
+
+    def storage_options(
+        self
+    ):
+        """
+        Returns storage options used by the deltalake library for connecting to the Data Lake. They contain the account name and the access 
+        key, not the SAS token of this session: DeltaTable objects are cached and kept for a long time (see the DeltaLake.cached_delta_table 
+        function) and they can't be given a refreshed token, so they would fail once the token expires.
+        """
+        return {
+            "account_name": self.account_name
+            ,"access_key": self.access_key
+        }
+
+
+    def table_uri(
+        self
+        ,container_name # name of the container where the delta table is saved
+        ,path # path to the delta table inside of a given container
+    ):
+        """
+        Returns the URI of the delta table which is used by the deltalake library.
+        """
+        return f'abfss://{container_name}@{self.account_name}.dfs.core.windows.net/{path}'
+
+
+    def create_container(
+        self
+        ,container_name
+    ):
+        self.service_client.create_file_system(container_name)
+
+
+    def delete_container(
+        self
+        ,container_name
+    ):
+        self.service_client.delete_file_system(container_name)
+
+
+    def list_containers(
+        self
+    ):
+        """
+        Returns names of all the containers
+        """
+        file_systems = self.service_client.list_file_systems()
+        
+        return [file_system.name for file_system in file_systems]            
+
+
+    def create_directory(
+        self
+        ,container_name
+        ,directory_name
+    ):
+        file_system_client = self.get_file_system_client(container_name)
+        file_system_client.create_directory(directory_name)
+
+
+    def delete_directory(
+        self
+        ,container_name
+        ,directory_name
+    ):
+        file_system_client = self.get_file_system_client(container_name)
+        file_system_client.delete_directory(directory_name)
+
+    
+    def rename_directory(
+        self
+        ,container_name
+        ,directory_name
+        ,new_directory_name
+    ):
+        directory_client = self.get_directory_client(container_name, directory_name)
+        directory_client.rename_directory(new_name = f"{container_name}/{new_directory_name}")
+
+    
+    def upload_file(
+        self
+        ,container_name
+        ,cloud_file_path
+        ,local_file_path
+        ,chunk_size = None # size of the chunks in which the file is uploaded. By default it is the default of the client (100 MiB).
+        ,max_concurrency = 1 # number of chunks uploaded at the same time
+    ):
+        file_client = self.get_file_client(container_name, cloud_file_path)
+        # the MD5 hash is saved in the properties of the file, so unchanged files can be skipped by the next upload
+        content_settings = ContentSettings(content_md5 = bytearray(self.local_file_md5(local_file_path)))
+        chunk_options = {'chunk_size': chunk_size} if chunk_size is not None else {}
+
+        with open(file = local_file_path, mode = "rb") as data:
+            file_client.upload_data(
+                data
+                ,overwrite = True
+                ,max_concurrency = max_concurrency
+                ,content_settings = content_settings
+                ,**chunk_options
+            )
+
+
+    def file_checksum(
+        self
+        ,container_name
+        ,file_path
+    ):
+        file_client = self.get_file_client(container_name, file_path)
+        try:
+            properties = file_client.get_file_properties()
+        except azure.core.exceptions.ResourceNotFoundError:
+            return None
+
+        md5 = properties.content_settings.content_md5
+        return properties.size, bytes(md5) if md5 else None
+
+    
+    def list_directory_content(
+        self
+        ,container_name
+        ,path
+    ):
+        file_system_client = self.get_file_system_client(container_name)
+        try:
+            paths = file_system_client.get_paths(path = path)
+            paths = np.array([path.name for path in paths])
+        except azure.core.exceptions.ResourceNotFoundError:
+            raise Exception("Specified directory doesn't exist")
+
+        return paths
+
+
+    def file_exists(
+        self
+        ,container_name
+        ,file_path
+    ) -> bool:
+        file_client = self.get_file_client(container_name, file_path)
+        try:
+            file_client.get_file_properties()
+            return True
+        except azure.core.exceptions.ResourceNotFoundError:
+            return False
@@ -4,7 +4,7 @@ import os, sys
 classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
 sys.path.append(classes_path)
 
-from class_azure_blob import AzureBlob
+from class_async_azure_blob import ConcurrentAzureBlob
 
 from dotenv import load_dotenv
 
@@ -18,13 +18,18 @@ load_dotenv()
 account_name = os.getenv('ACCOUNT_NAME')
 access_key = os.getenv('ACCESS_KEY')
 
-# Initialize class for working with Data Lake containers, directories and files
-blob = AzureBlob(
+# Initialize class for working with Data Lake containers, directories and files. Requests are sent concurrently by the asyncio client.
+blob = ConcurrentAzureBlob(
     account_name
     ,access_key
 )
 
+# directories of every container are deleted concurrently
+directories_to_delete = {}
 for container_name, directory_name in zip(container_names, directory_names):
-    blob.delete_directory(container_name, directory_name)
+    directories_to_delete.setdefault(container_name, []).append(directory_name)
 
-    print(f'deleted the {directory_name} directory in the {container_name} container.')
\ No newline at end of file
+with blob:
+    for container_name, directories in directories_to_delete.items():
+        for directory_name in blob.delete_directories(container_name, directories, missing_ok = True):
+            print(f'deleted the {directory_name} directory in the {container_name} container.')
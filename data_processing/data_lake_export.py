@@ -0,0 +1,74 @@
+"""
+This script is exporting delta tables from the Data Lake back into a given SQL db (reverse ETL). Tables are exported incrementally:
+if since the last export data was only appended to a delta table, then only new files are inserted into the SQL table, otherwise the SQL
+table is replaced.
+
+We need to specify in the .env file values for all the variables which are accessed in this script using the os.getenv() function. Those are parameters of
+the SQL db and Data Lake.
+
+At the begining of that script we need to specify the tables_to_export parameter containing information about which tables will be exported.
+"""
+
+from pathlib import Path
+import os, sys
+
+classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
+sys.path.append(classes_path)
+
+from class_data_ingestion import DataIngestion
+
+from config import container_name, directory_name # name of the container and directory in that container where the delta tables are saved.
+
+from dotenv import load_dotenv
+
+
+# === Script configuration ===
+
+# tables_to_export contains information about which tables will be exported. It is a table containing following columns:
+# [
+#     ['source_table_path', 'sql_schema_name', 'sql_table_name', 'columns']
+# ]
+# - source_table_path: path of the delta table in the container which will be exported.
+# - sql_schema_name, sql_table_name: schema and name of the target SQL table. It is created if it doesn't exist.
+# - columns: list of exported columns or None for all the columns.
+tables_to_export = [
+    [f'{directory_name}/table1', 'curated', 'table1', None]
+    ,[f'{directory_name}/table2', 'curated', 'table2', ['ID', 'dim_col', 'measure']]
+]
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+account_name = os.getenv('ACCOUNT_NAME')
+access_key = os.getenv('ACCESS_KEY')
+
+server_name = os.getenv('SQL_SERVER_NAME')
+database = os.getenv('SQL_DB_NAME')
+sql_username = os.getenv('SQL_USERNAME')
+sql_password = os.getenv('SQL_PASSWORD')
+
+di = DataIngestion(
+    sql_server = server_name
+    ,sql_database = database
+    ,sql_username = sql_username
+    ,sql_password = sql_password
+    ,dl_account_name = account_name
+    ,dl_access_key = access_key
+    ,extract_logs_container_name = 'extract-logs'
+    ,extract_logs_path = 'extract_logs'
+)
+
+try:
+    for source_table_path, sql_schema_name, sql_table_name, columns in tables_to_export:
+        result = di.export_to_sql(
+            container_name
+            ,source_table_path
+            ,sql_table_name
+            ,sql_schema_name
+            ,columns = columns
+        )
+
+        print(f"{source_table_path} -> {sql_schema_name}.{sql_table_name}: {result['mode']}, version {result['version']}, {result['rows']} rows, {result['rows_per_second']} rows/s")
+finally:
+    di.close()
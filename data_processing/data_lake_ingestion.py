@@ -18,6 +18,7 @@ sys.path.append(classes_path)
 from class_azure_blob import AzureBlob
 from class_data_ingestion import DataIngestion
 from class_sql import SQL
+from class_load_metrics import LoadMetrics
 
 from config import container_name, directory_name # name of the container and directory in that container where we will be ingesting data.
 
@@ -47,6 +48,35 @@ tables_inc_load = [
     ['db.fact.table2', f'{directory_name}/table2', 'db.fact.table2_changes', 'date_created', 'ID', 'deleted']
 ]
 
+# tables_hash_load contains tables without a changes table, which are loaded incrementally by comparing hashes of their rows
+# (see the DataIngestion.hash_incr_load function). It is a table containing following columns:
+# [
+#     ['source_table_name', 'target_table_path', 'pk_name']
+# ]
+tables_hash_load = []
+
+# tables_tracked_load contains tables which changes are tracked by SQL Server (Change Tracking, CDC or a rowversion column), loaded 
+# by the DataIngestion.tracked_incr_load function. It is a table containing following columns:
+# [
+#     ['source_table_name', 'target_table_path', 'pk_name', 'mode', 'rowversion_column']
+# ]
+# - mode: 'change_tracking', 'cdc' or 'rowversion'.
+# - rowversion_column: name of the rowversion column (only for the 'rowversion' mode, otherwise None).
+tables_tracked_load = []
+
+# number of tables loaded at the same time and limits of the number of loads which read from SQL and write into the Data Lake at the 
+# same time (None means no limit).
+workers = 4
+max_sql_connections = None
+max_storage_writers = None
+
+# if True then target tables which have too many small files are compacted after they are loaded
+maintain = True
+
+# path of a target table which will be profiled with cProfile and tracemalloc during its load (or None). Profiles are saved in the 
+# 'profiles' directory.
+profile_table = None
+
 
 # Load environment variables from .env file
 load_dotenv()
@@ -69,34 +99,83 @@ di = DataIngestion(
     ,dl_access_key = access_key
     ,extract_logs_container_name = 'extract-logs'
     ,extract_logs_path = 'extract_logs'
+    ,metrics = LoadMetrics(profile_table = profile_table)
 )
 
-# full load
-for table_name in tables_full_load:
-    di.full_load(
-        source_table_name = table_name
-        ,container_name = container_name
-        ,target_table_path = f"{directory_name}/{table_name.split('.')[-1]}"
-        ,if_exists = 'overwrite'
-    )
+# full and incremental loads are run concurrently. Arguments of every load are passed to the DataIngestion.full_load and
+# DataIngestion.incr_load functions.
+full_loads = [
+    {
+        'source_table_name': table_name
+        ,'container_name': container_name
+        ,'target_table_path': f"{directory_name}/{table_name.split('.')[-1]}"
+        ,'if_exists': 'overwrite'
+    }
+    for table_name in tables_full_load
+]
 
-# incremental load
-for (
-    source_table_name
-    ,target_table_path
-    ,changes_table_name
-    ,change_created_date_column
-    ,pk
-    ,deleted_col
-) in (
-    tables_inc_load
-):
-    di.incr_load(
+incr_loads = [
+    {
+        'source_table_name': source_table_name
+        ,'container_name': container_name
+        ,'target_table_path': target_table_path
+        ,'changes_table_name': changes_table_name
+        ,'change_created_date_column': change_created_date_column
+        ,'pk': pk
+        ,'deleted_col': deleted_col
+    }
+    for (
         source_table_name
-        ,container_name
         ,target_table_path
         ,changes_table_name
         ,change_created_date_column
         ,pk
         ,deleted_col
-    )
\ No newline at end of file
+    ) in (
+        tables_inc_load
+    )
+]
+
+hash_incr_loads = [
+    {
+        'source_table_name': source_table_name
+        ,'container_name': container_name
+        ,'target_table_path': target_table_path
+        ,'pk': pk
+    }
+    for source_table_name, target_table_path, pk in tables_hash_load
+]
+
+tracked_incr_loads = [
+    {
+        'source_table_name': source_table_name
+        ,'container_name': container_name
+        ,'target_table_path': target_table_path
+        ,'pk': pk
+        ,'mode': mode
+        ,'rowversion_column': rowversion_column
+    }
+    for source_table_name, target_table_path, pk, mode, rowversion_column in tables_tracked_load
+]
+
+# the session is closed also when a load fails, so its SAS token refresh is stopped
+try:
+    summaries = di.run_loads(
+        full_loads = full_loads
+        ,incr_loads = incr_loads
+        ,hash_incr_loads = hash_incr_loads
+        ,tracked_incr_loads = tracked_incr_loads
+        ,workers = workers
+        ,max_sql_connections = max_sql_connections
+        ,max_storage_writers = max_storage_writers
+        ,maintain = maintain
+    )
+finally:
+    di.close()
+
+for summary in summaries:
+    print(f"{summary['load_type']} load of {summary['target_table_path']}: {summary['status']} in {summary['seconds']:.1f}s")
+    if summary['error'] is not None:
+        print(f"    {summary['error']}")
+    for stage in summary['stages']:
+        print(f"    {stage['stage']}: {stage['seconds']:.2f}s, rows: {stage['rows']}, bytes: {stage['bytes']}, retries: {stage['retries']}")
@@ -0,0 +1,68 @@
+"""
+This script performs maintenance of delta tables in the Data Lake (compacting small files, Z-ordering, creating checkpoints, vacuuming).
+It can be run on a schedule, independently from the data ingestion.
+
+We need to specify in the .env file values for all the variables which are accessed in this script using the os.getenv() function. Those are 
+parameters of the Data Lake.
+
+At the begining of that script we need to specify the tables_to_maintain parameter containing information about which tables will be maintained.
+"""
+
+from pathlib import Path
+import os, sys
+
+classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
+sys.path.append(classes_path)
+
+from class_delta_lake import DeltaLake
+from class_delta_maintenance import DeltaMaintenance
+
+from config import container_name, directory_name # name of the container and directory in that container where we are ingesting data.
+
+from dotenv import load_dotenv
+
+
+# === Script configuration ===
+
+# tables_to_maintain contains information about which tables will be maintained. It is a table containing following columns:
+# [
+#     ['target_table_path', 'zorder_columns']
+# ]
+# - target_table_path: path of the delta table in the container.
+# - zorder_columns: list of columns by which the table is Z-ordered during compaction (for example the primary key used for 
+#   incremental loads) or None.
+tables_to_maintain = [
+    [f'{directory_name}/table1', None]
+    ,[f'{directory_name}/table2', ['ID']]
+]
+
+# if True then all the tables are compacted, checkpointed and vacuumed, otherwise only the ones which exceed thresholds of the 
+# DeltaMaintenance class.
+force = False
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+account_name = os.getenv('ACCOUNT_NAME')
+access_key = os.getenv('ACCESS_KEY')
+
+dl = DeltaLake(
+    account_name = account_name
+    ,access_key = access_key
+)
+
+maintenance = DeltaMaintenance(dl)
+
+try:
+    for target_table_path, zorder_columns in tables_to_maintain:
+        report = maintenance.maintain(
+            container_name
+            ,target_table_path
+            ,zorder_columns = zorder_columns
+            ,force = force
+        )
+
+        print(f"{target_table_path}: {report['stats']['files']} files, compacted: {report['optimize'] is not None}, checkpoint: {report['checkpoint']}, vacuumed files: {report['vacuumed_files']}")
+finally:
+    dl.close()
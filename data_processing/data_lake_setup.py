@@ -8,7 +8,7 @@ import os, sys
 classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
 sys.path.append(classes_path)
 
-from class_azure_blob import AzureBlob
+from class_async_azure_blob import ConcurrentAzureBlob
 from config import container_name, directory_name # name of the container and directory in that container where we will be ingesting data.
 from dotenv import load_dotenv
 
@@ -18,14 +18,16 @@ load_dotenv()
 account_name = os.getenv('ACCOUNT_NAME')
 access_key = os.getenv('ACCESS_KEY')
 
-# Initialize class for working with Data Lake containers, directories and files
-blob = AzureBlob(
+# Initialize class for working with Data Lake containers, directories and files. Requests are sent concurrently by the asyncio client.
+blob = ConcurrentAzureBlob(
     account_name
     ,access_key
 )
 
 # create container source_data and folder source_data in that container if they don't exist yet.
-if container_name not in blob.list_containers():
-    blob.create_container(container_name)
-if not blob.file_exists(container_name, directory_name):
-    blob.create_directory(container_name, directory_name)
\ No newline at end of file
+with blob:
+    if container_name not in blob.list_containers():
+        blob.create_container(container_name)
+
+    missing_directories = [path for path, exists in blob.files_exist(container_name, [directory_name]).items() if not exists]
+    blob.create_directories(container_name, missing_directories)
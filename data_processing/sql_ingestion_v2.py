@@ -17,7 +17,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
-now_date = datetime.utcnow().strftime('%Y-%m-%d,%H-%M-%S')
+now_date = datetime.utcnow()
 
 # Define tables which we will create in the SQL db. The sql_tables dictionary has the following format:
 # [
@@ -84,4 +84,5 @@ for sql_table, if_exist in zip(sql_tables, ['replace', 'append']):
         ,sql_table_name = sql_table['table_name']
         ,sql_schema_name = sql_table['table_schema']
         ,if_exists = if_exist
+        ,method = 'bulk'
     )
\ No newline at end of file
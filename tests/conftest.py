@@ -0,0 +1,82 @@
+"""
+Fixtures shared by the tests. Tests run the classes without SQL Server and Azure: the source db is a SQLite file (see the LocalSQL class) and
+the Data Lake is a directory on the local disk (see the LocalStorageBackend class), both created in a temporary directory of every test.
+"""
+
+from pathlib import Path
+import sys
+
+classes_path = Path(Path(__file__).parent.parent / 'classes').resolve().as_posix()
+sys.path.append(classes_path)
+
+from class_local_sql import LocalSQL
+from class_storage_backend import LocalStorageBackend
+from class_data_ingestion import DataIngestion
+
+from datetime import datetime, timedelta
+from deltalake import DeltaTable
+import pytest
+
+container_name = 'lake'
+
+
+@pytest.fixture
+def sql(tmp_path):
+    sql = LocalSQL(tmp_path / 'source.db')
+    yield sql
+    sql.engine.dispose()
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalStorageBackend(tmp_path / 'lake')
+
+
+@pytest.fixture
+def di(sql, backend):
+    di = DataIngestion(sql = sql, storage_backend = backend)
+    di.create_container(container_name)
+    return di
+
+
+def execute(sql: LocalSQL, query, rows = None):
+    "executing a query in the SQLite db, once for every row of parameters if rows are given"
+    con = sql.engine.raw_connection()
+    try:
+        if rows is None:
+            con.execute(query)
+        else:
+            con.executemany(query, rows)
+        con.commit()
+    finally:
+        con.close()
+
+
+def create_source_table(sql: LocalSQL, rows = 100, table_name = 'source_table'):
+    """
+    creating a source table with an integer primary key (ID), a text column, a numeric column and a timestamp column, filled with
+    rows rows, where ID = 1, 2, ..., rows.
+    """
+    execute(sql, f'drop table if exists {table_name}')
+    execute(sql, f'create table {table_name} (ID integer primary key, name text, measure real, date_created timestamp)')
+    created = datetime(2024, 1, 1)
+    execute(
+        sql
+        ,f'insert into {table_name} values (?, ?, ?, ?)'
+        ,[(id, f'name_{id}', id / 10, created + timedelta(hours = id)) for id in range(1, rows + 1)]
+    )
+
+
+def create_changes_table(sql: LocalSQL, changes):
+    "creating the changes table of the source table (see the create_source_table function) with the given (ID, measure, deleted, created) rows"
+    execute(sql, 'create table source_table_changes (ID integer, name text, measure real, date_created timestamp, deleted integer)')
+    execute(
+        sql
+        ,'insert into source_table_changes values (?, ?, ?, ?, ?)'
+        ,[(id, f'name_{id}', measure, created, deleted) for id, measure, deleted, created in changes]
+    )
+
+
+def read_table(backend: LocalStorageBackend, path, container_name = container_name):
+    "returning the current version of a delta table saved by the backend as a pyarrow Table sorted by ID"
+    return DeltaTable(backend.table_uri(container_name, path)).to_pyarrow_table().sort_by('ID')
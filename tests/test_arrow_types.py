@@ -0,0 +1,91 @@
+"""
+SQL Server is not needed by these tests: the SQL object is created without an engine (pyodbc can't be imported without the ODBC driver
+manager) and its connection is replaced by a fake one, which returns rows described the same way as by pyodbc.
+"""
+
+from class_sql import SQL
+from class_load_metrics import LoadMetrics
+
+from types import SimpleNamespace
+from decimal import Decimal
+import datetime
+import pyarrow as pa
+import pytest
+
+
+class FakeCursor:
+    def __init__(self, description, rows):
+        # pyodbc describes a column as (name, type_code, display_size, internal_size, precision, scale, null_ok)
+        self.description = [(name, type_code, None, None, precision, scale, True) for name, type_code, precision, scale in description]
+        self.rows = rows
+
+    def execute(self, query, params = None):
+        pass
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sql():
+    sql = SQL.__new__(SQL)
+    sql.metrics = LoadMetrics()
+    return sql
+
+
+def fake_connection(sql, description, rows):
+    cursor = FakeCursor(description, rows)
+    sql.engine = SimpleNamespace(raw_connection = lambda: SimpleNamespace(cursor = lambda: cursor, close = lambda: None))
+
+
+@pytest.mark.parametrize('type_code, precision, scale, arrow_type', [
+    (bool, 1, 0, pa.bool_()) # bit
+    ,(int, 3, 0, pa.int16()) # tinyint
+    ,(int, 5, 0, pa.int16()) # smallint
+    ,(int, 10, 0, pa.int32()) # int
+    ,(int, 19, 0, pa.int64()) # bigint
+    ,(Decimal, 18, 2, pa.decimal128(18, 2)) # decimal(18, 2)
+    ,(Decimal, 38, 0, pa.decimal128(38, 0)) # decimal(38, 0)
+    ,(Decimal, 19, 4, pa.decimal128(19, 4)) # money
+    ,(float, 24, 0, pa.float32()) # real
+    ,(float, 53, 0, pa.float64()) # float
+    ,(datetime.datetime, 27, 7, pa.timestamp('us')) # datetime2
+    ,(datetime.datetime, 23, 3, pa.timestamp('us')) # datetime
+    ,(datetime.date, 10, 0, pa.date32()) # date
+    ,(datetime.time, 16, 7, pa.time64('us')) # time
+    ,(str, 50, 0, pa.string()) # nvarchar(50)
+    ,(str, 36, 0, pa.string()) # uniqueidentifier
+    ,(bytearray, 8, 0, pa.binary()) # rowversion
+    ,(bytes, 0, 0, pa.binary()) # varbinary(max)
+    ,(object, 0, 0, pa.string()) # sql_variant
+])
+def test_sql_server_types_are_mapped_into_arrow_types(sql, type_code, precision, scale, arrow_type):
+    assert sql.arrow_type(type_code, precision, scale) == arrow_type
+
+
+def test_reader_uses_the_types_of_the_cursor_description(sql):
+    fake_connection(
+        sql
+        ,[('ID', int, 10, 0), ('amount', Decimal, 18, 2), ('flag', bool, 1, 0), ('created', datetime.datetime, 27, 7)]
+        ,[(1, None, None, None), (None, Decimal('1.50'), True, datetime.datetime(2024, 1, 1, 12, 30))]
+    )
+
+    table = sql.read_query_reader('select * from dbo.source_table', batch_size = 1).read_all()
+
+    assert table.schema == pa.schema([
+        ('ID', pa.int32()), ('amount', pa.decimal128(18, 2)), ('flag', pa.bool_()), ('created', pa.timestamp('us'))
+    ])
+    assert table.column('ID').to_pylist() == [1, None]
+    assert table.column('amount').to_pylist() == [None, Decimal('1.50')]
+
+
+def test_values_of_types_which_are_not_mapped_are_read_as_strings(sql):
+    fake_connection(sql, [('value', object, 0, 0)], [(1,), (datetime.date(2024, 1, 1),), (None,)])
+
+    table = sql.read_query_reader('select value from dbo.source_table').read_all()
+
+    assert table.column('value').to_pylist() == ['1', '2024-01-01', None]
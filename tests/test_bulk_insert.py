@@ -0,0 +1,105 @@
+"""
+pyodbc and SQL Server are not needed by these tests: the connection of the engine is replaced by a fake one which records the executed
+statements, and pyodbc type codes are replaced by their names.
+"""
+
+import class_sql
+
+from types import SimpleNamespace
+from decimal import Decimal
+import pyarrow as pa
+import pytest
+
+pyodbc_types = [
+    'SQL_BIT', 'SQL_SMALLINT', 'SQL_INTEGER', 'SQL_BIGINT', 'SQL_REAL', 'SQL_DOUBLE', 'SQL_DECIMAL', 'SQL_WVARCHAR', 'SQL_VARBINARY'
+    ,'SQL_TYPE_TIMESTAMP', 'SQL_TYPE_DATE'
+]
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.rows = []
+        self.input_sizes = []
+
+    def execute(self, query):
+        self.statements.append(' '.join(query.split()))
+
+    def executemany(self, query, rows):
+        self.statements.append(' '.join(query.split()))
+        self.rows.extend(rows)
+
+    def setinputsizes(self, sizes):
+        self.input_sizes.append(sizes)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.cursor_object = FakeCursor(self.statements)
+        self.committed = False
+
+    def cursor(self):
+        return self.cursor_object
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def connection(sql, monkeypatch):
+    connection = FakeConnection()
+    monkeypatch.setattr(class_sql, 'pyodbc', SimpleNamespace(**{name: name for name in pyodbc_types}))
+    monkeypatch.setattr(sql, 'engine', SimpleNamespace(raw_connection = lambda: connection))
+    return connection
+
+
+def create_statement(connection):
+    return next(statement for statement in connection.statements if 'create table' in statement)
+
+
+def test_table_columns_are_sized_on_the_whole_table(sql, connection):
+    data = pa.table({'ID': pa.array([1, 2], pa.int32()), 'name': ['a', 'abcde']})
+
+    result = sql.bulk_insert(data, 'target', 'dbo')
+
+    assert result['rows'] == 2
+    assert '[ID] int, [name] nvarchar(5)' in create_statement(connection)
+    assert connection.cursor_object.rows == [(1, 'a'), (2, 'abcde')]
+    assert connection.committed
+
+
+def test_reader_creates_max_string_columns(sql, connection):
+    schema = pa.schema([('name', pa.string()), ('payload', pa.binary())])
+    batches = [pa.record_batch([['a'], [b'x']], schema = schema), pa.record_batch([['b' * 5_000], [b'y' * 9_000]], schema = schema)]
+
+    sql.bulk_insert(pa.RecordBatchReader.from_batches(schema, batches), 'target', 'dbo')
+
+    assert '[name] nvarchar(max), [payload] varbinary(max)' in create_statement(connection)
+    assert len(connection.cursor_object.rows) == 2
+
+
+def test_uint64_is_inserted_as_decimal(sql, connection):
+    data = pa.table({'counter': pa.array([2 ** 64 - 1, 1], pa.uint64())})
+
+    sql.bulk_insert(data, 'target', 'dbo')
+
+    assert '[counter] decimal(20, 0)' in create_statement(connection)
+    assert connection.cursor_object.input_sizes == [[('SQL_DECIMAL', 20, 0)]]
+    assert connection.cursor_object.rows == [(Decimal(2 ** 64 - 1),), (Decimal(1),)]
+
+
+def test_replace_loads_a_staging_table_and_swaps_it(sql, connection):
+    sql.bulk_insert(pa.table({'ID': [1]}), 'target', 'dbo', if_exists = 'replace')
+
+    assert 'create table [dbo].[target__staging]' in create_statement(connection)
+    assert connection.statements[-1] == "exec sp_rename 'dbo.target__staging', 'target'"
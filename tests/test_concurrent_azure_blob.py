@@ -0,0 +1,118 @@
+"""
+The Azure Storage Account is not needed by these tests: the asyncio Data Lake client is replaced by a fake one which keeps paths in memory,
+and the storage session is replaced by a fake one.
+"""
+
+import class_async_azure_blob
+from class_async_azure_blob import ConcurrentAzureBlob
+
+from types import SimpleNamespace
+import azure.core.exceptions
+import threading
+import asyncio
+import pytest
+
+
+class FakeSession:
+    def __init__(self, account_name = 'account', access_key = 'key', metrics = None):
+        self.account_name = account_name
+        self.access_key = access_key
+        self.credential = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServiceClient:
+    "in-memory Data Lake client recording the threads on which it is called and the highest number of requests running at once"
+    def __init__(self, account_url, credential, retry_policy):
+        self.paths = {'lake/existing', 'lake/existing/file.txt'}
+        self.threads = set()
+        self.running = 0
+        self.max_running = 0
+        self.closed = False
+
+    async def request(self, path, operation):
+        self.threads.add(threading.current_thread().name)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            return operation(path)
+        finally:
+            self.running -= 1
+
+    def missing(self, path):
+        if path not in self.paths:
+            raise azure.core.exceptions.ResourceNotFoundError(f'{path} not found')
+
+    def get_file_system_client(self, container_name):
+        return SimpleNamespace(
+            create_directory = lambda name: self.request(f'{container_name}/{name}', self.paths.add)
+            ,delete_directory = lambda name: self.request(
+                f'{container_name}/{name}', lambda path: self.missing(path) or self.paths.remove(path)
+            )
+        )
+
+    def get_file_client(self, container_name, file_path):
+        return SimpleNamespace(get_file_properties = lambda: self.request(f'{container_name}/{file_path}', self.missing))
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    "replacing the asyncio client and the storage session by the fake ones. The client is created by the façade on its event loop."
+    monkeypatch.setattr(class_async_azure_blob, 'DataLakeServiceClient', FakeServiceClient)
+    monkeypatch.setattr(class_async_azure_blob, 'StorageSession', FakeSession)
+
+
+@pytest.fixture
+def blob(client):
+    blob = ConcurrentAzureBlob('account', 'key', max_concurrency = 2)
+    yield blob
+    if not blob.loop.is_closed():
+        blob.close()
+
+
+def test_bulk_helpers_run_concurrently_on_the_background_event_loop(blob):
+    blob.create_directories('lake', ['a', 'b', 'c', 'd'])
+    exist = blob.files_exist('lake', ['a', 'existing/file.txt', 'missing'])
+
+    assert exist == {'a': True, 'existing/file.txt': True, 'missing': False}
+    service_client = blob.blob.service_client
+    assert service_client.threads == {blob.thread.name}
+    assert service_client.max_running == 2
+
+
+def test_missing_directories_are_skipped_only_if_missing_ok(blob):
+    assert blob.delete_directories('lake', ['existing', 'missing'], missing_ok = True) == ['existing']
+
+    with pytest.raises(azure.core.exceptions.ResourceNotFoundError):
+        blob.delete_directories('lake', ['missing'])
+    # the loop keeps working after an exception
+    assert not blob.file_exists('lake', 'existing')
+
+
+def test_close_stops_the_event_loop_and_closes_the_owned_session(blob):
+    blob.file_exists('lake', 'existing')
+    service_client = blob.blob.service_client
+
+    blob.close()
+
+    assert service_client.closed
+    assert not blob.thread.is_alive()
+    assert blob.loop.is_closed()
+    assert blob.session.closed
+
+
+def test_shared_session_is_not_closed(client):
+    session = FakeSession()
+
+    with ConcurrentAzureBlob(None, None, session = session) as blob:
+        assert blob.file_exists('lake', 'existing')
+
+    assert not blob.thread.is_alive()
+    assert not session.closed
@@ -0,0 +1,105 @@
+from class_delta_maintenance import DeltaMaintenance
+
+from deltalake import DeltaTable
+import pyarrow as pa
+import pytest
+
+
+@pytest.fixture
+def history_limits(monkeypatch):
+    "recording the limit of every read of the history of a delta table"
+    limits = []
+    history = DeltaTable.history
+
+    def recorded_history(self, limit = None):
+        limits.append(limit)
+        return history(self, limit)
+
+    monkeypatch.setattr(DeltaTable, 'history', recorded_history)
+    return limits
+
+
+@pytest.fixture
+def records(di):
+    "collecting records emitted by the metrics of the di object"
+    records = []
+    di.dl.metrics.callback = records.append
+    return records
+
+
+def append_files(di, count, start = 0, rows_per_file = 10):
+    "appending count small files into the lake/table delta table"
+    for i in range(start, start + count):
+        di.dl.write_deltalake(pa.table({'ID': list(range(i * rows_per_file, (i + 1) * rows_per_file))}), 'lake', 'table', mode = 'append')
+
+
+def maintenance_details(records):
+    return [record['details'] for record in records if record['stage'] == 'delta_maintenance'][-1]
+
+
+def test_table_under_the_thresholds_is_not_compacted(di):
+    append_files(di, 3)
+
+    report = DeltaMaintenance(di.dl, max_small_files = 5).maintain('lake', 'table')
+
+    assert report['optimize'] is None
+    assert report['stats']['small_files'] == 3
+
+
+def test_table_with_too_many_small_files_is_compacted(di):
+    append_files(di, 6)
+
+    report = DeltaMaintenance(di.dl, max_small_files = 5).maintain('lake', 'table')
+
+    assert report['optimize']['numFilesRemoved'] == 6
+    assert report['checkpoint']
+    assert DeltaMaintenance(di.dl).table_stats('lake', 'table')['files'] == 1
+
+
+def test_table_with_too_many_bytes_in_small_files_is_compacted(di):
+    append_files(di, 3)
+    size = DeltaMaintenance(di.dl).table_stats('lake', 'table')['small_files_bytes']
+
+    report = DeltaMaintenance(di.dl, max_small_files = 5, max_small_files_bytes = size - 1).maintain('lake', 'table')
+
+    assert report['optimize'] is not None
+
+
+def test_table_is_z_ordered_only_when_enough_data_is_new(di, records):
+    maintenance = DeltaMaintenance(di.dl, max_small_files = 2, min_zorder_new_data_ratio = 0.5)
+    append_files(di, 10, rows_per_file = 1_000)
+
+    maintenance.maintain('lake', 'table', zorder_columns = ['ID'])
+    assert maintenance_details(records)['z_ordered']
+    assert maintenance.table_stats('lake', 'table', bytes_since_optimize = True)['bytes_since_optimize'] == 0
+
+    # 3 files with a single row are much less than a half of the table
+    append_files(di, 3, start = 10_000, rows_per_file = 1)
+    maintenance.maintain('lake', 'table', zorder_columns = ['ID'])
+    assert maintenance_details(records)['compacted']
+    assert not maintenance_details(records)['z_ordered']
+
+
+def test_history_is_not_read_without_z_ordering(di, history_limits):
+    append_files(di, 6)
+    history_limits.clear()
+
+    report = DeltaMaintenance(di.dl, max_small_files = 5).maintain('lake', 'table')
+
+    assert report['optimize'] is not None
+    assert report['stats']['bytes_since_optimize'] is None
+    assert history_limits == []
+
+
+def test_only_commits_since_the_previous_check_are_searched_for_the_last_optimize(di, history_limits):
+    maintenance = DeltaMaintenance(di.dl, max_small_files = 2, optimize_history_limit = 4)
+    append_files(di, 6)
+    history_limits.clear()
+
+    maintenance.maintain('lake', 'table', zorder_columns = ['ID'])
+    append_files(di, 3, start = 6)
+    history_limits.clear()
+    maintenance.maintain('lake', 'table', zorder_columns = ['ID'])
+
+    # versions 6-9 (the OPTIMIZE of the first maintenance and the appends) are searched, not the whole history
+    assert history_limits == [4]
@@ -0,0 +1,76 @@
+"""
+SQL Server is not needed by these tests: the bulk_insert function of the SQL object is replaced by a fake one which records the exported rows.
+"""
+
+import pyarrow as pa
+import pytest
+
+
+@pytest.fixture
+def inserts(di, monkeypatch):
+    "recording (if_exists, exported IDs) of every bulk insert"
+    inserts = []
+
+    def bulk_insert(source_table, sql_table_name, sql_schema_name, if_exists, batch_size, tablock):
+        ids = sorted(source_table.read_all().column('ID').to_pylist())
+        inserts.append((if_exists, ids))
+        return {'rows': len(ids), 'seconds': 0.1, 'rows_per_second': len(ids) / 0.1}
+
+    monkeypatch.setattr(di.sql, 'bulk_insert', bulk_insert)
+    return inserts
+
+
+def write(di, ids, mode = 'append'):
+    di.dl.write_deltalake(pa.table({'ID': ids, 'deleted': [0] * len(ids)}), 'lake', 'table', mode = mode)
+
+
+def export(di):
+    return di.export_to_sql('lake', 'table', 'target_table', 'dbo')
+
+
+def test_first_export_replaces_the_sql_table(di, inserts):
+    write(di, [1, 2])
+
+    result = export(di)
+
+    assert result['mode'] == 'full'
+    assert result['version'] == 0
+    assert inserts == [('replace', [1, 2])]
+
+
+def test_appended_files_are_exported_incrementally(di, inserts):
+    write(di, [1, 2])
+    export(di)
+    write(di, [3])
+    write(di, [4])
+
+    result = export(di)
+
+    assert result['mode'] == 'incremental'
+    assert inserts[-1] == ('append', [3, 4])
+    assert di.extract_logs['dbo.target_table']['last_exported_version'] == 2
+
+
+def test_export_without_new_versions_is_skipped(di, inserts):
+    write(di, [1, 2])
+    export(di)
+
+    assert export(di)['mode'] == 'skipped'
+    assert len(inserts) == 1
+
+
+def test_overwritten_table_is_exported_in_full(di, inserts):
+    write(di, [1, 2])
+    export(di)
+    write(di, [5], mode = 'overwrite')
+
+    assert export(di)['mode'] == 'full'
+    assert inserts[-1] == ('replace', [5])
+
+
+def test_table_recreated_after_the_last_export_is_exported_in_full(di, inserts):
+    write(di, [1, 2])
+    di.update_extract_log('dbo.target_table', last_exported_version = 5)
+
+    assert export(di)['mode'] == 'full'
+    assert inserts == [('replace', [1, 2])]
@@ -0,0 +1,49 @@
+from class_data_ingestion import DataIngestion
+
+from datetime import datetime
+from deltalake import write_deltalake
+import pyarrow as pa
+import pytest
+
+
+@pytest.fixture
+def maintenance_calls(di, monkeypatch):
+    "counting the maintenance checks of the extract logs delta table"
+    calls = []
+    monkeypatch.setattr(di.extract_logs_maintenance, 'maintain', lambda *args, **kwargs: calls.append(args))
+    return calls
+
+
+def test_legacy_extract_logs_with_string_dates_are_migrated(sql, backend):
+    backend.create_container('extract-logs')
+    write_deltalake(
+        backend.table_uri('extract-logs', 'extract_logs')
+        ,pa.table({'table_path': ['tables/source_table', 'tables/other_table'], 'last_extract_date': ['2024-01-02,03-04-05', None]})
+        ,storage_options = backend.storage_options()
+    )
+
+    di = DataIngestion(sql = sql, storage_backend = backend)
+
+    assert di.find_last_extract_date('tables/source_table') == datetime(2024, 1, 2, 3, 4, 5)
+    assert di.find_last_extract_date('tables/other_table') == datetime(1900, 1, 1)
+    # the migrated logs are saved with the current schema
+    schema = di.dl.read_deltalake('extract-logs', 'extract_logs', as_batches = True).schema
+    assert schema.field('last_extract_date').type == pa.timestamp('us')
+    assert DataIngestion(sql = sql, storage_backend = backend).find_last_extract_date('tables/source_table') == datetime(2024, 1, 2, 3, 4, 5)
+
+
+def test_change_versions_larger_than_int64_are_read_back(sql, backend, di):
+    # CDC LSNs have 10 bytes
+    lsn = 2 ** 79 + 12345
+
+    di.update_last_change_version('tables/source_table', lsn)
+
+    assert DataIngestion(sql = sql, storage_backend = backend).find_last_change_version('tables/source_table') == lsn
+
+
+def test_extract_logs_are_checked_for_compaction_once_per_extract_logs_max_files_saves(di, maintenance_calls):
+    for i in range(di.extract_logs_max_files * 2 + 1):
+        di.update_last_extract_date(f'tables/table_{i}', datetime(2024, 1, 1))
+
+    assert len(maintenance_calls) == 2
+    assert di.extract_logs_saves == 1
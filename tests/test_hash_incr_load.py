@@ -0,0 +1,80 @@
+from conftest import execute, create_source_table, read_table
+
+from deltalake import DeltaTable
+import pytest
+
+load_arguments = {
+    'source_table_name': 'main.source_table'
+    ,'container_name': 'lake'
+    ,'target_table_path': 'tables/source_table'
+    ,'pk': 'ID'
+}
+
+
+def read_index(backend):
+    "returning the hash index of the target table as a dictionary {ID: hash}"
+    index = DeltaTable(backend.table_uri('lake', 'tables/source_table/_hash_index')).to_pyarrow_table()
+    return dict(zip(index.column('ID').to_pylist(), index.column('__row_hash').to_pylist()))
+
+
+def assert_target_equals_source(sql, backend):
+    source = sql.read_query_arrow('select * from main.source_table').sort_by('ID')
+    target = read_table(backend, 'tables/source_table').select(source.column_names)
+    assert target.equals(source.cast(target.schema))
+
+
+def test_first_load_creates_the_table_and_the_hash_index(sql, backend, di):
+    create_source_table(sql, rows = 50)
+
+    assert di.hash_incr_load(**load_arguments) == {'rows_updated': 0, 'rows_inserted': 50, 'rows_deleted': 0}
+
+    assert_target_equals_source(sql, backend)
+    assert sorted(read_index(backend)) == list(range(1, 51))
+
+
+def test_unchanged_source_table_is_not_merged(sql, backend, di):
+    create_source_table(sql, rows = 50)
+    di.hash_incr_load(**load_arguments)
+    version = DeltaTable(backend.table_uri('lake', 'tables/source_table')).version()
+
+    assert di.hash_incr_load(**load_arguments) == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+    assert DeltaTable(backend.table_uri('lake', 'tables/source_table')).version() == version
+
+
+@pytest.mark.parametrize('partition_spec', [None, [{'column': 'ID', 'transform': 'bucket', 'buckets': 4}]])
+def test_changed_rows_are_updated_inserted_and_deleted(sql, backend, di, partition_spec):
+    create_source_table(sql, rows = 50)
+    di.hash_incr_load(**load_arguments, partition_spec = partition_spec)
+    index_before = read_index(backend)
+
+    execute(sql, 'update source_table set measure = measure + 1 where ID in (1, 2)')
+    execute(sql, 'update source_table set name = null where ID = 3')
+    execute(sql, 'delete from source_table where ID in (10, 11)')
+    execute(sql, "insert into source_table (ID, name) values (100, 'new')")
+
+    result = di.hash_incr_load(**load_arguments, partition_spec = partition_spec)
+
+    assert result == {'rows_updated': 3, 'rows_inserted': 1, 'rows_deleted': 2}
+    assert_target_equals_source(sql, backend)
+
+    index_after = read_index(backend)
+    assert sorted(index_after) == [id for id in range(1, 51) if id not in (10, 11)] + [100]
+    assert sorted(id for id in index_after if id in index_before and index_after[id] != index_before[id]) == [1, 2, 3]
+
+
+def test_a_load_with_only_deletes(sql, backend, di):
+    create_source_table(sql, rows = 20)
+    di.hash_incr_load(**load_arguments)
+    execute(sql, 'delete from source_table where ID > 15')
+
+    assert di.hash_incr_load(**load_arguments) == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 5}
+    assert_target_equals_source(sql, backend)
+
+
+def test_changed_rows_are_fetched_in_queries_of_keys_per_query_keys(sql, backend, di):
+    create_source_table(sql, rows = 20)
+    di.hash_incr_load(**load_arguments)
+    execute(sql, 'update source_table set measure = 0')
+
+    assert di.hash_incr_load(**load_arguments, keys_per_query = 3)['rows_updated'] == 20
+    assert_target_equals_source(sql, backend)
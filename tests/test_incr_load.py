@@ -0,0 +1,103 @@
+from conftest import execute, create_source_table, create_changes_table, read_table
+
+from datetime import datetime, timedelta
+import pyarrow as pa
+
+
+def test_latest_changes_keeps_the_newest_change_of_every_key(di):
+    changes = pa.table({
+        'ID': [2, 1, 2, 1, 3]
+        ,'date_created': [datetime(2024, 1, day) for day in [1, 2, 3, 1, 1]]
+        ,'measure': [20.0, 12.0, 23.0, 11.0, 31.0]
+    })
+
+    latest = di.latest_changes(changes, 'ID', 'date_created')
+
+    assert latest.column('ID').to_pylist() == [1, 2, 3]
+    assert latest.column('measure').to_pylist() == [12.0, 23.0, 31.0]
+
+
+def test_latest_changes_keeps_the_last_returned_change_with_the_same_date(di):
+    created = datetime(2024, 1, 1)
+    changes = pa.table({'ID': [1, 1, 1], 'date_created': [created] * 3, 'measure': [1.0, 2.0, 3.0]})
+
+    assert di.latest_changes(changes, 'ID', 'date_created').column('measure').to_pylist() == [3.0]
+
+
+def test_incr_load_applies_only_the_newest_change_of_every_key(sql, backend, di):
+    create_source_table(sql, rows = 10)
+    di.full_load('main.source_table', 'lake', 'tables/source_table')
+
+    now = datetime.now()
+    create_changes_table(sql, [
+        (1, 100.0, 0, now - timedelta(minutes = 10))
+        ,(1, 101.0, 0, now - timedelta(minutes = 5))
+        ,(2, 200.0, 0, now - timedelta(minutes = 5))
+        ,(2, None, 1, now - timedelta(minutes = 1))
+        ,(11, 110.0, 0, now - timedelta(minutes = 1))
+    ])
+
+    result = di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+    )
+
+    assert result == {'rows_updated': 1, 'rows_inserted': 1, 'rows_deleted': 1}
+    table = read_table(backend, 'tables/source_table')
+    assert table.column('ID').to_pylist() == [1] + list(range(3, 12))
+    assert table.column('measure').to_pylist()[0] == 101.0
+
+    # changes which were already ingested are not ingested again
+    assert di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+    ) == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+
+
+def test_incr_load_reads_changes_after_the_last_extract_date_up_to_the_current_time(sql, backend, di, monkeypatch):
+    create_source_table(sql, rows = 10)
+    now = datetime(2024, 6, 1, 12)
+    monkeypatch.setattr(di.sql, 'current_datetime', lambda: now)
+    create_changes_table(sql, [(1, 100.0, 0, now - timedelta(hours = 2)), (2, 200.0, 0, now + timedelta(minutes = 1))])
+    load = lambda **kwargs: di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted', **kwargs
+    )
+
+    # the change created after the current time is left for the next load
+    assert load()['rows_updated'] == 1
+    assert di.find_last_extract_date('tables/source_table') == now - timedelta(hours = 2)
+
+    # a change created at the last extract date was already ingested
+    execute(sql, 'insert into source_table_changes values (?, ?, ?, ?, ?)', [(3, 'name_3', 300.0, now - timedelta(hours = 2), 0)])
+    now = now + timedelta(minutes = 5)
+    assert load()['rows_updated'] == 1
+    assert read_table(backend, 'tables/source_table').column('measure').to_pylist()[:3] == [100.0, 200.0, 0.3]
+
+
+def test_incr_load_leaves_changes_within_the_commit_lag_for_the_next_load(sql, di, monkeypatch):
+    create_source_table(sql, rows = 10)
+    now = datetime(2024, 6, 1, 12)
+    monkeypatch.setattr(di.sql, 'current_datetime', lambda: now)
+    create_changes_table(sql, [(1, 100.0, 0, now - timedelta(seconds = 30))])
+    load = lambda: di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+        ,commit_lag_seconds = 60
+    )
+
+    assert load()['rows_updated'] == 0
+    now = now + timedelta(minutes = 1)
+    assert load()['rows_updated'] == 1
+
+
+def test_last_extract_date_is_not_advanced_without_changes(sql, di, monkeypatch):
+    create_source_table(sql, rows = 10)
+    created = datetime(2024, 6, 1, 12)
+    create_changes_table(sql, [(1, 100.0, 0, created)])
+    load = lambda: di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+    )
+    load()
+    saved_dates = []
+    monkeypatch.setattr(di, 'update_last_extract_date', lambda *args: saved_dates.append(args))
+
+    assert load() == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+    assert saved_dates == []
+    assert di.find_last_extract_date('tables/source_table') == created
@@ -0,0 +1,33 @@
+from class_load_metrics import LoadMetrics
+
+
+def test_counted_operations_are_emitted_once_per_operation_at_the_end_of_a_table():
+    records = []
+    metrics = LoadMetrics(callback = records.append)
+
+    with metrics.table('tables/source_table'):
+        for _ in range(3):
+            with metrics.count('storage_exists'):
+                pass
+        with metrics.count('storage_list'):
+            pass
+        assert records == []
+
+    counted = {record['stage']: record for record in records}
+    assert set(counted) == {'storage_exists', 'storage_list'}
+    assert counted['storage_exists']['table'] == 'tables/source_table'
+    assert counted['storage_exists']['details'] == {'calls': 3}
+    assert counted['storage_list']['rows'] == 1
+    assert metrics.counters == {}
+
+
+def test_operations_outside_of_tables_are_not_counted():
+    records = []
+    metrics = LoadMetrics(callback = records.append)
+
+    with metrics.count('storage_exists'):
+        pass
+    with metrics.table('tables/source_table'):
+        pass
+
+    assert records == []
@@ -0,0 +1,61 @@
+from conftest import create_source_table, create_changes_table, read_table
+
+from datetime import datetime, timedelta
+from deltalake import DeltaTable
+import pyarrow as pa
+
+bucket_spec = [{'column': 'ID', 'transform': 'bucket', 'buckets': 4}]
+
+
+def test_partition_columns_are_named_after_their_transforms(di):
+    spec = [{'column': 'region'}, {'column': 'created', 'transform': 'month'}] + bucket_spec
+
+    assert di.dl.partition_columns(spec) == ['region', 'created_month', 'ID_bucket']
+
+
+def test_partition_columns_are_added_to_data(di):
+    data = pa.table({'ID': [1, 6, 8], 'created': [datetime(2024, 1, 15), datetime(2024, 2, 1), datetime(2023, 12, 31)]})
+
+    data = di.dl.add_partition_columns(data, [{'column': 'created', 'transform': 'month'}] + bucket_spec)
+
+    assert data.column('created_month').to_pylist() == [202401, 202402, 202312]
+    assert data.column('ID_bucket').to_pylist() == [1, 2, 0]
+
+
+def test_partition_predicate_matches_only_partitions_present_in_data(di):
+    data = pa.table({'region': ["PL", "O'Neil", "PL"], 'ID_bucket': pa.array([1, 3, None], pa.int32())})
+
+    predicate = di.dl.partition_predicate(data, [{'column': 'region'}] + bucket_spec)
+
+    assert predicate == (
+        "target.region in ('PL', 'O''Neil') "
+        "and (target.ID_bucket in (1, 3) or target.ID_bucket is null)"
+    )
+
+
+def test_incr_load_rewrites_only_partitions_with_changes(sql, backend, di):
+    create_source_table(sql, rows = 40)
+    di.full_load('main.source_table', 'lake', 'tables/source_table', partition_spec = bucket_spec)
+
+    def partition_files():
+        add_actions = DeltaTable(backend.table_uri('lake', 'tables/source_table')).get_add_actions(flatten = True)
+        return dict(zip(add_actions.column('path').to_pylist(), add_actions.column('partition.ID_bucket').to_pylist()))
+
+    files_before = partition_files()
+
+    # IDs 1 and 5 are both in the bucket 1
+    now = datetime.now()
+    create_changes_table(sql, [(1, 100.0, 0, now - timedelta(minutes = 1)), (5, None, 1, now - timedelta(minutes = 1))])
+    result = di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+        ,partition_spec = bucket_spec
+    )
+
+    assert result == {'rows_updated': 1, 'rows_inserted': 0, 'rows_deleted': 1}
+    files_after = partition_files()
+    assert {path for path, bucket in files_before.items() if bucket != 1} <= set(files_after)
+    assert not {path for path, bucket in files_before.items() if bucket == 1} & set(files_after)
+
+    table = read_table(backend, 'tables/source_table')
+    assert 5 not in table.column('ID').to_pylist()
+    assert table.column('measure').to_pylist()[0] == 100.0
@@ -0,0 +1,78 @@
+from conftest import execute, create_source_table, create_changes_table, read_table
+
+from datetime import datetime, timedelta
+import pyarrow as pa
+
+
+def incr_load(di, projection = None):
+    return di.incr_load(
+        'main.source_table', 'lake', 'tables/source_table', 'main.source_table_changes', 'date_created', 'ID', 'deleted'
+        ,projection = projection
+    )
+
+
+def test_empty_projection_selects_all_the_columns(di):
+    assert di.select_list('main.source_table', None) == '*'
+    assert di.select_list('main.source_table', {}, table_alias = 's') == 's.*'
+
+
+def test_select_list_casts_columns_and_keeps_their_names(di):
+    select_list = di.select_list('main.source_table', {'columns': ['ID', 'measure'], 'casts': {'measure': 'integer'}}, table_alias = 's')
+
+    assert select_list == 's.[ID], cast(s.[measure] as integer) as [measure]'
+
+
+def test_excluded_columns_are_not_read_from_the_source_table(sql, di):
+    create_source_table(sql, rows = 5)
+
+    assert di.projected_columns('main.source_table', {'exclude_columns': ['name']}) == ['ID', 'measure', 'date_created']
+
+
+def test_required_columns_survive_the_projection(di):
+    projection = {'columns': ['name'], 'exclude_columns': ['ID', 'date_created', 'deleted']}
+
+    columns = di.projected_columns('main.source_table_changes', projection, required_columns = ['ID', 'date_created', 'deleted'])
+
+    assert columns == ['name', 'ID', 'date_created', 'deleted']
+
+
+def test_full_load_reads_the_projected_and_cast_columns(sql, backend, di):
+    create_source_table(sql, rows = 5)
+
+    di.full_load('main.source_table', 'lake', 'tables/source_table', projection = {'exclude_columns': ['name'], 'casts': {'measure': 'integer'}})
+
+    table = read_table(backend, 'tables/source_table')
+    assert table.column_names == ['ID', 'measure', 'date_created']
+    assert pa.types.is_integer(table.schema.field('measure').type)
+
+
+def test_incr_load_reads_the_columns_of_the_target_table_by_default(sql, backend, di, monkeypatch):
+    create_source_table(sql, rows = 5)
+    di.full_load('main.source_table', 'lake', 'tables/source_table', projection = {'exclude_columns': ['name']})
+    # a column added to the changes table after the first load isn't read
+    create_changes_table(sql, [(1, 100.0, 0, datetime.now() - timedelta(minutes = 1))])
+    execute(sql, 'alter table source_table_changes add column document blob')
+    queries = []
+    read_query_arrow = di.sql.read_query_arrow
+    monkeypatch.setattr(di.sql, 'read_query_arrow', lambda query, params = None: queries.append(query) or read_query_arrow(query, params = params))
+
+    assert incr_load(di) == {'rows_updated': 1, 'rows_inserted': 0, 'rows_deleted': 0}
+
+    assert 'document' not in queries[-1] and 'name' not in queries[-1]
+    table = read_table(backend, 'tables/source_table')
+    assert table.column_names == ['ID', 'measure', 'date_created']
+    assert table.column('measure').to_pylist()[0] == 100.0
+
+
+def test_incr_load_reads_the_required_columns_excluded_by_the_projection(sql, backend, di):
+    create_source_table(sql, rows = 5)
+    di.full_load('main.source_table', 'lake', 'tables/source_table', projection = {'columns': ['ID', 'measure']})
+    create_changes_table(sql, [(2, 200.0, 0, datetime.now() - timedelta(minutes = 1)), (3, None, 1, datetime.now() - timedelta(minutes = 1))])
+
+    result = incr_load(di, projection = {'columns': ['measure'], 'exclude_columns': ['ID', 'date_created', 'deleted']})
+
+    assert result == {'rows_updated': 1, 'rows_inserted': 0, 'rows_deleted': 1}
+    table = read_table(backend, 'tables/source_table')
+    assert table.column_names == ['ID', 'measure']
+    assert table.column('ID').to_pylist() == [1, 2, 4, 5]
+    assert table.column('measure').to_pylist()[1] == 200.0
@@ -0,0 +1,42 @@
+from conftest import execute, create_source_table, read_table
+
+import pytest
+
+
+def read_ranges(sql, queries):
+    "returning the list of IDs read by every query"
+    return [sql.read_query_arrow(query, params = params).column('ID').to_pylist() for query, params in queries]
+
+
+def test_integer_ranges_read_every_row_once(sql, di):
+    create_source_table(sql, rows = 103)
+
+    ranges = read_ranges(sql, di.range_queries('main.source_table', 'ID', 4))
+
+    assert len(ranges) == 4
+    assert sorted(id for ids in ranges for id in ids) == list(range(1, 104))
+
+
+def test_rows_with_null_split_column_are_read_by_the_first_range(sql, di):
+    create_source_table(sql, rows = 20)
+    execute(sql, 'update source_table set measure = null where ID in (5, 15)')
+
+    ranges = read_ranges(sql, di.range_queries('main.source_table', 'measure', 2))
+
+    assert {5, 15} <= set(ranges[0])
+    assert sorted(id for ids in ranges for id in ids) == list(range(1, 21))
+
+
+def test_text_split_column_is_rejected(sql, di):
+    create_source_table(sql, rows = 20)
+
+    with pytest.raises(Exception, match = "can't be split into ranges"):
+        di.range_queries('main.source_table', 'name', 4)
+
+
+def test_parallel_full_load_reads_every_row_once(sql, backend, di):
+    create_source_table(sql, rows = 1_000)
+
+    di.full_load('main.source_table', 'lake', 'tables/source_table', parallel_workers = 4, batch_size = 100)
+
+    assert read_table(backend, 'tables/source_table').column('ID').to_pylist() == list(range(1, 1_001))
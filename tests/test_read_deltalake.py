@@ -0,0 +1,42 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+
+@pytest.fixture
+def table(di):
+    "creating the lake/table delta table partitioned by region in two versions"
+    data = pa.table({'ID': [1, 2, 3, 4], 'region': ['PL', 'PL', 'DE', 'DE'], 'measure': [1.0, 2.0, 3.0, 4.0]})
+    di.dl.write_deltalake(data.slice(0, 2), 'lake', 'table', partition_by = ['region'])
+    di.dl.write_deltalake(data.slice(2), 'lake', 'table', mode = 'append', partition_by = ['region'])
+    return data
+
+
+def test_columns_predicate_and_partitions_are_applied_to_batches(di, table):
+    reader = di.dl.read_deltalake(
+        'lake'
+        ,'table'
+        ,as_batches = True
+        ,columns = ['ID', 'measure']
+        ,partitions = [('region', '=', 'DE')]
+        ,predicate = pc.field('measure') > 3
+    )
+
+    assert isinstance(reader, pa.RecordBatchReader)
+    assert reader.read_all().to_pydict() == {'ID': [4], 'measure': [4.0]}
+
+
+def test_predicate_in_the_format_of_partitions_is_applied_to_a_dataframe(di, table):
+    df = di.dl.read_deltalake('lake', 'table', to_pandas = True, predicate = [('ID', 'in', [1, 3])])
+
+    assert sorted(df['ID']) == [1, 3]
+
+
+def test_an_older_version_is_read(di, table):
+    assert di.dl.read_deltalake('lake', 'table', as_batches = True, version = 0).read_all().num_rows == 2
+
+
+@pytest.mark.parametrize('arguments', [{'columns': ['ID']}, {'partitions': [('region', '=', 'PL')]}, {'predicate': pc.field('ID') > 1}])
+def test_reading_options_are_rejected_without_a_reading_mode(di, table, arguments):
+    with pytest.raises(Exception, match = 'to_pandas = True or as_batches = True'):
+        di.dl.read_deltalake('lake', 'table', **arguments)
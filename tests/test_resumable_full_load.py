@@ -0,0 +1,86 @@
+"""
+commit_parquet_parts uses internal functions of deltalake (see class_delta_lake.py), so these tests check that parts committed by it can be 
+read back with the installed release.
+"""
+
+from conftest import create_source_table, read_table
+
+from deltalake import DeltaTable
+import pyarrow as pa
+import pytest
+
+
+def test_committed_parts_can_be_read_back(backend, di):
+    data = pa.table({'ID': [1, 2, 3, 4], 'region': ['PL', 'PL', 'DE', None], 'measure': [1.0, 2.0, 3.0, 4.0]})
+    parts = [
+        *di.dl.write_parquet_parts(pa.RecordBatchReader.from_batches(data.schema, data.slice(0, 2).to_batches()), 'lake', 't', 'a', ['region'])
+        ,*di.dl.write_parquet_parts(pa.RecordBatchReader.from_batches(data.schema, data.slice(2).to_batches()), 'lake', 't', 'b', ['region'])
+    ]
+
+    # parts are not visible until they are committed
+    assert not backend.file_exists('lake', 't/_delta_log')
+
+    di.dl.commit_parquet_parts('lake', 't', parts, data.schema, ['region'])
+
+    delta_table = DeltaTable(backend.table_uri('lake', 't'))
+    assert delta_table.metadata().partition_columns == ['region']
+    assert read_table(backend, 't').select(data.column_names).equals(data)
+    # statistics of the files are committed, so files can be skipped by filters
+    assert delta_table.get_add_actions(flatten = True).column('num_records').to_pylist() != [None] * len(parts)
+
+    # the next commit overwrites the table
+    parts = di.dl.write_parquet_parts(pa.RecordBatchReader.from_batches(data.schema, data.slice(0, 1).to_batches()), 'lake', 't', 'c', ['region'])
+    di.dl.commit_parquet_parts('lake', 't', parts, data.schema, ['region'])
+
+    assert read_table(backend, 't').column('ID').to_pylist() == [1]
+
+
+def test_failed_chunks_are_loaded_by_the_next_run(sql, backend, di, monkeypatch):
+    create_source_table(sql, rows = 1_000)
+    write_parquet_parts = di.dl.write_parquet_parts
+    calls = []
+
+    def failing_write_parquet_parts(data, container_name, path, part_name, partition_by = None):
+        calls.append(part_name)
+        if len(calls) == 3:
+            raise Exception('write failed')
+        return write_parquet_parts(data, container_name, path, part_name, partition_by)
+
+    monkeypatch.setattr(di.dl, 'write_parquet_parts', failing_write_parquet_parts)
+    with pytest.raises(Exception, match = 'write failed'):
+        di.full_load('main.source_table', 'lake', 'tables/source_table', chunks = 4)
+
+    # nothing is committed until all the chunks are loaded
+    assert not backend.file_exists('lake', 'tables/source_table/_delta_log')
+
+    result = di.full_load('main.source_table', 'lake', 'tables/source_table', chunks = 4)
+
+    # chunks are loaded one at a time and the other chunks are still loaded after a failure
+    assert calls[-1] == 'chunk-00002'
+    assert result == {'chunks': 4, 'resumed_chunks': 3, 'rows': 1_000}
+    assert read_table(backend, 'tables/source_table').column('ID').to_pylist() == list(range(1, 1_001))
+    assert len(backend.list_directory_content('lake', 'tables/source_table/_staging')) == 0
+
+
+def test_a_rerun_with_different_arguments_discards_staged_chunks(sql, backend, di, monkeypatch):
+    create_source_table(sql, rows = 100)
+
+    def failing_commit_parquet_parts(*args, **kwargs):
+        raise Exception('commit failed')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(di.dl, 'commit_parquet_parts', failing_commit_parquet_parts)
+        with pytest.raises(Exception, match = 'commit failed'):
+            di.full_load('main.source_table', 'lake', 'tables/source_table', chunks = 2)
+
+    result = di.full_load('main.source_table', 'lake', 'tables/source_table', chunks = 3)
+
+    assert result == {'chunks': 3, 'resumed_chunks': 0, 'rows': 100}
+    assert read_table(backend, 'tables/source_table').num_rows == 100
+
+
+def test_other_deltalake_releases_are_rejected(di, monkeypatch):
+    monkeypatch.setattr('class_delta_lake.deltalake.__version__', '1.0.0')
+
+    with pytest.raises(Exception, match = 'internal functions of deltalake'):
+        di.dl.commit_parquet_parts('lake', 't', [], pa.schema([('ID', pa.int64())]))
@@ -0,0 +1,52 @@
+from conftest import create_source_table, read_table
+
+import threading
+
+
+def test_a_load_holds_one_sql_slot_per_connection(di):
+    di.sql_slots, di.max_sql_connections = threading.BoundedSemaphore(4), 4
+
+    with di.sql_connection_slots(3):
+        assert di.sql_slots.acquire(blocking = False)
+        assert not di.sql_slots.acquire(blocking = False)
+        di.sql_slots.release()
+
+    # a load with more connections than the limit holds all the slots
+    with di.sql_connection_slots(10):
+        assert not di.sql_slots.acquire(blocking = False)
+
+    assert all(di.sql_slots.acquire(blocking = False) for _ in range(4))
+
+
+def test_loads_with_more_workers_than_sql_connections_are_finished(sql, backend, di):
+    create_source_table(sql, rows = 200)
+    full_loads = [
+        {
+            'source_table_name': 'main.source_table'
+            ,'container_name': 'lake'
+            ,'target_table_path': f'tables/table{i}'
+            ,'parallel_workers': 3
+        }
+        for i in range(4)
+    ]
+
+    summaries = di.run_loads(full_loads = full_loads, workers = 4, max_sql_connections = 2, max_storage_writers = 2)
+
+    assert [summary['status'] for summary in summaries] == ['succeeded'] * 4
+    for i in range(4):
+        assert read_table(backend, f'tables/table{i}').num_rows == 200
+    assert di.max_sql_connections is None
+
+
+def test_a_failed_load_doesnt_stop_other_loads(sql, backend, di):
+    create_source_table(sql, rows = 10)
+    full_loads = [
+        {'source_table_name': table_name, 'container_name': 'lake', 'target_table_path': f'tables/{table_name}'}
+        for table_name in ['main.source_table', 'main.missing_table']
+    ]
+
+    summaries = {summary['target_table_path']: summary for summary in di.run_loads(full_loads = full_loads)}
+
+    assert summaries['tables/main.source_table']['status'] == 'succeeded'
+    assert summaries['tables/main.missing_table']['status'] == 'failed'
+    assert 'missing_table' in summaries['tables/main.missing_table']['error']
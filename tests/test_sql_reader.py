@@ -0,0 +1,77 @@
+from conftest import execute, create_source_table, read_table
+
+import sqlalchemy as sa
+import pyarrow as pa
+import pytest
+
+
+@pytest.fixture
+def connections(sql):
+    "counting connections of the SQLite db which are open (checked out from the engine and not returned yet)"
+    counter = {'open': 0}
+
+    def checkout(*args):
+        counter['open'] += 1
+
+    def checkin(*args):
+        counter['open'] -= 1
+
+    sa.event.listen(sql.engine, 'checkout', checkout)
+    sa.event.listen(sql.engine, 'checkin', checkin)
+
+    return counter
+
+
+def test_reader_streams_batches_of_batch_size_rows(sql):
+    create_source_table(sql, rows = 25)
+
+    reader = sql.read_query_reader('select * from main.source_table', batch_size = 10)
+
+    assert isinstance(reader, pa.RecordBatchReader)
+    assert [batch.num_rows for batch in reader] == [10, 10, 5]
+
+
+def test_reader_closes_the_connection_when_exhausted(sql, connections):
+    create_source_table(sql, rows = 25)
+
+    reader = sql.read_query_reader('select * from main.source_table', batch_size = 10)
+    assert connections['open'] == 1
+
+    reader.read_all()
+
+    assert connections['open'] == 0
+
+
+def test_reader_closes_the_connection_when_the_query_fails(sql, connections):
+    with pytest.raises(Exception):
+        sql.read_query_reader('select * from main.missing_table')
+
+    assert connections['open'] == 0
+
+
+def test_columns_with_only_nulls_in_the_first_batch_are_read_as_strings(sql):
+    execute(sql, 'create table notes (ID integer primary key, note text)')
+    execute(sql, 'insert into notes values (?, ?)', [(id, None if id <= 10 else f'note_{id}') for id in range(1, 16)])
+
+    table = sql.read_query_reader('select * from main.notes', batch_size = 10).read_all()
+
+    assert table.schema.field('note').type == pa.string()
+    assert table.column('note').to_pylist()[9:11] == [None, 'note_11']
+
+
+def test_reader_binds_parameters(sql):
+    create_source_table(sql, rows = 25)
+
+    table = sql.read_query_reader('select ID from main.source_table where ID > ?', params = [20]).read_all()
+
+    assert table.column('ID').to_pylist() == [21, 22, 23, 24, 25]
+
+
+def test_full_load_writes_the_streamed_source_table(sql, backend, di):
+    create_source_table(sql, rows = 250)
+
+    di.full_load('main.source_table', 'lake', 'tables/source_table', batch_size = 100)
+
+    table = read_table(backend, 'tables/source_table')
+    assert table.num_rows == 250
+    assert table.column('ID').to_pylist() == list(range(1, 251))
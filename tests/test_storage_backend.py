@@ -0,0 +1,27 @@
+from class_storage_backend import StorageBackend
+
+import pytest
+
+
+def test_storage_backend_without_all_operations_cannot_be_created():
+    class PartialBackend(StorageBackend):
+        def create_container(self, container_name):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+def test_local_backend_uploads_lists_and_checks_files(backend, tmp_path):
+    local_file = tmp_path / 'file.txt'
+    local_file.write_text('data')
+
+    with backend:
+        backend.create_container('lake')
+        backend.create_directory('lake', 'files')
+        backend.upload_file('lake', 'files/file.txt', local_file)
+
+        assert backend.file_exists('lake', 'files/file.txt')
+        assert not backend.file_exists('lake', 'files/missing.txt')
+        assert backend.file_checksum('lake', 'files/file.txt') == (4, backend.local_file_md5(local_file))
+        assert len(backend.list_directory_content('lake', 'files')) == 1
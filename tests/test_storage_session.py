@@ -0,0 +1,87 @@
+"""
+Creating a StorageSession doesn't send any requests, so these tests use a made up account and check refreshing of its SAS token.
+"""
+
+from class_storage_session import StorageSession
+
+from datetime import timedelta
+import base64
+import time
+import pytest
+
+
+@pytest.fixture
+def session():
+    session = StorageSession('account', base64.b64encode(b'access key').decode(), sas_retry_delay = timedelta(seconds = 0.05))
+    yield session
+    session.close()
+
+
+def test_sas_refresh_timer_doesnt_keep_the_program_running(session):
+    assert session.sas_refresh_timer.daemon
+    assert session.sas_refresh_timer.interval == pytest.approx((session.sas_lifetime * session.sas_refresh_ratio).total_seconds())
+
+
+def test_refresh_replaces_the_token_and_schedules_the_next_refresh(session, monkeypatch):
+    delays = []
+    monkeypatch.setattr(session, 'create_account_sas', lambda: 'new token')
+    monkeypatch.setattr(session, 'schedule_sas_refresh', lambda delay = None: delays.append(delay))
+
+    session.refresh_sas()
+
+    assert session.credential.signature == 'new token'
+    assert delays == [None]
+
+
+def test_failed_refresh_is_retried_after_the_retry_delay(session, monkeypatch):
+    delays = []
+
+    def failing_create_account_sas():
+        raise Exception('no access')
+
+    monkeypatch.setattr(session, 'create_account_sas', failing_create_account_sas)
+    monkeypatch.setattr(session, 'schedule_sas_refresh', lambda delay = None: delays.append(delay))
+    signature = session.credential.signature
+
+    session.refresh_sas()
+
+    assert session.credential.signature == signature
+    assert delays == [session.sas_retry_delay]
+
+
+def test_token_is_refreshed_by_the_retry(session, monkeypatch):
+    calls = []
+
+    def create_account_sas_failing_once():
+        calls.append(None)
+        if len(calls) == 1:
+            raise Exception('no access')
+        return 'new token'
+
+    monkeypatch.setattr(session, 'create_account_sas', create_account_sas_failing_once)
+    session.refresh_sas()
+
+    deadline = time.monotonic() + 5
+    while session.credential.signature != 'new token' and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert session.credential.signature == 'new token'
+    assert len(calls) == 2
+
+
+def test_closed_session_stops_refreshing(session, monkeypatch):
+    delays = []
+    monkeypatch.setattr(session, 'schedule_sas_refresh', lambda delay = None: delays.append(delay))
+
+    session.close()
+    session.refresh_sas()
+
+    assert delays == []
+
+
+def test_session_is_closed_at_the_end_of_a_with_block():
+    with StorageSession('account', base64.b64encode(b'access key').decode()) as session:
+        timer = session.sas_refresh_timer
+
+    assert session.closed
+    assert timer.finished.is_set()
@@ -0,0 +1,158 @@
+"""
+SQLite doesn't have Change Tracking or CDC, so their queries are replaced by stubs and the tests check the bookkeeping of versions. The 
+'rowversion' mode is run end to end: rowversions are saved as 8 byte big-endian blobs (which SQLite compares the same way as SQL Server 
+compares rowversions) and min_active_rowversion() is registered as a SQLite function.
+"""
+
+from conftest import execute, create_source_table, read_table
+
+from class_data_ingestion import DataIngestion
+
+import sqlalchemy as sa
+import pyarrow as pa
+import pytest
+
+load_arguments = {
+    'source_table_name': 'main.source_table'
+    ,'container_name': 'lake'
+    ,'target_table_path': 'tables/source_table'
+    ,'pk': 'ID'
+}
+
+
+@pytest.fixture
+def rowversion_table(sql):
+    """
+    creating the source table with the rv rowversion column. It returns a dictionary with the 'current' rowversion, which is returned by 
+    min_active_rowversion() (the next rowversion which will be assigned, as in SQL Server) and the update function.
+    """
+    state = {'current': 2}
+
+    def register(connection, connection_record):
+        connection.create_function('min_active_rowversion', 0, lambda: state['current'].to_bytes(8, 'big'))
+
+    sa.event.listen(sql.engine, 'connect', register)
+
+    create_source_table(sql, rows = 20)
+    execute(sql, 'alter table source_table add column rv blob')
+    execute(sql, 'update source_table set rv = ?', [((1).to_bytes(8, 'big'),)])
+
+    def update(query):
+        "running an update of rows of the source table which gives them the next rowversion"
+        execute(sql, query.replace('set ', 'set rv = ?, ', 1), [(state['current'].to_bytes(8, 'big'),)])
+        state['current'] += 1
+
+    state['update'] = update
+    return state
+
+
+def test_rowversion_load_reads_only_rows_changed_since_the_saved_version(sql, backend, di, rowversion_table):
+    arguments = {**load_arguments, 'mode': 'rowversion', 'rowversion_column': 'rv'}
+
+    assert di.tracked_incr_load(**arguments) == {'rows_updated': 0, 'rows_inserted': 20, 'rows_deleted': 0}
+    assert di.find_last_change_version('tables/source_table') == 2
+
+    rowversion_table['update']('update source_table set measure = -1 where ID in (3, 4)')
+    assert di.tracked_incr_load(**arguments) == {'rows_updated': 2, 'rows_inserted': 0, 'rows_deleted': 0}
+    assert di.find_last_change_version('tables/source_table') == rowversion_table['current']
+
+    table = read_table(backend, 'tables/source_table')
+    assert table.column('measure').to_pylist()[2:4] == [-1, -1]
+
+    # nothing changed since the last load
+    assert di.tracked_incr_load(**arguments) == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+
+
+@pytest.fixture
+def tracked_source(sql, di, monkeypatch):
+    """
+    replacing the Change Tracking queries by stubs. It returns a dictionary with the versions returned by change_versions, 
+    the changes returned by tracked_changes and the arguments of tracked_changes calls.
+    """
+    create_source_table(sql, rows = 10)
+    source = {'current_version': 5, 'min_version': 0, 'changes': None, 'calls': []}
+
+    def change_versions(source_table_name, mode, capture_instance = None):
+        return source['current_version'], source['min_version']
+
+    def tracked_changes(source_table_name, pk, mode, from_version, to_version, *args):
+        source['calls'].append((from_version, to_version))
+        return source['changes']
+
+    monkeypatch.setattr(di, 'change_versions', change_versions)
+    monkeypatch.setattr(di, 'tracked_changes', tracked_changes)
+
+    return source
+
+
+def changes_of(sql, updated_ids, deleted_ids):
+    "returning changes in the format of the tracked_changes function: current rows of updated_ids and deleted keys"
+    updated = sql.read_query_arrow(f"select *, 0 as __deleted from source_table where ID in ({', '.join(map(str, updated_ids))})")
+    deleted = pa.table({'ID': pa.array(deleted_ids, pa.int64()), '__deleted': pa.array([1] * len(deleted_ids), pa.int64())})
+    return pa.concat_tables([updated, deleted], promote_options = 'default')
+
+
+def test_first_load_saves_the_version_captured_before_reading(di, tracked_source):
+    assert di.tracked_incr_load(**load_arguments)['rows_inserted'] == 10
+
+    assert di.find_last_change_version('tables/source_table') == 5
+    assert tracked_source['calls'] == []
+
+
+def test_changes_since_the_saved_version_are_merged(sql, backend, di, tracked_source):
+    di.tracked_incr_load(**load_arguments)
+    execute(sql, 'update source_table set measure = -1 where ID = 1')
+    tracked_source['current_version'] = 8
+    tracked_source['changes'] = changes_of(sql, [1], [2])
+
+    assert di.tracked_incr_load(**load_arguments) == {'rows_updated': 1, 'rows_inserted': 0, 'rows_deleted': 1}
+
+    assert tracked_source['calls'] == [(5, 8)]
+    assert di.find_last_change_version('tables/source_table') == 8
+    table = read_table(backend, 'tables/source_table')
+    assert table.column('ID').to_pylist() == [1] + list(range(3, 11))
+    assert table.column('measure').to_pylist()[0] == -1
+
+
+def test_no_changes_are_read_when_the_version_did_not_change(di, tracked_source):
+    di.tracked_incr_load(**load_arguments)
+
+    assert di.tracked_incr_load(**load_arguments) == {'rows_updated': 0, 'rows_inserted': 0, 'rows_deleted': 0}
+    assert tracked_source['calls'] == []
+
+
+def test_table_is_reloaded_when_the_saved_version_was_cleaned_up(sql, backend, di, tracked_source):
+    di.tracked_incr_load(**load_arguments)
+    execute(sql, 'delete from source_table where ID > 5')
+    tracked_source['current_version'], tracked_source['min_version'] = 20, 10
+
+    assert di.tracked_incr_load(**load_arguments)['rows_inserted'] == 5
+
+    assert tracked_source['calls'] == []
+    assert di.find_last_change_version('tables/source_table') == 20
+    assert read_table(backend, 'tables/source_table').num_rows == 5
+
+
+def test_version_is_not_saved_when_the_merge_fails(sql, di, tracked_source, monkeypatch):
+    di.tracked_incr_load(**load_arguments)
+    tracked_source['current_version'] = 8
+    tracked_source['changes'] = changes_of(sql, [1], [])
+
+    def failing_merge(*args, **kwargs):
+        raise Exception('merge failed')
+
+    monkeypatch.setattr(di, 'merge_keyed_changes', failing_merge)
+    with pytest.raises(Exception, match = 'merge failed'):
+        di.tracked_incr_load(**load_arguments)
+
+    assert di.find_last_change_version('tables/source_table') == 5
+
+
+def test_versions_as_large_as_lsns_are_saved_in_extract_logs(sql, backend, di):
+    lsn = int.from_bytes(b'\xff' * 10, 'big')
+
+    di.update_last_change_version('tables/source_table', lsn)
+
+    # extract logs are read again from the Data Lake by a new object
+    assert DataIngestion(sql = sql, storage_backend = backend).find_last_change_version('tables/source_table') == lsn
+    assert di.version_to_int(di.int_to_version(lsn, 10)) == lsn
@@ -0,0 +1,75 @@
+from class_azure_blob import AzureBlob
+
+import pytest
+
+
+@pytest.fixture
+def blob(backend):
+    backend.create_container('lake')
+    return AzureBlob(session = backend)
+
+
+@pytest.fixture
+def local_directory(tmp_path):
+    "creating a local directory with two files in its root and one in a subdirectory"
+    directory = tmp_path / 'upload'
+    (directory / 'nested').mkdir(parents = True)
+    (directory / 'a.txt').write_text('aaaa')
+    (directory / 'b.txt').write_text('bbbb')
+    (directory / 'nested' / 'c.txt').write_text('cccc')
+    return directory
+
+
+@pytest.fixture
+def uploads(backend, monkeypatch):
+    "recording cloud paths of the files uploaded through the backend"
+    uploads = []
+    upload_file = backend.upload_file
+
+    def recorded_upload_file(container_name, cloud_file_path, *args):
+        uploads.append(cloud_file_path)
+        upload_file(container_name, cloud_file_path, *args)
+
+    monkeypatch.setattr(backend, 'upload_file', recorded_upload_file)
+    return uploads
+
+
+def test_all_files_are_uploaded_keeping_their_relative_paths(blob, backend, local_directory):
+    summary = blob.upload_directory('lake', 'files/', local_directory, parallel_files = 2)
+
+    assert summary == {'uploaded': ['a.txt', 'b.txt', 'nested/c.txt'], 'skipped': [], 'bytes': 12}
+    assert backend.local_path('lake', 'files/nested/c.txt').read_text() == 'cccc'
+
+
+def test_unchanged_files_are_skipped(blob, local_directory, uploads):
+    blob.upload_directory('lake', 'files', local_directory)
+    uploads.clear()
+
+    summary = blob.upload_directory('lake', 'files', local_directory)
+
+    assert summary == {'uploaded': [], 'skipped': ['a.txt', 'b.txt', 'nested/c.txt'], 'bytes': 0}
+    assert uploads == []
+
+
+def test_changed_and_new_files_are_uploaded_again(blob, backend, local_directory, uploads):
+    blob.upload_directory('lake', 'files', local_directory)
+    uploads.clear()
+    # the same size but different content, a different size and a new file
+    (local_directory / 'a.txt').write_text('AAAA')
+    (local_directory / 'nested' / 'c.txt').write_text('ccccc')
+    (local_directory / 'd.txt').write_text('dd')
+
+    summary = blob.upload_directory('lake', 'files', local_directory)
+
+    assert summary == {'uploaded': ['a.txt', 'd.txt', 'nested/c.txt'], 'skipped': ['b.txt'], 'bytes': 11}
+    assert sorted(uploads) == ['files/a.txt', 'files/d.txt', 'files/nested/c.txt']
+    assert backend.local_path('lake', 'files/a.txt').read_text() == 'AAAA'
+
+
+def test_files_are_uploaded_again_without_skip_unchanged(blob, local_directory, uploads):
+    blob.upload_directory('lake', 'files', local_directory)
+
+    summary = blob.upload_directory('lake', 'files', local_directory, skip_unchanged = False)
+
+    assert summary['skipped'] == []
+    assert len(uploads) == 6